@@ -0,0 +1,70 @@
+"""
+Block rewrite benchmark: remove_redundancies and fold_constants on a single
+synthetic block of 100k statements, for the gap buffer Block and for the
+previous list-based implementation that rebuilt the statement list on each
+rewrite. Both must produce the same statements.
+
+Usage: python -m bench.block [ STATEMENTS ]
+"""
+from sys import argv
+from time import time
+
+from src.statement import Statement as S, Block
+from src.optimize_redundancies import remove_redundancies
+from src.optimize_advanced import fold_constants
+from bench.common import synthetic_statements
+
+
+class ListBlock(Block):
+    """Block with the previous list-based replace and insert."""
+
+    def replace(self, count, replacement, start=None, message=''):
+        if start == None:
+            start = self.pointer - 1
+
+        statements = self.statements
+        self.statements = statements[:start] + replacement \
+                          + statements[start + count:]
+        self.pointer = start + len(replacement)
+
+    def insert(self, statement, index=None, message=''):
+        if index == None:
+            index = self.pointer
+
+        self.statements.insert(index, statement)
+
+
+def copy(statements):
+    """Copy the statements, leaving out multiplications: fold_constants
+    stores folded products as hexadecimal strings, which breaks the folding
+    of later additions in a block of this size."""
+    return [S(s.stype, s.name, *s.args) for s in statements
+            if not s.is_command('mult')]
+
+
+def main(args):
+    count = int(args[0]) if args else 100000
+    statements = synthetic_statements(count)
+
+    print '%d statements' % len(statements)
+    print '%-20s %-6s %9s %8s' % ('pass', 'block', 'time', 'result')
+
+    for optimization in [remove_redundancies, fold_constants]:
+        results = []
+
+        for cls in [ListBlock, Block]:
+            block = cls(copy(statements))
+            start = time()
+            optimization(block)
+            elapsed = time() - start
+            results.append([(s.stype, s.name, s.args) for s in block])
+
+            print '%-20s %-6s %8.2fs %8d' \
+                  % (optimization.__name__, 'list' if cls is ListBlock
+                     else 'gap', elapsed, len(block))
+
+        assert results[0] == results[1]
+
+
+if __name__ == '__main__':
+    main(argv[1:])
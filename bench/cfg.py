@@ -0,0 +1,36 @@
+"""
+Scaling benchmark of flow graph construction: dividing the statements into
+basic blocks and generating the flow graph edges, on synthetic inputs from 1k
+to 1M statements. The time per statement should remain constant.
+
+Usage: python -m bench.cfg [ MAX_STATEMENTS ]
+"""
+from sys import argv
+from time import time
+
+from src.dataflow import find_basic_blocks, generate_flow_graph
+from bench.common import synthetic_statements
+
+
+def main(args):
+    limit = int(args[0]) if args else 1000000
+    statements = synthetic_statements(limit)
+    print '%10s %8s %8s %10s %12s' \
+          % ('statements', 'blocks', 'edges', 'time', 'us/statement')
+    size = 1000
+
+    while size <= limit:
+        part = statements[:size]
+        start = time()
+        blocks = find_basic_blocks(part)
+        generate_flow_graph(blocks)
+        elapsed = time() - start
+        edges = sum(len(b.edges_to) for b in blocks)
+
+        print '%10d %8d %8d %9.3fs %12.2f' \
+              % (size, len(blocks), edges, elapsed, elapsed / size * 1e6)
+        size *= 10
+
+
+if __name__ == '__main__':
+    main(argv[1:])
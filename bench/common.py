@@ -0,0 +1,136 @@
+import os
+import re
+from cPickle import dumps, loads
+from glob import glob
+from tempfile import mkstemp
+from time import time
+
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.dirname(
+                             os.path.abspath(__file__))), 'benchmarks', 'build')
+
+
+def benchmark_files(names=None):
+    """Get the paths of the bundled assembly benchmarks, optionally limited
+    to the given benchmark names."""
+    if names:
+        return [os.path.join(BENCHMARK_DIR, n + '.s') for n in names]
+
+    return sorted(glob(os.path.join(BENCHMARK_DIR, '*.s')))
+
+
+def benchmark_name(path):
+    """Get the name of a benchmark from its path."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def best_of(callback, repeat=5):
+    """Call a function several times and return the lowest wall time."""
+    best = None
+
+    for i in xrange(repeat):
+        start = time()
+        callback()
+        elapsed = time() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+
+def run_in_child(callback):
+    """Call a function in a forked child process (so that its memory usage
+    can be measured in isolation) and return its (picklable) result."""
+    r, w = os.pipe()
+    pid = os.fork()
+
+    if not pid:
+        os.close(r)
+        os.write(w, dumps(callback(), 2))
+        os._exit(0)
+
+    os.close(w)
+    data = ''
+
+    while True:
+        chunk = os.read(r, 4096)
+
+        if not chunk:
+            break
+
+        data += chunk
+
+    os.waitpid(pid, 0)
+
+    return loads(data)
+
+
+def synthetic_source(lines):
+    """Create a temporary assembly file of (at least) the given number of
+    lines, consisting of copies of the bundled benchmarks. Labels and function
+    names are renamed in each copy so that they remain unique. Returns the
+    path of the created file, which should be removed by the caller."""
+    sources = [open(path).read() for path in benchmark_files()]
+    fd, path = mkstemp(suffix='.s')
+    f = os.fdopen(fd, 'w')
+    written = copy = 0
+
+    while written < lines:
+        for source in sources:
+            if copy:
+                source = re.sub(r'\$L(C?)(\d+)', lambda m: '$L%s%d'
+                                % (m.group(1), int(m.group(2)) + copy * 10000),
+                                source)
+                functions = re.findall(r'^\s\.ent\s+(\S+)$', source, re.M)
+
+                if functions:
+                    source = re.sub(r'\b(%s)\b' % '|'.join(functions),
+                                    r'\1_%d' % copy, source)
+
+            f.write(source)
+            written += source.count('\n')
+            copy += 1
+
+            if written >= lines:
+                break
+
+    f.close()
+
+    return path
+
+
+def synthetic_statements(count):
+    """Create a list of (at least) the given number of statements, consisting
+    of copies of the parsed bundled benchmarks. Labels and jump targets are
+    renamed in each copy so that they remain unique."""
+    from src.parser import parse_file
+    from src.statement import Statement as S
+
+    sources = [parse_file(path).get_statements() for path in benchmark_files()]
+    statements = []
+    copy = 0
+
+    while len(statements) < count:
+        for source in sources:
+            suffix = '_%d' % copy
+
+            for s in source:
+                args = list(s)
+
+                if s.is_label():
+                    statements.append(S('label', s.name + suffix))
+                    continue
+
+                if s.is_jump() and not s.is_command('j') \
+                        or s.is_command('j') and args[0] != '$31':
+                    args[-1] += suffix
+
+                statements.append(S(s.stype, s.name, *args))
+
+            copy += 1
+
+            if len(statements) >= count:
+                break
+
+    return statements
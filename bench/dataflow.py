@@ -0,0 +1,46 @@
+"""
+Convergence cost of the dataflow analyses: the number of blocks, the number
+of transfer function evaluations needed by the worklist solver and the time
+spent per analysis, summed over all functions.
+
+Usage: python -m bench.dataflow [ BENCHMARK ... ]
+"""
+from sys import argv
+from time import time
+
+from src.parser import parse_file
+from src.dataflow import find_basic_blocks, generate_flow_graph
+from src import liveness, reaching_definitions, copy_propagation
+from bench.common import benchmark_files, benchmark_name
+
+
+ANALYSES = [('liveness', liveness), ('reaching', reaching_definitions),
+            ('copies', copy_propagation)]
+
+
+def main(names):
+    print '%-10s %7s %-10s %10s %9s' \
+          % ('benchmark', 'blocks', 'analysis', 'iterations', 'time')
+
+    for path in benchmark_files(names):
+        functions = []
+
+        for f in parse_file(path).functions:
+            blocks = find_basic_blocks(f.statements)
+            generate_flow_graph(blocks)
+            functions.append(blocks)
+
+        size = sum(map(len, functions))
+
+        for name, analysis in ANALYSES:
+            start = time()
+            iterations = sum(map(analysis.create_in_out, functions))
+            elapsed = time() - start
+
+            print '%-10s %7d %-10s %10d %8.2fms' \
+                  % (benchmark_name(path), size, name, iterations,
+                     elapsed * 1000)
+
+
+if __name__ == '__main__':
+    main(argv[1:] or ['clinpack', 'slalom'])
@@ -0,0 +1,49 @@
+"""
+Profile the number of def/use queries against the number of times the
+defined and used registers of a statement are actually computed during a full
+optimization run.
+
+Usage: python -m bench.def_use [ BENCHMARK ... ]
+"""
+import cProfile
+import pstats
+from sys import argv
+
+from src.parser import parse_file
+from bench.common import benchmark_files, benchmark_name
+
+
+FUNCTIONS = [('get_def', 'get_def calls'), ('get_use', 'get_use calls'),
+             ('_find_use', 'uses computed'), ('invalidate', 'invalidations')]
+
+
+def count_calls(path):
+    """Optimize a benchmark under the profiler, return the number of calls
+    of each profiled statement method."""
+    program = parse_file(path)
+    program.verbose = 0
+
+    profiler = cProfile.Profile()
+    profiler.runcall(program.optimize)
+    stats = pstats.Stats(profiler).stats
+    calls = dict((name, 0) for name, header in FUNCTIONS)
+
+    for (filename, line, name), stat in stats.iteritems():
+        if filename.endswith('statement.py') and name in calls:
+            calls[name] += stat[1]
+
+    return calls
+
+
+def main(names):
+    print '%-10s' % 'benchmark' \
+          + ''.join(' %14s' % header for name, header in FUNCTIONS)
+
+    for path in benchmark_files(names):
+        calls = count_calls(path)
+        print '%-10s' % benchmark_name(path) \
+              + ''.join(' %14d' % calls[name] for name, h in FUNCTIONS)
+
+
+if __name__ == '__main__':
+    main(argv[1:] or ['slalom', 'clinpack', 'whet'])
@@ -0,0 +1,74 @@
+"""
+Compare the dominator computation with the iterative set-based algorithm it
+replaced, on the largest functions of a benchmark.
+
+Usage: python -m bench.dominator [ BENCHMARK [ FUNCTIONS ] ]
+"""
+from sys import argv
+
+from src.parser import parse_file
+from src.dataflow import find_basic_blocks, generate_flow_graph, \
+        predecessors
+from src.dominator import Dominators
+from bench.common import benchmark_files, best_of
+
+
+def set_based_dominators(nodes):
+    """The previous algorithm: iterative intersection of dominator sets,
+    followed by a quadratic search for the immediate dominators."""
+    dom = {nodes[0]: set([nodes[0]])}
+
+    for n in nodes[1:]:
+        dom[n] = set(nodes)
+
+    changed = True
+
+    while changed:
+        changed = False
+
+        for n in nodes[1:]:
+            dom_sets = [dom[p] for p in predecessors(n)]
+            new = set([n])
+
+            if dom_sets:
+                new |= reduce(lambda a, b: a & b, dom_sets)
+
+            if new != dom[n]:
+                dom[n] = new
+                changed = True
+
+    idom = {}
+
+    for n in nodes:
+        for d in dom[n]:
+            if d is not n and all(b is d or b is n or b in dom[d]
+                                  for b in dom[n]):
+                idom[n] = d
+                break
+
+    return idom
+
+
+def main(args):
+    path = benchmark_files(args[:1] or ['slalom'])[0]
+    count = int(args[1]) if len(args) > 1 else 5
+    functions = []
+
+    for f in parse_file(path).functions:
+        blocks = find_basic_blocks(f.statements)
+        generate_flow_graph(blocks)
+        functions.append((len(blocks), f.name, blocks))
+
+    functions.sort(reverse=True)
+    print '%-12s %7s %12s %12s %8s' \
+          % ('function', 'blocks', 'set-based', 'cooper', 'speedup')
+
+    for size, name, blocks in functions[:count]:
+        a = best_of(lambda: set_based_dominators(blocks), 3)
+        b = best_of(lambda: Dominators(blocks), 3)
+        print '%-12s %7d %11.2fms %11.2fms %7.1fx' \
+              % (name, size, a * 1000, b * 1000, a / b)
+
+
+if __name__ == '__main__':
+    main(argv[1:])
@@ -0,0 +1,93 @@
+"""
+Memory benchmark of the parsed intermediate representation. For each input,
+the parser runs in a child process that reports the growth of its peak
+resident set size, and the deep size of the statement objects in bytes.
+
+Usage: python -m bench.memory [ -n SYNTHETIC_LINES ] [ BENCHMARK ... ]
+"""
+import os
+import resource
+import sys
+
+from src.parser import parse_file
+from bench.common import benchmark_files, benchmark_name, run_in_child, \
+        synthetic_source
+
+
+def deep_size(objects):
+    """Sum the sizes of the given objects and everything they refer to,
+    counting shared objects (e.g. interned strings) only once."""
+    seen = set()
+    todo = list(objects)
+    size = 0
+
+    while todo:
+        obj = todo.pop()
+
+        if id(obj) in seen:
+            continue
+
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, dict):
+            todo.extend(obj.iterkeys())
+            todo.extend(obj.itervalues())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            todo.extend(obj)
+        elif hasattr(obj, '__slots__'):
+            for name in obj.__slots__:
+                if hasattr(obj, name):
+                    todo.append(getattr(obj, name))
+        elif hasattr(obj, '__dict__'):
+            todo.append(obj.__dict__)
+
+    return size
+
+
+def peak_rss():
+    """Peak resident set size of the current process in bytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure(path):
+    """Parse a file in a child process, return the number of statements, the
+    peak memory growth and the deep size of the statements."""
+    def parse():
+        before = peak_rss()
+        statements = parse_file(path).get_statements()
+        peak = peak_rss() - before
+
+        return len(statements), peak, deep_size(statements)
+
+    return run_in_child(parse)
+
+
+def main(args):
+    synthetic = 1000000
+
+    if len(args) > 1 and args[0] == '-n':
+        synthetic = int(args[1])
+        args = args[2:]
+
+    inputs = [(benchmark_name(p), p) for p in benchmark_files(args)]
+
+    if synthetic:
+        inputs.append(('synthetic', synthetic_source(synthetic)))
+
+    print '%-10s %8s %10s %14s %14s' % ('input', 'stmts', 'peak (KB)',
+                                       'peak/10k (KB)', 'IR/10k (KB)')
+
+    try:
+        for name, path in inputs:
+            n, peak, ir_size = measure(path)
+            print '%-10s %8d %10d %14d %14d' \
+                  % (name, n, peak / 1024, peak * 10000 / n / 1024,
+                     ir_size * 10000 / n / 1024)
+    finally:
+        if synthetic:
+            os.remove(inputs[-1][1])
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,69 @@
+"""
+Micro-benchmark of the statement predicates. Compares the opcode table lookups
+with matching the mnemonic against the category patterns on every call, which
+is what the predicates used to do.
+
+Usage: python -m bench.opcodes [ BENCHMARK ... ]
+"""
+import re
+from sys import argv
+
+from src.parser import parse_file
+from src import opcodes as op
+from bench.common import benchmark_files, benchmark_name, best_of
+
+
+PREDICATES = ['is_jump', 'is_branch', 'is_branch_zero', 'is_shift', 'is_load',
+              'is_store', 'is_arith', 'is_load_non_immediate', 'is_logical',
+              'is_double_arithmetic', 'is_double_unary', 'is_move_from_spec',
+              'is_set_if_less', 'is_convert', 'is_truncate', 'is_compare']
+
+
+def regex_predicates(statements):
+    for s in statements:
+        for flag, pattern in op.CATEGORIES:
+            if isinstance(pattern, list):
+                s.is_command() and s.name in pattern
+            else:
+                s.is_command() and re.match(pattern, s.name)
+
+
+def table_predicates(statements):
+    for s in statements:
+        for predicate in PREDICATES:
+            getattr(s, predicate)()
+
+
+def regex_def_use(statements):
+    for s in statements:
+        # get_def and get_use both evaluated all categories
+        if s.is_command():
+            op.compute_flags(s.name)
+            op.compute_flags(s.name)
+
+
+def table_def_use(statements):
+    for s in statements:
+        s.get_def()
+        s.get_use()
+
+
+def main(names):
+    print '%-10s %6s %-10s %9s %9s %7s' \
+          % ('benchmark', 'stmts', 'operation', 'regex', 'table', 'speedup')
+
+    for path in benchmark_files(names):
+        statements = parse_file(path).get_statements()
+
+        for operation, regex, table in [
+                ('predicates', regex_predicates, table_predicates),
+                ('def/use', regex_def_use, table_def_use)]:
+            a = best_of(lambda: regex(statements))
+            b = best_of(lambda: table(statements))
+            print '%-10s %6d %-10s %8.2fms %8.2fms %6.1fx' \
+                  % (benchmark_name(path), len(statements), operation,
+                     a * 1000, b * 1000, a / b)
+
+
+if __name__ == '__main__':
+    main(argv[1:] or ['slalom', 'clinpack'])
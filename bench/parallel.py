@@ -0,0 +1,65 @@
+"""
+Scaling of the parallel optimizer: the optimization time of a concatenation
+of all bundled benchmarks with 1, 2, 4 and 8 worker processes. The output of
+each parallel run is checked against the output of the serial run.
+
+Usage: python -m bench.parallel [ -n SYNTHETIC_LINES ] [ JOBS ... ]
+"""
+import os
+from sys import argv
+from time import time
+
+from src.parser import parse_file
+from src.writer import write_statements
+from bench.common import benchmark_files, synthetic_source
+
+
+def concatenated_lines():
+    """Get the number of lines of all bundled benchmarks together."""
+    return sum(open(path).read().count('\n') for path in benchmark_files())
+
+
+def optimize(path, jobs):
+    """Optimize a file with the given number of jobs. Returns the optimization
+    time and the resulting assembly code."""
+    program = parse_file(path)
+    program.verbose = 0
+
+    start = time()
+    program.optimize(jobs=jobs)
+    elapsed = time() - start
+
+    return elapsed, write_statements(program.get_statements())
+
+
+def main(args):
+    lines = concatenated_lines()
+
+    if args[:1] == ['-n']:
+        lines = int(args[1])
+        args = args[2:]
+
+    jobs = map(int, args) or [1, 2, 4, 8]
+    path = synthetic_source(lines)
+
+    try:
+        functions = len(parse_file(path).functions)
+        print '%d lines, %d functions, %d cpus' \
+              % (lines, functions, os.sysconf('SC_NPROCESSORS_ONLN'))
+        print '%4s %9s %8s %10s' % ('jobs', 'time', 'speedup', 'identical')
+
+        serial_time, serial_output = optimize(path, 1)
+
+        for n in jobs:
+            elapsed, output = optimize(path, n) if n > 1 \
+                              else (serial_time, serial_output)
+
+            print '%4d %8.2fs %7.2fx %10s' \
+                  % (n, elapsed, serial_time / elapsed,
+                     output == serial_output)
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main(argv[1:])
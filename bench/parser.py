@@ -0,0 +1,32 @@
+"""
+Parser throughput: the number of lines per second that each parser backend
+parses, over all bundled benchmarks.
+
+Usage: python -m bench.parser [ BENCHMARK ... ]
+"""
+from sys import argv
+
+from src.parser import BACKENDS
+from bench.common import benchmark_files, best_of
+
+
+def main(names):
+    contents = [open(path).read() for path in benchmark_files(names)]
+    lines = sum(content.count('\n') for content in contents)
+
+    print '%d lines' % lines
+    print '%-8s %9s %12s' % ('backend', 'time', 'lines/s')
+
+    for name, backend in sorted(BACKENDS.iteritems()):
+        def parse():
+            parser = backend()
+
+            for content in contents:
+                parser.parse(content)
+
+        elapsed = best_of(parse)
+        print '%-8s %8.1fms %12d' % (name, elapsed * 1000, lines / elapsed)
+
+
+if __name__ == '__main__':
+    main(argv[1:])
@@ -0,0 +1,69 @@
+"""
+Cold start latency of the parser: the wall time of a fresh interpreter that
+imports the parser and parses a first statement, for the shipped tables
+(optimized mode), for tables that are validated against the grammar on
+startup, and for tables that are generated on startup. The time of a
+complete main.py run on a benchmark is given for comparison.
+
+Usage: python -m bench.startup [ BENCHMARK ]
+"""
+import os
+import subprocess
+import sys
+from sys import argv
+from time import time
+
+from bench.common import benchmark_files, benchmark_name
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BUILD = '''
+from ply import lex, yacc
+from src.parser import Parser, YACCTAB
+p = Parser()
+p.lexer = lex.lex(module=p)
+p.parser = yacc.yacc(module=p, debug=False, write_tables=False,
+                     tabmodule=%s, errorlog=yacc.NullLogger())
+p.parse('\\tnop\\n')
+'''
+
+SCRIPTS = [
+    ('interpreter', 'pass'),
+    ('import', 'import src.parser'),
+    ('first statement', "from src.parser import Parser\n"
+                        "Parser().parse('\\tnop\\n')"),
+    ('validated tables', BUILD % 'YACCTAB'),
+    ('generated tables', BUILD % "'no_tables'"),
+]
+
+
+def cold_start(args, repeat=5):
+    """Get the lowest wall time of running a command in a new process."""
+    best = None
+
+    for i in xrange(repeat):
+        start = time()
+        subprocess.check_call(args, cwd=ROOT)
+        elapsed = time() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+
+def main(names):
+    path = benchmark_files(names or ['pi'])[0]
+
+    for name, script in SCRIPTS:
+        print '%-20s %8.1fms' \
+              % (name, cold_start([sys.executable, '-c', script]) * 1000)
+
+    elapsed = cold_start([sys.executable, 'main.py', '-v', '0', path])
+    print '%-20s %8.1fms' % ('main.py ' + benchmark_name(path),
+                             elapsed * 1000)
+
+
+if __name__ == '__main__':
+    main(argv[1:])
@@ -0,0 +1,71 @@
+"""
+Peak memory of streaming versus whole-file parsing of a large synthetic
+assembly file. The whole-file parser materializes the complete program, the
+streaming parser keeps only the function that is being parsed.
+
+Usage: python -m bench.stream [ -n SYNTHETIC_LINES ]
+"""
+import os
+import sys
+from time import time
+
+from src.parser import parse_file, iter_file
+from bench.common import run_in_child, synthetic_source
+from bench.memory import peak_rss
+
+
+def whole_file(path):
+    """Parse the complete file into a program."""
+    program = parse_file(path)
+
+    return len(program.parts), max(map(len, program.parts))
+
+
+def streaming(path):
+    """Parse the file one function at a time, dropping each function after
+    it has been parsed."""
+    parts = largest = 0
+
+    for part in iter_file(open(path)):
+        parts += 1
+        largest = max(largest, len(part))
+
+    return parts, largest
+
+
+def measure(parse, path):
+    """Run a parse function in a child process, return its result, the peak
+    memory growth and the elapsed time."""
+    def child():
+        before = peak_rss()
+        start = time()
+        result = parse(path)
+
+        return result, time() - start, peak_rss() - before
+
+    return run_in_child(child)
+
+
+def main(args):
+    lines = 1000000
+
+    if len(args) > 1 and args[0] == '-n':
+        lines = int(args[1])
+
+    path = synthetic_source(lines)
+
+    try:
+        print '%d lines (%d KB)' % (lines, os.path.getsize(path) / 1024)
+        print '%-10s %7s %9s %8s %10s' \
+              % ('mode', 'parts', 'largest', 'time', 'peak (KB)')
+
+        for name, parse in [('whole', whole_file), ('streaming', streaming)]:
+            (parts, largest), elapsed, peak = measure(parse, path)
+            print '%-10s %7d %9d %7.2fs %10d' \
+                  % (name, parts, largest, elapsed, peak / 1024)
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
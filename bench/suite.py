@@ -0,0 +1,239 @@
+"""
+Benchmark suite of the optimizer: every bundled benchmark (and a synthetic
+input of the given number of lines) is parsed, optimized and written several
+times, each time in a new child process. For each input, the lowest parse,
+analysis, optimization and write times and the lowest peak memory growth are
+recorded, along with the number of iterations to reach a fixpoint and the
+number of instructions and the estimated number of loads and stores before
+and after optimization.
+
+The results are compared with a baseline JSON file, and the suite fails if a
+metric exceeds its baseline value by more than its threshold (a fraction of
+the baseline value). To compare results of machines (or moments) with a
+different speed, the baseline times are scaled by the time of a fixed
+calibration loop that runs before each input, which is stored in the baseline
+as well. Differences below MIN_TIME seconds or MIN_MEMORY bytes are
+considered noise.
+
+Usage: python -m bench.suite [ -r REPEAT ] [ -n SYNTHETIC_LINES ]
+                             [ -b BASELINE ] [ -t METRIC=THRESHOLD ... ]
+                             [ -s ] [ BENCHMARK ... ]
+  -s   save the results as the new baseline instead of comparing them
+"""
+import json
+import os
+import resource
+import sys
+from time import time
+
+from src.parser import parse_file
+from bench.common import benchmark_files, benchmark_name, best_of, \
+        run_in_child, synthetic_source
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'baseline.json')
+
+# Metrics and the maximum fraction by which they may exceed the baseline
+THRESHOLDS = {
+    'parse_time': 0.25,
+    'analysis_time': 0.25,
+    'optimize_time': 0.25,
+    'write_time': 0.25,
+    'peak_memory': 0.25,
+    'iterations': 0.0,
+    'optimized_instructions': 0.0,
+    'optimized_memory_accesses': 0.0,
+}
+
+# Differences below this number of seconds or bytes are ignored
+MIN_TIME = 0.005
+MIN_MEMORY = 1024 * 1024
+
+
+def calibration_loop():
+    """A fixed amount of interpreter work, that is used to relate the times
+    of the suite to the speed of the machine."""
+    d = {}
+
+    for i in xrange(50000):
+        d[i & 1023] = d.get(i & 1023, 0) + i
+
+    return d
+
+
+def peak_rss():
+    """Peak resident set size of the current process in bytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run(path):
+    """Parse, optimize and write a file in the current process, and return the
+    measured metrics."""
+    calibration = best_of(calibration_loop, 3)
+    memory = peak_rss()
+
+    start = time()
+    program = parse_file(path)
+    program.verbose = 0
+    parse_time = time() - start
+
+    program.optimize()
+    stats = program.get_stats()
+
+    devnull = open(os.devnull, 'w')
+    start = time()
+    program.write(devnull)
+    write_time = time() - start
+    devnull.close()
+
+    return {
+        'calibration': calibration,
+        'parse_time': parse_time,
+        'analysis_time': stats['analysis_time'],
+        'optimize_time': stats['time'],
+        'write_time': write_time,
+        'peak_memory': peak_rss() - memory,
+        'iterations': max([f.iterations for f in program.functions] + [0]),
+        'original_instructions': stats['original_instructions'],
+        'optimized_instructions': stats['optimized_instructions'],
+        'original_memory_accesses': stats['original_memory_accesses'],
+        'optimized_memory_accesses': stats['optimized_memory_accesses'],
+    }
+
+
+def measure(path, repeat):
+    """Run the suite on a file `repeat' times, each time in a new child
+    process, and return the lowest value of each metric."""
+    result = {}
+
+    for i in xrange(repeat):
+        for metric, value in run_in_child(lambda: run(path)).iteritems():
+            if metric not in result or value < result[metric]:
+                result[metric] = value
+
+    return result
+
+
+def compare(results, baseline, thresholds):
+    """Compare results with a baseline. Returns a list of (input, metric,
+    baseline value, value) tuples of the regressions, where the baseline
+    times are scaled to the calibration time of the results."""
+    regressions = []
+
+    for name, metrics in sorted(results.iteritems()):
+        if name not in baseline:
+            continue
+
+        scale = metrics['calibration'] / baseline[name]['calibration']
+
+        for metric, threshold in sorted(thresholds.iteritems()):
+            value = metrics[metric]
+            base = baseline[name][metric]
+
+            if metric.endswith('_time'):
+                base *= scale
+
+                if value - base < MIN_TIME:
+                    continue
+            elif metric == 'peak_memory' and value - base < MIN_MEMORY:
+                continue
+
+            if value > base * (1 + threshold):
+                regressions.append((name, metric, base, value))
+
+    return regressions
+
+
+def print_results(results):
+    print '%-18s %8s %8s %8s %8s %9s %5s %13s %17s' \
+          % ('input', 'parse', 'analysis', 'optimize', 'write', 'peak (KB)',
+             'iter', 'instructions', 'loads/stores')
+
+    for name, m in sorted(results.iteritems()):
+        print '%-18s %6.1fms %6.1fms %6.1fms %6.1fms %9d %5d %6d->%-6d ' \
+              '%8d->%-8d' \
+              % (name, m['parse_time'] * 1000, m['analysis_time'] * 1000,
+                 m['optimize_time'] * 1000, m['write_time'] * 1000,
+                 m['peak_memory'] / 1024, m['iterations'],
+                 m['original_instructions'], m['optimized_instructions'],
+                 m['original_memory_accesses'],
+                 m['optimized_memory_accesses'])
+
+
+def main(args):
+    repeat = 5
+    synthetic = 30000
+    baseline_path = BASELINE
+    thresholds = dict(THRESHOLDS)
+    save = False
+    names = []
+
+    while args:
+        option = args.pop(0)
+
+        if option == '-r':
+            repeat = int(args.pop(0))
+        elif option == '-n':
+            synthetic = int(args.pop(0))
+        elif option == '-b':
+            baseline_path = args.pop(0)
+        elif option == '-t':
+            metric, threshold = args.pop(0).split('=')
+
+            if metric not in THRESHOLDS:
+                print 'unknown metric "%s"' % metric
+                return 2
+
+            thresholds[metric] = float(threshold)
+        elif option == '-s':
+            save = True
+        else:
+            names.append(option)
+
+    inputs = [(benchmark_name(p), p) for p in benchmark_files(names)]
+
+    if synthetic:
+        inputs.append(('synthetic-%d' % synthetic,
+                       synthetic_source(synthetic)))
+
+    try:
+        results = dict((name, measure(path, repeat)) for name, path in inputs)
+    finally:
+        if synthetic:
+            os.remove(inputs[-1][1])
+
+    print_results(results)
+
+    if save:
+        f = open(baseline_path, 'w')
+        json.dump(results, f, indent=2, separators=(',', ': '),
+                  sort_keys=True)
+        f.write('\n')
+        f.close()
+        print 'Saved baseline in %s' % baseline_path
+
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print 'No baseline found at %s, use -s to create it' % baseline_path
+
+        return 2
+
+    regressions = compare(results, json.load(open(baseline_path)),
+                          thresholds)
+
+    for name, metric, base, value in regressions:
+        print 'REGRESSION %s %s: %.4g -> %.4g (threshold %d%%)' \
+              % (name, metric, base, value, thresholds[metric] * 100)
+
+    if regressions:
+        return 1
+
+    print 'No regressions'
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,156 @@
+"""
+Writer benchmark: the time and peak memory growth of parsing and writing the
+largest bundled benchmark (or a synthetic file), for the previous writer that
+concatenated the output into a single string, for the streaming writer, and
+for the streaming writer fed by the streaming parser. The write time is
+given separately. All outputs are checked to be identical.
+
+Usage: python -m bench.writer [ -n SYNTHETIC_LINES ]
+"""
+import os
+from math import ceil
+from sys import argv
+from tempfile import mkstemp
+from time import time
+
+from src.parser import parse_file, LineParser
+from src.writer import write_stream, TABSIZE, INLINE_COMMENT_LEVEL, \
+        COMMAND_SIZE
+from bench.common import benchmark_files, benchmark_name, run_in_child, \
+        synthetic_source
+from bench.memory import peak_rss
+
+
+def concatenating_writer(f, statements, verbose=0):
+    """The previous writer, which builds the output with string
+    concatenation and writes it at once."""
+    out = ''
+    indent_level = 0
+    prev_comment = False
+
+    for s in statements:
+        current_comment = False
+
+        if s.is_label():
+            line = s.name + ':'
+            indent_level = 1
+        elif s.is_comment():
+            line = '\t' * indent_level + '#' + s.name
+            current_comment = s.get_option('block', True)
+        elif s.is_directive():
+            line = '\t' + s.name
+        else:
+            line = '\t' + s.name
+
+            if len(s):
+                l = len(s.name)
+
+                if l < COMMAND_SIZE:
+                    line += '\t' * int(ceil((COMMAND_SIZE - l)
+                                       / float(TABSIZE)))
+                else:
+                    line += ' '
+
+                line += ','.join(map(str, s))
+
+        comment = ''
+
+        if s.has_inline_comment():
+            comment = s.get_option('comment')
+        elif verbose:
+            comment = ' |'.join(s.get_option('message', []))
+
+        if len(comment):
+            start = INLINE_COMMENT_LEVEL * TABSIZE
+            diff = start - len(line.expandtabs(TABSIZE))
+
+            if diff > 0:
+                tabs = '\t' * int(ceil(diff / float(TABSIZE)))
+            else:
+                tabs = '  '
+
+            line += tabs + '#' + comment
+
+        line += '\n'
+
+        if prev_comment ^ current_comment:
+            out += '\n'
+
+        out += line
+        prev_comment = current_comment
+
+    f.write(out)
+
+
+def parse_and_write(writer, streaming=False):
+    """Create a function that parses the source and writes it to the target
+    with the given writer. Returns the write time."""
+    def run(source, target):
+        if streaming:
+            statements = LineParser().iter_statements(open(source))
+        else:
+            statements = parse_file(source).get_statements()
+
+        start = time()
+        f = open(target, 'w')
+        writer(f, statements)
+        f.close()
+
+        return time() - start
+
+    return run
+
+
+MODES = [('concatenating', parse_and_write(concatenating_writer)),
+         ('streaming', parse_and_write(write_stream)),
+         ('streaming+parse', parse_and_write(write_stream, True))]
+
+
+def measure(run, source, target):
+    """Parse and write a file in a child process, return the total time, the
+    write time and the peak memory growth."""
+    def child():
+        before = peak_rss()
+        start = time()
+        write_time = run(source, target)
+
+        return time() - start, write_time, peak_rss() - before
+
+    return run_in_child(child)
+
+
+def main(args):
+    if len(args) > 1 and args[0] == '-n':
+        name = 'synthetic'
+        source = synthetic_source(int(args[1]))
+    else:
+        name, source = max((os.path.getsize(p), benchmark_name(p), p)
+                           for p in benchmark_files())[1:]
+
+    outputs = []
+
+    try:
+        print '%s (%d KB)' % (name, os.path.getsize(source) / 1024)
+        print '%-16s %9s %9s %10s' % ('mode', 'total', 'write', 'peak (KB)')
+
+        for mode, run in MODES:
+            fd, target = mkstemp(suffix='.s')
+            os.close(fd)
+            outputs.append(target)
+            total, write_time, peak = min(measure(run, source, target)
+                                          for i in xrange(3))
+            print '%-16s %8.1fms %8.1fms %10d' \
+                  % (mode, total * 1000, write_time * 1000, peak / 1024)
+
+        contents = [open(path).read() for path in outputs]
+        print 'identical: %s' % all(c == contents[0] for c in contents)
+    finally:
+        for path in outputs:
+            os.remove(path)
+
+        if name == 'synthetic':
+            os.remove(source)
+
+
+if __name__ == '__main__':
+    main(argv[1:])
@@ -1,16 +1,20 @@
 #!/usr/bin/python
-from sys import argv, exit
+from sys import argv, exit, stdout
 
 from src.parser import parse_file
+from src.stats import save_stats
 
 
-options = {'-v': 1}
+options = {'-v': 1, '-j': 1}
 
 
 # Parse arguments
 def exit_with_usage():
     print 'Usage: python %s [ options ] SOURCE_FILE' % argv[0]
-    print 'options: -i SOURCE_OUT_FILE | -o OUT_FILE | -v VERBOSE_LEVEL'
+    print 'options: -i SOURCE_OUT_FILE | -o OUT_FILE | -v VERBOSE_LEVEL ' \
+          '| -j JOBS | -s STATS_FILE'
+    print 'use - as SOURCE_OUT_FILE, OUT_FILE or STATS_FILE to write to ' \
+          'stdout'
     exit(1)
 
 
@@ -23,7 +27,7 @@ elif len(argv) > 2:
         exit_with_usage()
 
     for i, option in enumerate(argv[1:-1:2]):
-        if option not in ['-i', '-o', '-v']:
+        if option not in ['-i', '-o', '-v', '-j', '-s']:
             print 'unknown option "%s"' % option
             exit(1)
 
@@ -34,6 +38,13 @@ elif len(argv) > 2:
         options[option] = values[i]
 
 
+def save(program, filename):
+    if filename == '-':
+        program.write(stdout)
+    else:
+        program.save(filename)
+
+
 # Parse file
 program = parse_file(argv[-1])
 program.verbose = int(options['-v'])
@@ -41,13 +52,21 @@ program.verbose = int(options['-v'])
 
 # Save input assembly in new file for easy comparison
 if '-i' in options:
-    program.save(options['-i'])
+    save(program, options['-i'])
 
 
-# Perform optimizations
-program.optimize()
+# Perform optimizations, optionally in parallel worker processes
+program.optimize(jobs=int(options['-j']))
 
 
 # Save output assembly
 if '-o' in options:
-    program.save(options['-o'])
+    save(program, options['-o'])
+
+
+# Save optimization statistics as JSON
+if '-s' in options:
+    if options['-s'] == '-':
+        save_stats(program.get_stats(), stdout)
+    else:
+        program.save_stats(options['-s'])
@@ -0,0 +1,187 @@
+from time import time
+
+from statement import Block
+from dataflow import find_leaders, generate_flow_graph
+from dominator import get_dominators
+
+import liveness
+import reaching_definitions
+import copy_propagation
+
+
+# Analyses of the basic blocks of a function. Each analysis has a function
+# that creates it from scratch and, optionally, a function that updates it
+# after the statements of some blocks have changed. All analyses depend on the
+# flow graph, and are discarded when the basic blocks are recreated.
+ANALYSES = {
+    'liveness': (liveness.create_in_out, liveness.update_in_out),
+    'reaching': (reaching_definitions.create_in_out,
+                 reaching_definitions.update_in_out),
+    'copies': (copy_propagation.create_in_out, copy_propagation.update_in_out),
+    'dominators': (get_dominators, None),
+}
+
+# The dataflow analyses, in the order in which they are created
+DATAFLOW = ('liveness', 'reaching', 'copies')
+
+
+class AnalysisManager(object):
+    """
+    Manager of the basic blocks, flow graph and analyses of a function. An
+    analysis is computed when it is first requested and cached until a change
+    of the statements invalidates it. If the block boundaries have not changed
+    since the flow graph was created, an outdated analysis is only updated for
+    the blocks that have changed.
+    """
+    # Whether to update outdated analyses incrementally, instead of creating
+    # them from scratch
+    incremental = True
+
+    def __init__(self, function):
+        self.function = function
+        self.reset()
+
+        # Statistics, times are in seconds
+        self.full_analyses = 0
+        self.incremental_analyses = 0
+        self.analysis_time = 0.0
+        self.analysis_saved = 0.0
+
+        # Time of the last full computation of each analysis
+        self.full_time = {}
+
+    def __getstate__(self):
+        """The block administration is dropped when pickling, the function
+        recreates it using rebuild()."""
+        state = dict(self.__dict__)
+        state['outdated'] = {}
+        state['layout'] = None
+
+        return state
+
+    def reset(self):
+        """Discard the flow graph and all analyses."""
+        self.valid = set()
+
+        # Blocks that have changed since each outdated analysis was computed
+        self.outdated = {}
+
+        # Labels and jumps at the block boundaries of the flow graph
+        self.layout = None
+
+    def block_layout(self):
+        """Get the offsets of the blocks in the statement list, along with the
+        labels and jumps at the block boundaries that determine the flow
+        graph edges."""
+        offsets = []
+        edges = []
+        offset = 0
+
+        for b in self.function.blocks:
+            offsets.append(offset)
+            offset += len(b)
+
+            if not len(b):
+                edges.append(None)
+                continue
+
+            first, last = b[0], b[-1]
+            edges.append((first.name if first.is_label() else None,
+                          (last.name, last[-1]) if last.is_jump() else None))
+
+        return offsets, edges
+
+    def blocks_unchanged(self):
+        """Check if the statement list of the function still divides into the
+        basic blocks and flow graph of the current blocks."""
+        if self.layout is None:
+            return False
+
+        offsets, edges = self.block_layout()
+
+        return edges == self.layout \
+               and find_leaders(self.function.statements) == offsets
+
+    def create_flow_graph(self):
+        """Divide the statement list of the function into basic blocks and
+        generate the flow graph. This discards all analyses."""
+        f = self.function
+
+        with f.id_space():
+            f.analysis_bid = Block.next_bid
+            f.find_basic_blocks()
+
+        generate_flow_graph(f.blocks)
+        self.reset()
+        self.layout = self.block_layout()[1]
+
+    def flow_graph(self):
+        """Get the basic blocks of the function. The blocks are only recreated
+        if the function has a statement list that no longer divides into the
+        current blocks."""
+        f = self.function
+
+        if hasattr(f, 'statements'):
+            if self.incremental and self.blocks_unchanged():
+                del f.statements
+            else:
+                start = time()
+                self.create_flow_graph()
+                self.analysis_time += time() - start
+
+        return f.blocks
+
+    def require(self, *names):
+        """Make sure that the given analyses of the basic blocks are up to
+        date. Returns the basic blocks."""
+        blocks = self.flow_graph()
+
+        for name in names:
+            if name in self.valid:
+                continue
+
+            create, update = ANALYSES[name]
+            touched = self.outdated.pop(name, None)
+            start = time()
+
+            if touched is not None and update is not None \
+                    and self.incremental:
+                update(blocks, filter(touched.__contains__, blocks))
+                elapsed = time() - start
+                self.incremental_analyses += 1
+                saved = self.full_time.get(name, 0) - elapsed
+                self.analysis_saved += max(saved, 0)
+            else:
+                create(blocks)
+                elapsed = self.full_time[name] = time() - start
+                self.full_analyses += 1
+
+            self.analysis_time += elapsed
+            self.valid.add(name)
+
+        return blocks
+
+    def invalidate(self, touched, preserved=()):
+        """Mark the analyses that are not preserved as outdated, after the
+        statements of the touched blocks have changed."""
+        for name in self.valid | set(self.outdated):
+            if name not in preserved:
+                self.valid.discard(name)
+                self.outdated.setdefault(name, set()).update(touched)
+
+    def invalidate_flow_graph(self):
+        """Mark the basic blocks as outdated, after the statement list of the
+        function has changed. The blocks and all analyses are recreated when
+        they are requested."""
+        self.reset()
+
+    def rebuild(self):
+        """Recreate the basic blocks and the analyses that were valid, from
+        the statement list of the function."""
+        valid = self.valid
+        self.create_flow_graph()
+
+        for name in sorted(valid):
+            ANALYSES[name][0](self.function.blocks)
+
+        self.valid = valid
@@ -0,0 +1,110 @@
+class Numbering(object):
+    """
+    Numbering of the items (registers, statement ids or copies) that occur in
+    a dataflow analysis. Each item is assigned a bit index, so that sets of
+    items can be represented by the bits of an integer.
+    """
+    __slots__ = ('items', 'index')
+
+    def __init__(self, items=[]):
+        self.items = []
+        self.index = {}
+
+        for item in items:
+            self.number(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def number(self, item):
+        """Get the bit index of an item, assign a new index if the item has
+        not been numbered yet."""
+        try:
+            return self.index[item]
+        except KeyError:
+            i = self.index[item] = len(self.items)
+            self.items.append(item)
+
+            return i
+
+    def bit(self, item):
+        """Get the bit mask of a single item."""
+        return 1 << self.number(item)
+
+    def empty(self):
+        """Create an empty bit set."""
+        return BitSet(self, 0)
+
+    def set(self, items=[]):
+        """Create a bit set of the given items."""
+        bits = 0
+
+        for item in items:
+            bits |= 1 << self.number(item)
+
+        return BitSet(self, bits)
+
+
+class BitSet(object):
+    """
+    Immutable set of numbered items, represented by the bits of an integer.
+    Union, intersection, difference and equality are therefore single integer
+    operations. Iteration yields the original items, which provides a readable
+    view of the set. A bit set compares equal to a regular set with the same
+    items.
+    """
+    __slots__ = ('numbering', 'bits')
+
+    def __init__(self, numbering, bits=0):
+        self.numbering = numbering
+        self.bits = bits
+
+    def __or__(self, other):
+        return BitSet(self.numbering, self.bits | other.bits)
+
+    def __and__(self, other):
+        return BitSet(self.numbering, self.bits & other.bits)
+
+    def __sub__(self, other):
+        return BitSet(self.numbering, self.bits & ~other.bits)
+
+    def __contains__(self, item):
+        i = self.numbering.index.get(item)
+
+        return i is not None and bool(self.bits >> i & 1)
+
+    def __eq__(self, other):
+        if isinstance(other, BitSet):
+            return self.bits == other.bits
+
+        return set(self) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __nonzero__(self):
+        return self.bits != 0
+
+    def __len__(self):
+        return bin(self.bits).count('1')
+
+    def __iter__(self):
+        items = self.numbering.items
+        bits = self.bits
+
+        while bits:
+            lowest = bits & -bits
+            yield items[lowest.bit_length() - 1]
+            bits ^= lowest
+
+    def __str__(self):
+        return '{%s}' % ', '.join(map(str, self))
+
+    def __repr__(self):
+        return '<BitSet %s>' % str(self)
+
+    def add(self, item):
+        """Create a new bit set with an item added to this set."""
+        return BitSet(self.numbering, self.bits | self.numbering.bit(item))
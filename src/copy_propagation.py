@@ -1,62 +1,159 @@
-from dataflow import pred
-from liveness import RESERVED_REGISTERS
+from operator import and_
 
+from dataflow import solve, affected, succ
+from liveness import RESERVED_REGISTERS, CALLEE_SAVED_REGS
+from bitset import Numbering, BitSet
 
-def create_gen_kill(block):
-    block.c_gen = set()
-    block.c_kill = set()
+
+# Registers that are preserved by a function call
+CALLEE_SAVED = frozenset(CALLEE_SAVED_REGS
+                         + ['$f%d' % i for i in range(20, 32)]
+                         + RESERVED_REGISTERS)
+
+
+class Copies(object):
+    """Numbering of all copy statements x = y in a program, along with the bit
+    set of copies in which each register is involved and the bit set of copies
+    that are invalidated by a function call. An existing numbering can be
+    reused to keep the bits of earlier copies."""
+    def __init__(self, blocks, numbering=None):
+        self.numbering = Numbering() if numbering is None else numbering
+        self.involved = {}
+        self.clobbered = 0
+
+        # Bits of the copies that occur in the program
+        self.present = 0
+
+        for b in blocks:
+            for s in b:
+                if s.is_command('move'):
+                    x, y = s
+
+                    if x not in RESERVED_REGISTERS \
+                            and y not in RESERVED_REGISTERS:
+                        bit = self.numbering.bit((x, y))
+                        self.present |= bit
+
+                        for reg in (x, y):
+                            self.involved[reg] = \
+                                    self.involved.get(reg, 0) | bit
+
+                        if x not in CALLEE_SAVED or y not in CALLEE_SAVED:
+                            self.clobbered |= bit
+
+
+def create_gen_kill(block, copies=None):
+    if copies is None:
+        copies = Copies([block])
+
+    c_gen = 0
+    c_kill = 0
 
     for s in block:
+        # An assignment to x or y kills the copy statement x = y, a function
+        # call kills all copies of registers that are not preserved
+        killed = 0
+
+        for reg in s.get_def():
+            killed |= copies.involved.get(reg, 0)
+
+        if s.is_command('jal'):
+            killed |= copies.clobbered
+
+        c_gen &= ~killed
+        c_kill |= killed
+
         if s.is_command('move'):
             # An occurrence of a copy statement generates this statement
             x, y = s
 
             if x not in RESERVED_REGISTERS and y not in RESERVED_REGISTERS:
-                block.c_gen.add((x, y))
-        else:
-            # An assignment to x or y kills the copy statement x = y
-            block.c_kill |= set(s.get_def())
-            #for reg in s.get_def():
-            #    block.c_kill.add(reg)
-            #    print 'kill of %s' % reg
+                c_gen |= copies.numbering.bit((x, y))
+
+    block.c_gen = BitSet(copies.numbering, c_gen)
+    block.c_kill = BitSet(copies.numbering, c_kill)
 
 
 def create_in_out(blocks):
-    """Generate the `in' and `out' sets of the given blocks using the iterative
-    algorithm from the lecture slides."""
+    """Generate the `in' and `out' sets of the given blocks using the worklist
+    dataflow solver. Returns the number of iterations needed."""
+    copies = blocks[0].copies = Copies(blocks)
+
     # Create gen/kill sets
     for b in blocks:
-        create_gen_kill(b)
-        b.copy_in = set()
-        b.copy_out = set()
-
-    # in[B1] = {} where B1 is the initial block
-    blocks[0].copy_in = set()
-
-    #def create_sets(b, first=False):
-    for i, b in enumerate(blocks):
-        # in[B1] = {} where B1 is the initial block
-        # in[B] = intersection of out[P] for P in pred(B) for B not initial
-        if i:
-            b.copy_in = set()
-
-            for p in pred(b):
-                b.copy_in &= p.copy_out
+        create_gen_kill(b, copies)
 
-        # out[B] = c_gen[B] | (in[B] - c_kill[B])
-        in_minus_kill = set()
+    # out[B] = c_gen[B] | (in[B] - c_kill[B])
+    transfer = lambda b, copy_in: b.c_gen | (copy_in - b.c_kill)
 
-        for x, y in b.copy_in:
-            if x not in b.c_kill and y not in b.c_kill:
-                print '%s, %s not in c_kill' % (x, y)
-                in_minus_kill.add((x, y))
+    # in[B1] = {} where B1 is the initial block
+    # in[B] = intersection of out[P] for P in pred(B) for B not initial
+    empty = copies.numbering.empty()
+    universe = BitSet(copies.numbering, copies.present)
+    copy_in, copy_out, iterations = solve(blocks, True, and_, transfer, empty,
+                                          universe)
 
-        b.copy_out = b.c_gen | in_minus_kill
+    for b in blocks:
+        b.copy_in = copy_in[b]
+        b.copy_out = copy_out[b]
+
+    return iterations
+
+
+def update_in_out(blocks, touched):
+    """Update the `in' and `out' sets after the statements of the touched
+    blocks have changed, without changing the flow graph. The `gen' and `kill'
+    sets are only recreated for the touched blocks and for the blocks that
+    kill a copy that has been added or removed. Returns the number of
+    iterations needed."""
+    old = blocks[0].copies
+    copies = blocks[0].copies = Copies(blocks, old.numbering)
+
+    registers = set(reg for reg in set(old.involved) | set(copies.involved)
+                    if old.involved.get(reg) != copies.involved.get(reg))
+    clobbered = old.clobbered != copies.clobbered
+    outdated = set(touched)
+
+    if registers or clobbered:
+        for b in blocks:
+            if b not in outdated and any(
+                    registers.intersection(s.get_def())
+                    or (clobbered and s.is_command('jal')) for s in b):
+                outdated.add(b)
+
+    changed = []
+
+    for b in outdated:
+        c_gen, c_kill = b.c_gen, b.c_kill
+        create_gen_kill(b, copies)
+
+        if b.c_gen != c_gen or b.c_kill != c_kill:
+            changed.append(b)
+
+    # Blocks that are not reachable from the initial block start with the
+    # universe, which includes the new copies
+    if copies.present & ~old.present:
+        reachable = set(succ(blocks[0]))
+        reachable.add(blocks[0])
+        changed.extend(b for b in blocks if b not in reachable)
+
+    if not changed:
+        return 0
+
+    transfer = lambda b, copy_in: b.c_gen | (copy_in - b.c_kill)
+    empty = copies.numbering.empty()
+    universe = BitSet(copies.numbering, copies.present)
+    values = (dict((b, b.copy_in) for b in blocks),
+              dict((b, b.copy_out) for b in blocks))
+    copy_in, copy_out, iterations = solve(blocks, True, and_, transfer, empty,
+                                          universe, affected(changed, True),
+                                          values)
 
-        #for successor in b.edges_to:
-        #    create_sets(successor)
+    for b in blocks:
+        b.copy_in = copy_in[b]
+        b.copy_out = copy_out[b]
 
-    #create_sets(blocks[0], True)
+    return iterations
 
 
 #def propagate_copies(block):
@@ -1,23 +1,54 @@
-from copy import copy
+from heapq import heappush, heappop
 
 from statement import Block
 
 
 class BasicBlock(Block):
+    __slots__ = ('edges_to', 'edges_from', 'edge_set', 'succ_cache',
+                 'pred_cache', 'dominates', 'dominated_by', 'dummy', 'dom',
+                 # Liveness
+                 'use_set', 'def_set', 'live_in', 'live_out',
+                 # Reaching definitions (defs is only set on the entry block)
+                 'reg_defs', 'gen_set', 'kill_set', 'reach_in', 'reach_out',
+                 'defs',
+                 # Copy propagation (copies is only set on the entry block)
+                 'c_gen', 'c_kill', 'copy_in', 'copy_out', 'copies')
+
+    # Version of the flow graph edges, which is incremented on every edge
+    # change to invalidate the cached predecessor/successor closures
+    edge_version = 0
+
     def __init__(self, statements=[], dummy=False):
         Block.__init__(self, statements)
         self.edges_to = []
         self.edges_from = []
 
+        # Set of successors for constant-time edge membership checks
+        self.edge_set = set()
+
+        # Cached closures as (edge version, blocks, set of blocks) tuples
+        self.succ_cache = None
+        self.pred_cache = None
+
         self.dominates = []
         self.dominated_by = []
+        self.dom = None
 
         self.dummy = dummy
 
     def add_edge_to(self, block):
-        if block not in self.edges_to:
+        if block not in self.edge_set:
+            self.edge_set.add(block)
             self.edges_to.append(block)
             block.edges_from.append(self)
+            BasicBlock.edge_version += 1
+
+    def remove_edge_to(self, block):
+        if block in self.edge_set:
+            self.edge_set.remove(block)
+            self.edges_to.remove(block)
+            block.edges_from.remove(self)
+            BasicBlock.edge_version += 1
 
     def set_dominates(self, block):
         if block not in self.dominates:
@@ -31,26 +62,26 @@ def find_leaders(statements, return_jump_targets=False):
       1. The first statement.
       2. Any statement that is the target of a jump.
       3. Any statement that follows directly follows a jump.
-    - To determine the leaders, a list of known jump targets is created. This
-      list can also be returned for later use.
+    - To determine the leaders, a set of known jump targets is created. This
+      set can also be returned for later use.
     """
-    leaders = [0]
-    jump_targets = []
+    leaders = set([0])
+    jump_targets = set()
 
     # Append statements following jumps and save jump target labels
     for i, statement in enumerate(statements[1:]):
         if statement.is_jump():
-            leaders.append(i + 2)
-            jump_targets.append(statement[-1])
+            if i + 2 < len(statements):
+                leaders.add(i + 2)
+
+            jump_targets.add(statement[-1])
 
     # Append jump targets
     for i, statement in enumerate(statements[1:]):
-        if i + 1 not in leaders \
-                and statement.is_label() \
-                and statement.name in jump_targets:
-            leaders.append(i + 1)
+        if statement.is_label() and statement.name in jump_targets:
+            leaders.add(i + 1)
 
-    leaders.sort()
+    leaders = sorted(leaders)
 
     return (leaders, jump_targets) if return_jump_targets else leaders
 
@@ -72,29 +103,38 @@ def find_basic_blocks(statements, return_jump_targets=False):
     return (blocks, jump_targets) if return_jump_targets else blocks
 
 
+def index_labels(blocks):
+    """Create a dictionary that maps each label to the blocks that start with
+    that label."""
+    labels = {}
+
+    for b in blocks:
+        if len(b) and b[0].is_label():
+            labels.setdefault(b[0].name, []).append(b)
+
+    return labels
+
+
 def generate_flow_graph(blocks):
     """Add flow graph edge administration of an ordered sequence of basic
     blocks."""
     #dummy_block = blocks[-1]
+    labels = index_labels(blocks)
 
     for i, b in enumerate(blocks):
         last_statement = b[-1]
 
         if last_statement.is_jump():
-            target = last_statement.jump_target()
-
-            # Compare the target to all leading labels, add an edge if the
-            # label matches the jump target
-            #target_found = False
-
-            for other in blocks:
-                if other[0].is_label(target):
+            # Add an edge to the blocks that start with the jump target label.
+            # A function call returns to the next block, so the called
+            # function itself is not a successor
+            if last_statement.name != 'jal':
+                for other in labels.get(last_statement.jump_target(), []):
                     b.add_edge_to(other)
-                    #target_found = True
 
             # If the jump target is outside the program, add an edge to the
             # dummy block
-            #if not target_found:
+            #if last_statement.jump_target() not in labels:
             #    b.add_edge_to(dummy_block)
 
             # A branch and jump-and-line instruction also creates an edge to
@@ -106,25 +146,193 @@ def generate_flow_graph(blocks):
             b.add_edge_to(blocks[i + 1])
 
 
-def pred(block, known=[]):
-    """Recursively find all predecessors of a node."""
-    direct = filter(lambda b: b != block and b not in known, block.edges_from)
-    p = copy(direct)
+def successors(block):
+    """Get the direct successors of a node."""
+    return block.edges_to
+
+
+def predecessors(block):
+    """Get the direct predecessors of a node."""
+    return block.edges_from
+
+
+def _closure(block, direct, cache_attr):
+    """Find all nodes that are reachable from a node using the given direct
+    neighbour function, in breadth-first order. The node itself is excluded.
+    The result is cached on the node until the flow graph edges change."""
+    cache = getattr(block, cache_attr)
+
+    if cache is not None and cache[0] == BasicBlock.edge_version:
+        return cache
+
+    visited = set([block])
+    found = []
+
+    for b in direct(block):
+        if b not in visited:
+            visited.add(b)
+            found.append(b)
+
+    for b in found:
+        for neighbour in direct(b):
+            if neighbour not in visited:
+                visited.add(neighbour)
+                found.append(neighbour)
+
+    visited.discard(block)
+    cache = (BasicBlock.edge_version, tuple(found), frozenset(visited))
+    setattr(block, cache_attr, cache)
+
+    return cache
+
+
+def pred(block):
+    """Find all predecessors of a node."""
+    return _closure(block, predecessors, 'pred_cache')[1]
+
+
+def succ(block):
+    """Find all successors of a node."""
+    return _closure(block, successors, 'succ_cache')[1]
+
+
+def is_reachable(source, target):
+    """Check if there is a path from one node to another (different) node."""
+    return target in _closure(source, successors, 'succ_cache')[2]
+
+
+def postorder(blocks, reachable_only=False):
+    """Order blocks in postorder of a depth-first traversal of the flow graph,
+    starting at the first block. Blocks that are not reachable from the first
+    block are traversed afterwards in program order, unless `reachable_only'
+    is True."""
+    visited = set()
+    order = []
+
+    for root in blocks[:1] if reachable_only else blocks:
+        if root in visited:
+            continue
+
+        visited.add(root)
+        stack = [(root, iter(successors(root)))]
+
+        while stack:
+            block, targets = stack[-1]
+
+            for successor in targets:
+                if successor not in visited:
+                    visited.add(successor)
+                    stack.append((successor, iter(successors(successor))))
+                    break
+            else:
+                stack.pop()
+                order.append(block)
+
+    return order
+
+
+def affected(blocks, forward):
+    """Find the blocks whose dataflow values may depend on the local sets of
+    the given blocks: the blocks themselves and all blocks that are reachable
+    from them, along the flow graph edges for a forward problem or against
+    them for a backward problem."""
+    direct = successors if forward else predecessors
+    found = list(blocks)
+    visited = set(found)
+
+    for b in found:
+        for neighbour in direct(b):
+            if neighbour not in visited:
+                visited.add(neighbour)
+                found.append(neighbour)
+
+    return visited
+
+
+def solve(blocks, forward, meet, transfer, boundary, initial, region=None,
+          values=None):
+    """
+    Solve a dataflow problem on a flow graph using the worklist algorithm.
+    - forward: True for a forward problem, False for a backward problem.
+    - meet(a, b): combine the values of two predecessors (forward) or
+      successors (backward), e.g. union or intersection.
+    - transfer(block, value): compute the `out' value of a block from its `in'
+      value (forward), or the `in' value from the `out' value (backward).
+    - boundary: the `in' value of the first block and blocks without
+      predecessors (forward), or the `out' value of blocks without successors
+      (backward).
+    - initial: the initial value of the other side of each block, i.e. the top
+      element of the meet operation.
+    - region: if given, only the values of these blocks are recomputed. The
+      values of the other blocks are taken from the previous solution
+      `values', an (in, out) tuple, so the region must contain all blocks
+      whose values may have changed (see affected()).
+    The worklist is ordered by reverse postorder for forward problems and by
+    postorder for backward problems, so that most blocks are evaluated after
+    the blocks their value depends on. Returns a tuple (in, out, iterations),
+    where `in' and `out' map each block to its value and `iterations' is the
+    number of transfer function evaluations.
+    """
+    order = postorder(blocks)
+
+    if forward:
+        order.reverse()
+
+    priority = dict((b, i) for i, b in enumerate(order))
+
+    if region is None:
+        region = priority
+        values_in = {}
+        values_out = {}
+    else:
+        values_in = dict(values[0])
+        values_out = dict(values[1])
+
+    result = values_out if forward else values_in
+
+    for b in region:
+        result[b] = initial
+
+    # Evaluate every block in the region at least once
+    work_list = sorted(priority[b] for b in region)
+    pending = set(work_list)
+    iterations = 0
+
+    while work_list:
+        i = heappop(work_list)
+        pending.discard(i)
+        b = order[i]
+        iterations += 1
+
+        if forward:
+            sources, targets = predecessors(b), successors(b)
+        else:
+            sources, targets = successors(b), predecessors(b)
+
+        sources = [result[s] for s in sources if s in priority]
+
+        if not sources or (forward and b is blocks[0]):
+            value = boundary
+        else:
+            value = reduce(meet, sources)
 
-    for predecessor in direct:
-        p += pred(predecessor, known + direct)
-        return p
+        new = transfer(b, value)
 
-    return p
+        if forward:
+            values_in[b] = value
+        else:
+            values_out[b] = value
 
+        # If the result has changed, the blocks that depend on it must be
+        # evaluated again
+        if new != result[b]:
+            result[b] = new
 
-def succ(block, known=[]):
-    """Recursively find all successors of a node."""
-    direct = filter(lambda b: b != block and b not in known, block.edges_to)
-    s = copy(direct)
+            for target in targets:
+                j = priority.get(target)
 
-    for successor in direct:
-        s += succ(successor, known + direct)
-        return s
+                if j is not None and j not in pending and target in region:
+                    pending.add(j)
+                    heappush(work_list, j)
 
-    return s
+    return values_in, values_out, iterations
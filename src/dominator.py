@@ -1,50 +1,149 @@
-from copy import copy
+from dataflow import BasicBlock, predecessors, postorder
 
 
-def generate_dominator_tree(nodes):
-    """Add dominator administration to the given flow graph nodes."""
-    # Dominator of the start node is the start itself
-    nodes[0].dom = set([nodes[0]])
+class Dominators(object):
+    """
+    Dominator information of a flow graph, computed with the iterative
+    algorithm of Cooper, Harvey and Kennedy ("A Simple, Fast Dominance
+    Algorithm"):
+    - idom: maps each node to its immediate dominator (None for the entry
+      node and for nodes that are not reachable from the entry node).
+    - children: maps each node to the nodes it immediately dominates.
+    - frontier: maps each node to its dominance frontier.
+    """
+    def __init__(self, nodes):
+        self.entry = nodes[0]
+        self.edge_version = BasicBlock.edge_version
 
-    # For all other nodes, set all nodes as the dominators
-    for n in nodes[1:]:
-        n.dom = set(copy(nodes))
+        # Only nodes that are reachable from the entry node are dominated
+        order = postorder(nodes, reachable_only=True)
+        number = dict((b, i) for i, b in enumerate(order))
+        idom = {self.entry: self.entry}
 
-    def pred(n, known=[]):
-        """Recursively find all predecessors of a node."""
-        direct = filter(lambda x: x not in known, n.edges_from)
-        p = copy(direct)
+        def intersect(a, b):
+            while a is not b:
+                while number[a] < number[b]:
+                    a = idom[a]
 
-        for ancestor in direct:
-            p += pred(ancestor, direct)
+                while number[b] < number[a]:
+                    b = idom[b]
 
-        return p
+            return a
 
-    # Iteratively eliminate nodes that are not dominators
-    changed = True
+        changed = True
 
-    while changed:
-        changed = False
+        while changed:
+            changed = False
 
-        for n in nodes[1:]:
-            old_dom = n.dom
-            intersection = lambda p1, p2: p1.dom & p2.dom
-            n.dom = set([n]) | reduce(intersection, pred(n), set([]))
+            for b in reversed(order[:-1]):
+                new_idom = None
 
-            if n.dom != old_dom:
-                changed = True
+                for p in predecessors(b):
+                    if p in idom:
+                        new_idom = p if new_idom is None \
+                                   else intersect(p, new_idom)
 
-    def idom(d, n):
-        """Check if d immediately dominates n."""
-        for b in n.dom:
-            if b != d and b != n and b in n.dom:
-                return False
+                if idom.get(b) is not new_idom:
+                    idom[b] = new_idom
+                    changed = True
 
-        return True
+        idom[self.entry] = None
+        self.idom = dict((b, idom.get(b)) for b in nodes)
+        self.children = dict((b, []) for b in nodes)
 
-    # Build tree using immediate dominators
-    for n in nodes:
-        for d in n.dom:
-            if idom(d, n):
-                d.set_dominates(n)
+        for b in reversed(order):
+            if idom[b] is not None:
+                self.children[idom[b]].append(b)
+
+        # Number the dominator tree in pre- and postorder, so that dominance
+        # can be checked in constant time
+        self.pre = {}
+        self.post = {}
+        stack = [(self.entry, iter(self.children[self.entry]))]
+        self.pre[self.entry] = 0
+        counter = 1
+
+        while stack:
+            b, children = stack[-1]
+
+            for child in children:
+                self.pre[child] = counter
+                counter += 1
+                stack.append((child, iter(self.children[child])))
                 break
+            else:
+                stack.pop()
+                self.post[b] = counter
+                counter += 1
+
+        # Dominance frontiers: a join point is in the frontier of each node on
+        # the dominator tree path from its predecessors up to its immediate
+        # dominator
+        self.frontier = dict((b, set()) for b in nodes)
+
+        for b in order:
+            preds = [p for p in predecessors(b) if p in number]
+
+            if len(preds) < 2:
+                continue
+
+            for p in preds:
+                runner = p
+
+                while runner is not idom[b]:
+                    self.frontier[runner].add(b)
+                    runner = idom[runner]
+
+    def is_valid(self):
+        """Check if the flow graph has not been changed since the dominators
+        were computed."""
+        return self.edge_version == BasicBlock.edge_version
+
+    def dominates(self, a, b):
+        """Check if node a dominates node b (each node dominates itself)."""
+        if a not in self.pre or b not in self.pre:
+            return False
+
+        return self.pre[a] <= self.pre[b] and self.post[b] <= self.post[a]
+
+    def dominators(self, b):
+        """Get all dominators of a node, starting with the node itself and
+        ending with the entry node."""
+        result = []
+
+        while b is not None:
+            result.append(b)
+            b = self.idom[b]
+
+        return result
+
+
+def get_dominators(nodes):
+    """Get the dominator information of a flow graph (whose first node is the
+    entry node). The result is cached on the entry node until the flow graph
+    edges change."""
+    cached = nodes[0].dom
+
+    if cached is None or not cached.is_valid() \
+            or len(cached.idom) != len(nodes):
+        cached = nodes[0].dom = Dominators(nodes)
+
+    return cached
+
+
+def generate_dominator_tree(nodes):
+    """Add dominator administration to the given flow graph nodes. Returns the
+    dominator information."""
+    dominators = get_dominators(nodes)
+
+    for n in nodes:
+        for d in n.dominated_by:
+            d.dominates.remove(n)
+
+        n.dominated_by = []
+
+    for n in nodes:
+        for child in dominators.children[n]:
+            n.set_dominates(child)
+
+    return dominators
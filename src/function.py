@@ -0,0 +1,518 @@
+from contextlib import contextmanager
+from time import time
+
+from statement import Statement as S, Block
+from dataflow import find_basic_blocks, affected
+from analysis import AnalysisManager, DATAFLOW
+from stats import IterationStats, pass_totals
+from loops import block_frequencies
+
+from optimize_redundancies import remove_redundant_jumps, remove_redundancies,\
+        remove_redundant_branch_jumps
+from optimize_advanced import eliminate_common_subexpressions, \
+        fold_constants, reduce_strength, propagate_copies, \
+        eliminate_dead_code
+from stack_slots import promote_stack_slots
+from memory import forward_stored_values, eliminate_dead_stores
+from loop_invariants import hoist_loop_invariants
+from induction import reduce_induction_variables
+
+
+# Optimizations on all basic blocks of a function at once, along with the
+# analyses that they use and whether they are executed at the start of each
+# iteration or only before the first one. Each returns the set of blocks it
+# has changed, and may insert new blocks (after which the flow graph is
+# rebuilt).
+FUNCTION_PASSES = [
+    (promote_stack_slots, ('dominators',), False),
+    (forward_stored_values, ('dominators',), True),
+    (eliminate_dead_stores, ('dominators',), True),
+    (hoist_loop_invariants, ('dominators', 'liveness'), True),
+    (reduce_induction_variables, ('dominators', 'liveness'), True),
+]
+
+# Optimizations on the statement list of a function
+GLOBAL_PASSES = [remove_redundant_jumps, remove_redundant_branch_jumps]
+
+# Block level optimizations, along with the analyses that they use, the
+# analyses that remain valid when they change a block, and whether they also
+# read and change the successors of a block (the changed successors are added
+# to a set that is passed as second argument)
+BLOCK_PASSES = [
+    (remove_redundancies, (), ('dominators',), False),
+    (eliminate_common_subexpressions, ('liveness',), ('dominators',), False),
+    (fold_constants, (), ('dominators',), False),
+    (reduce_strength, ('liveness',), ('dominators',), False),
+    (propagate_copies, ('reaching', 'copies'), ('dominators',), True),
+    (eliminate_dead_code, ('liveness',), ('dominators',), False),
+]
+
+# The block attributes of each analysis that the block level optimizations
+# read
+ANALYSIS_INPUTS = {
+    'liveness': ('live_out',),
+    'reaching': ('reach_out',),
+    'copies': ('copy_in',),
+    'dominators': (),
+}
+
+
+def directive_name(statement):
+    """Get the name of a directive statement, e.g. '.ent' for '.ent main'."""
+    return statement.name.split(None, 1)[0]
+
+
+def iter_functions(statements):
+    """Divide a sequence of statements into the functions delimited by
+    .ent/.end directives and the global statements (data, directives) in
+    between. This generator yields each part (a Function or a Block of global
+    statements) as soon as it is complete, so only the statements of one part
+    are kept in memory. If there are no functions, the whole statement list
+    is yielded as a single function."""
+    part = []
+    name = None
+    yielded = False
+
+    for s in statements:
+        if s.is_directive():
+            directive = directive_name(s)
+
+            if directive == '.ent' and name is None:
+                if part:
+                    yield Block(part)
+                    yielded = True
+                    part = []
+
+                name = s.name.split()[1] if len(s.name.split()) > 1 else ''
+            elif directive == '.end' and name is not None:
+                part.append(s)
+                yield Function(name, part)
+                yielded = True
+                part = []
+                name = None
+                continue
+
+        part.append(s)
+
+    if not yielded:
+        yield Function(None, part)
+    elif part:
+        yield Function(name, part) if name is not None else Block(part)
+
+
+def split_functions(statements):
+    """Divide a statement list into the functions delimited by .ent/.end
+    directives and the global statements (data, directives) in between. Returns
+    the list of parts in the original order, where each part is either a
+    Function or a Block of global statements. If there are no functions, the
+    whole statement list is returned as a single function."""
+    return list(iter_functions(statements))
+
+
+class Function(Block):
+    """
+    A function, delimited by .ent/.end directives. Each function has its own
+    basic blocks, flow graph and dataflow analysis results, and is optimized
+    independently of the other functions in the program.
+    """
+    def __init__(self, name, statements=[], verbose=0):
+        Block.__init__(self, statements, verbose)
+        self.name = name
+
+        # Whether the function has reached a fixpoint during optimization
+        self.converged = False
+        self.iterations = 0
+
+        # Each function numbers the statements and blocks it creates itself,
+        # so that the numbering does not depend on the order in which
+        # functions are optimized (or on the process they are optimized in)
+        self.next_sid = max([s.sid for s in statements] + [0]) + 1
+        self.next_bid = 1
+
+        # Block ID counter at the time the current blocks were created
+        self.analysis_bid = None
+
+        # Basic blocks, flow graph and analyses
+        self.analyses = AnalysisManager(self)
+
+        # The blocks of the previous round of block level optimizations, the
+        # analysis values that were read in that round and the blocks that
+        # were changed in it
+        self.schedule = None
+
+        # Statistics of each optimization iteration
+        self.stats = []
+
+        # Estimated number of loads and stores in a call of the function,
+        # before and after optimization
+        self.original_accesses = None
+        self.optimized_accesses = None
+
+    def __getstate__(self):
+        """Pickle the function as a flat statement list. The basic blocks and
+        flow graph are rebuilt when unpickling, which avoids deep recursion
+        on the block edges."""
+        state = dict(self.__dict__)
+        state.pop('blocks', None)
+        state['schedule'] = None
+        state['statements'] = self.get_statements()
+        state['verbose'] = self.verbose
+        state['bid'] = self.bid
+        state['has_blocks'] = hasattr(self, 'blocks')
+
+        return state
+
+    def __setstate__(self, state):
+        has_blocks = state.pop('has_blocks')
+        self.statements = state.pop('statements')
+        self.verbose = state.pop('verbose')
+        self.bid = state.pop('bid')
+        self.pointer = 0
+        self.__dict__.update(state)
+
+        # Recreate the blocks with the same IDs as the original ones
+        if has_blocks:
+            next_bid = self.next_bid
+            self.next_bid = self.analysis_bid
+            self.analyses.rebuild()
+            self.next_bid = next_bid
+
+    @contextmanager
+    def id_space(self):
+        """Number the statements and blocks that are created within this
+        context using the counters of the function."""
+        sid, bid = S.next_sid, Block.next_bid
+        S.next_sid, Block.next_bid = self.next_sid, self.next_bid
+
+        try:
+            yield
+        finally:
+            self.next_sid, self.next_bid = S.next_sid, Block.next_bid
+            S.next_sid, Block.next_bid = sid, bid
+
+    def __str__(self):
+        return '<Function name=%s>' % self.name
+
+    def __len__(self):
+        """Get the number of statements in the function."""
+        return len(self.statements) if hasattr(self, 'statements') \
+               else sum(map(len, self.blocks))
+
+    def get_statements(self, add_block_comments=False):
+        """Concatenate the statements of all blocks and return the resulting
+        list."""
+        if hasattr(self, 'statements'):
+            return self.statements
+
+        return list(self.iter_statements(add_block_comments))
+
+    def iter_statements(self, add_block_comments=False):
+        """Iterate over the statements of all blocks, without concatenating
+        them."""
+        if hasattr(self, 'statements'):
+            for s in self.statements:
+                yield s
+
+            return
+
+        # Only add block start and end comments when in verbose mode
+        if not add_block_comments or not self.verbose:
+            for b in self.blocks:
+                for s in b.statements:
+                    yield s
+
+            return
+
+        get_id = lambda b: b.bid
+
+        for b in self.blocks:
+            message = ' Block %d (%d statements), edges from: %s' \
+                      % (b.bid, len(b), map(get_id, b.edges_from))
+
+            if hasattr(b, 'copy_in'):
+                message += ', COPY_in: %s' % sorted(b.copy_in)
+
+            if hasattr(b, 'live_in'):
+                message += ', LIVE_in: %s' % sorted(b.live_in)
+
+            if hasattr(b, 'reach_in'):
+                message += ', REACH_in: %s' % sorted(b.reach_in)
+
+            yield S('comment', message, block=False)
+
+            for s in b.statements:
+                yield s
+
+            message = ' End of block %d, edges to: %s' \
+                      % (b.bid, map(get_id, b.edges_to))
+
+            if hasattr(b, 'copy_out'):
+                message += ', COPY_out: %s' % sorted(b.copy_out)
+
+            if hasattr(b, 'live_out'):
+                message += ', LIVE_out: %s' % sorted(b.live_out)
+
+            if hasattr(b, 'reach_out'):
+                message += ', REACH_out: %s' % sorted(b.reach_out)
+
+            yield S('comment', message, block=False)
+
+    def count_instructions(self):
+        """Count the number of statements that are commands or labels."""
+        return len(filter(lambda s: s.is_command() or s.is_label(),
+                          self.get_statements()))
+
+    def estimate_memory_accesses(self):
+        """Estimate the number of loads and stores that are executed in a call
+        of the function, by weighing the loads and stores in each block with
+        the estimated execution frequency of the block."""
+        blocks = self.analyses.require('dominators')
+        frequencies = block_frequencies(blocks)
+
+        return sum(frequencies[b] * sum(1 for s in b if s.is_memory_access())
+                   for b in blocks)
+
+    def optimize_function(self):
+        """Optimize on function level, by executing each function level
+        optimization once on all basic blocks."""
+        changed = False
+        stats = self.stats[-1]
+
+        for optimization, requires, repeat in FUNCTION_PASSES:
+            if not repeat and self.iterations > 1:
+                continue
+
+            blocks = self.analyses.require(*requires)
+            name = optimization.__name__
+            size = len(self)
+            count = len(blocks)
+            start = time()
+            touched = optimization(blocks)
+            stats.record(name, time() - start, bool(touched),
+                         size - len(self))
+
+            if len(blocks) != count:
+                self.statements = self.get_statements()
+                self.analyses.invalidate_flow_graph()
+                changed = True
+            elif touched:
+                self.analyses.invalidate(touched, ('dominators',))
+                changed = True
+
+        return changed
+
+    def optimize_global(self):
+        """Optimize on a global level."""
+        changed = False
+        stats = self.stats[-1]
+
+        if not hasattr(self, 'statements'):
+            self.statements = self.get_statements()
+
+        for optimization in GLOBAL_PASSES:
+            size = len(self.statements)
+            start = time()
+            rewritten = optimization(self)
+            stats.record(optimization.__name__, time() - start, rewritten,
+                         size - len(self.statements))
+
+            if rewritten:
+                changed = True
+
+        return changed
+
+    def block_inputs(self, blocks, analyses):
+        """Get the values of the given analyses that the block level
+        optimizations read, as a mapping of block attributes to the values of
+        each block."""
+        inputs = {}
+
+        for analysis in analyses:
+            for attr in ANALYSIS_INPUTS[analysis]:
+                inputs[attr] = dict((b, getattr(b, attr)) for b in blocks)
+
+        return inputs
+
+    def worklist(self, passes, blocks, inputs):
+        """Get the blocks on which each optimization has to be executed: all
+        blocks that have been changed in the previous round, or of which an
+        analysis value that the optimization reads has changed. Optimizations
+        that read the successors of a block are also executed on the
+        predecessors of those blocks. For new blocks, all optimizations are
+        executed on all blocks."""
+        if self.schedule is None or self.schedule[0] is not blocks:
+            return [set(blocks) for p in passes]
+
+        previous, old_inputs, touched = self.schedule
+        changed = {}
+
+        for attr, values in inputs.iteritems():
+            old = old_inputs.get(attr, {})
+            changed[attr] = set(b for b, value in values.iteritems()
+                                if b not in old
+                                or value.numbering is not old[b].numbering
+                                or value.bits != old[b].bits)
+
+        worklist = []
+
+        for optimization, requires, preserves, successors in passes:
+            dirty = set(touched)
+
+            for analysis in requires:
+                for attr in ANALYSIS_INPUTS[analysis]:
+                    dirty |= changed[attr]
+
+            worklist.append(affected(dirty, False) if successors else dirty)
+
+        return worklist
+
+    def enqueue(self, worklist, passes, blocks):
+        """Add changed blocks to the worklist of each optimization, so that
+        the optimizations that follow in the current round see the
+        changes."""
+        predecessors = None
+
+        for (optimization, requires, preserves, successors), work in \
+                zip(passes, worklist):
+            if successors:
+                if predecessors is None:
+                    predecessors = affected(blocks, False)
+
+                work |= predecessors
+            else:
+                work.update(blocks)
+
+    def optimize_blocks(self, passes=BLOCK_PASSES):
+        """Optimize on block level, by executing each optimization once on
+        each block. The analyses that the optimizations use are requested
+        before the first block is optimized. An optimization is skipped for a
+        block if neither the block nor the analysis values it reads have
+        changed since the optimization last found nothing to change."""
+        required = []
+
+        for optimization, requires, preserves, successors in passes:
+            required.extend(a for a in requires if a not in required)
+
+        blocks = self.analyses.require(*required)
+        inputs = self.block_inputs(blocks, required)
+        worklist = self.worklist(passes, blocks, inputs)
+
+        changed = False
+        touched = [set() for p in passes]
+        stats = self.stats[-1]
+
+        for block in blocks:
+            for i, (optimization, requires, preserves, successors) \
+                    in enumerate(passes):
+                name = optimization.__name__
+
+                if block not in worklist[i]:
+                    stats.skip(name)
+                    continue
+
+                changed_blocks = set()
+                size = len(block)
+                start = time()
+
+                if successors:
+                    block_changed = optimization(block, changed_blocks)
+                else:
+                    block_changed = optimization(block)
+
+                stats.record(name, time() - start, block_changed,
+                             size - len(block))
+
+                if block_changed:
+                    changed_blocks.add(block)
+                    touched[i] |= changed_blocks
+                    self.enqueue(worklist, passes, changed_blocks)
+                    changed = True
+
+        for (optimization, requires, preserves, successors), changed_blocks \
+                in zip(passes, touched):
+            if changed_blocks:
+                self.analyses.invalidate(changed_blocks, preserves)
+
+        self.schedule = blocks, inputs, set().union(*touched)
+
+        return changed
+
+    def find_basic_blocks(self):
+        """Divide the statement list into basic blocks."""
+        self.blocks = find_basic_blocks(self.statements)
+
+        for b in self.blocks:
+            b.verbose = self.verbose
+
+        del self.statements
+
+    def perform_dataflow_analysis(self):
+        """Perform dataflow analysis:
+           - Divide the statement list into basic blocks
+           - Generate flow graph
+           - Create liveness sets: def, use, in, out
+           - Create reaching definitions sets: gen, kill, in, out
+           - Create copy propagation sets: gen, kill, in, out
+        The blocks and analyses are only recreated if they are outdated."""
+        self.analyses.require(*DATAFLOW)
+
+    def optimize_iteration(self):
+        """Perform a single iteration of the optimization loop. Returns True if
+        the function has changed."""
+        changed = False
+        self.iterations += 1
+        stats = IterationStats(self.iterations)
+        self.stats.append(stats)
+        start = time()
+        analysis_time = self.analyses.analysis_time
+
+        if self.iterations == 1:
+            self.original_accesses = self.estimate_memory_accesses()
+
+        # Optimize on function level
+        with self.id_space():
+            if self.optimize_function():
+                if self.verbose > 1:
+                    print 'changed on function level in %s' % self.name
+
+                changed = True
+
+        # Optimize on a global level
+        with self.id_space():
+            if self.optimize_global():
+                if self.verbose > 1:
+                    print 'changed on global level in %s' % self.name
+
+                self.analyses.invalidate_flow_graph()
+                changed = True
+
+        # Optimize basic blocks
+        with self.id_space():
+            if self.optimize_blocks():
+                if self.verbose > 1:
+                    print 'changed on block level in %s' % self.name
+
+                changed = True
+
+        if not changed:
+            self.converged = True
+            self.optimized_accesses = self.estimate_memory_accesses()
+
+        stats.time = time() - start
+        stats.analysis_time = self.analyses.analysis_time - analysis_time
+        stats.statements = len(self)
+
+        return changed
+
+    def pass_stats(self):
+        """Get the counters of each optimization pass, summed over all
+        iterations."""
+        return pass_totals(self.stats)
+
+    def optimize(self):
+        """Keep optimizing the function until a fixpoint is reached. Returns
+        the number of iterations."""
+        while not self.converged:
+            self.optimize_iteration()
+
+        return self.iterations
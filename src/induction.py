@@ -0,0 +1,458 @@
+import re
+
+from statement import Statement as S
+from liveness import is_reg_dead_after, RESERVED_OUT
+from loops import natural_loops, find_preheader, create_preheader
+from loop_invariants import BlockEffects, RegisterPool, preheader_label, \
+        function_name
+
+
+REGISTER = re.compile('^\$\d+$')
+
+# Registers that are never used as induction variable
+RESERVED = frozenset(['$0', '$1', '$28', '$29', '$30', '$31', '$fp', '$sp'])
+
+
+class Increment(object):
+    """
+    The definition of a basic induction variable of a loop, which adds a
+    loop-invariant step (an integer or a register) to the variable:
+    addu $25, $25, 1
+    or, through a temporary register:
+    addu $2, $25, 1
+    move $25, $2
+    `index' is the position of the definition of the variable in the block,
+    `addition' that of the addu (which is the same statement if there is no
+    temporary).
+    """
+    def __init__(self, block, index, addition, step):
+        self.block = block
+        self.index = index
+        self.addition = addition
+        self.step = step
+
+    def positions(self):
+        return set([(self.block, self.index), (self.block, self.addition)])
+
+
+def added_step(s, reg, defined):
+    """Get the loop-invariant step that an addu adds to a register, or None
+    if the addu is not of that form."""
+    if not s.is_command('addu'):
+        return None
+
+    if s[1] == reg:
+        other = s[2]
+    elif s[2] == reg:
+        other = s[1]
+    else:
+        return None
+
+    if isinstance(other, int) \
+            or (REGISTER.match(other) and other not in defined):
+        return other
+
+
+def find_increments(body, effects, defined):
+    """Find the basic induction variables of a loop: the registers that are
+    defined once in the loop, by adding a loop-invariant step. Returns a
+    dictionary of registers to Increments."""
+    definitions = {}
+
+    for b in body:
+        for i, clobbered in enumerate(effects[b].clobbered):
+            for reg in clobbered:
+                definitions.setdefault(reg, []).append((b, i))
+
+    increments = {}
+
+    for reg, positions in definitions.iteritems():
+        if len(positions) != 1 or not REGISTER.match(reg) \
+                or reg in RESERVED:
+            continue
+
+        b, i = positions[0]
+        s = b[i]
+        step = None
+
+        if s.is_command('addu') and s[0] == reg:
+            addition = i
+            step = added_step(s, reg, defined)
+        elif s.is_command('move') and s[0] == reg and REGISTER.match(s[1]) \
+                and s[1] != reg:
+            # Find the addu that defines the temporary register
+            temporary = s[1]
+            clobbered = effects[b].clobbered
+            addition = i - 1
+
+            while addition >= 0 and temporary not in clobbered[addition] \
+                    and reg not in clobbered[addition]:
+                addition -= 1
+
+            if addition >= 0 and b[addition].is_command('addu') \
+                    and b[addition][0] == temporary:
+                step = added_step(b[addition], reg, defined)
+
+        if step is not None:
+            increments[reg] = Increment(b, i, addition, step)
+
+    return increments
+
+
+def find_derived(body, effects, defined, increments):
+    """Find the address computations of a loop that are derived from a basic
+    induction variable:
+    sll $8, $25, 3
+    addu $2, $8, $4
+    where $25 is a basic induction variable and $4 is loop-invariant. Returns
+    a list of (block, sll index, [addu indices], variable, shift, [bases])
+    tuples."""
+    derived = []
+    excluded = set()
+
+    for increment in increments.itervalues():
+        excluded |= increment.positions()
+
+    for b in body:
+        clobbered = effects[b].clobbered
+
+        for i, s in enumerate(b):
+            if not s.is_command('sll') or s[1] not in increments \
+                    or not isinstance(s[2], int) or s[0] == s[1] \
+                    or not REGISTER.match(s[0]) or s[0] in RESERVED:
+                continue
+
+            scaled, reg, shift = s.args
+            additions = []
+            bases = []
+
+            for k in xrange(i + 1, len(b)):
+                a = b[k]
+
+                if a.is_command('addu') and scaled in a.args[1:] \
+                        and (b, k) not in excluded:
+                    base = a[2] if a[1] == scaled else a[1]
+
+                    if isinstance(base, str) and REGISTER.match(base) \
+                            and base not in defined:
+                        additions.append(k)
+                        bases.append(base)
+
+                if scaled in clobbered[k] or reg in clobbered[k]:
+                    break
+
+            if additions:
+                derived.append((b, i, additions, reg, shift, bases))
+
+    return derived
+
+
+def is_removable(b, index, additions, effects):
+    """Check if the scaled register that an sll defines is only used by the
+    given addu statements, so that the sll can be removed once they have been
+    replaced."""
+    scaled = b[index][0]
+    clobbered = effects[b].clobbered
+
+    for k in xrange(index + 1, len(b)):
+        if k not in additions and b[k].uses(scaled):
+            return False
+
+        if scaled in clobbered[k]:
+            return True
+
+    return is_reg_dead_after(scaled, b, len(b) - 1)
+
+
+def exit_blocks(body):
+    """Get the blocks outside a loop that are reached from the loop."""
+    return set(t for b in body for t in b.edges_to if t not in body)
+
+
+def is_eliminable(reg, increment, body, removable, comparisons, exits):
+    """Check if a basic induction variable is only used to update itself, in
+    address computations that are replaced and in the given comparisons,
+    and is dead after the loop, so that it can be removed."""
+    if reg in RESERVED_OUT or any(reg in b.live_in for b in exits):
+        return False
+
+    allowed = set(removable) | set(comparisons) | increment.positions()
+
+    for b in body:
+        for i, s in enumerate(b):
+            if s.uses(reg) and (b, i) not in allowed:
+                return False
+
+    b, i = increment.block, increment.index
+
+    if increment.addition == i:
+        return True
+
+    # The temporary register of the increment must only be used by the move
+    temporary = b[i][1]
+
+    return not any(b[k].uses(temporary)
+                   for k in xrange(increment.addition + 1, i)) \
+           and is_reg_dead_after(temporary, b, i)
+
+
+def find_comparisons(reg, body, defined):
+    """Find the comparisons of a basic induction variable with a
+    loop-invariant value (slt $2, $25, $14). Returns a list of (block,
+    index) tuples."""
+    comparisons = []
+
+    for b in body:
+        for i, s in enumerate(b):
+            if s.is_command('slt') and reg in s.args[1:] \
+                    and s[1] != s[2]:
+                other = s[2] if s[1] == reg else s[1]
+
+                if isinstance(other, int) or other not in defined:
+                    comparisons.append((b, i))
+
+    return comparisons
+
+
+def may_reduce(body):
+    """Quick check if a loop without function calls scales a register that it
+    also increments, which is required for an address computation derived
+    from an induction variable."""
+    scaled = set()
+    changed = set()
+
+    for b in body:
+        for s in b:
+            if s.is_command('jal'):
+                return False
+            elif s.is_command('sll') and isinstance(s[2], int):
+                scaled.add(s[1])
+            elif s.is_command('addu') or s.is_command('move'):
+                changed.add(s[0])
+
+    return not scaled.isdisjoint(changed)
+
+
+def reduce_loop(blocks, header, body, effects, pool, name, defined,
+                increments, derived):
+    """Reduce the strength of the derived address computations of a loop.
+    Returns the set of blocks that have been changed."""
+    preheader = find_preheader(header, body)
+    region = body | set([preheader]) if preheader else body
+    exits = exit_blocks(body)
+
+    # Each (variable, shift, base) is replaced by a pointer that is
+    # incremented along with the variable
+    plans = {}
+
+    for b, i, additions, reg, shift, bases in derived:
+        plan = plans.setdefault(reg, {'pointers': [], 'derived': []})
+
+        for base in bases:
+            if (shift, base) not in plan['pointers']:
+                plan['pointers'].append((shift, base))
+
+        plan['derived'].append((b, i, additions, shift, bases))
+
+    prologue = []
+    changes = {}
+    removed = set()
+
+    for reg in sorted(plans):
+        plan = plans[reg]
+        increment = increments[reg]
+        removable = [(b, i) for b, i, additions, shift, bases
+                     in plan['derived']
+                     if is_removable(b, i, additions, effects)]
+        comparisons = find_comparisons(reg, body, defined)
+        eliminable = is_eliminable(reg, increment, body, removable,
+                                   comparisons, exits)
+
+        # Each pointer costs an addu per iteration, which should be paid for
+        # by the replaced computations
+        gain = sum(len(additions) for b, i, additions, shift, bases
+                   in plan['derived']) + len(removable) \
+               - len(plan['pointers'])
+
+        if eliminable:
+            gain += len(increment.positions())
+
+        if gain <= 0:
+            continue
+
+        registers = [pool.take('move', False, region)
+                     for pointer in plan['pointers']]
+        step = increment.step
+        steps = []
+
+        for shift, base in plan['pointers']:
+            if isinstance(step, int):
+                steps.append(step << shift)
+            elif shift:
+                steps.append(pool.take('move', False, region))
+            else:
+                steps.append(step)
+
+        limits = []
+
+        if eliminable:
+            limits = [pool.take('move', False, region) for c in comparisons]
+
+        if None in registers + steps + limits:
+            continue
+
+        pointers = dict(zip(plan['pointers'], registers))
+
+        for (shift, base), pointer, added in zip(plan['pointers'], registers,
+                                                 steps):
+            prologue += [S('command', 'sll', pointer, reg, shift),
+                         S('command', 'addu', pointer, pointer, base)]
+
+            if not isinstance(added, int) and added != step:
+                prologue.append(S('command', 'sll', added, step, shift))
+
+            update = S('command', 'addu', pointer, pointer, added)
+            changes.setdefault((increment.block, increment.index),
+                               []).append(update)
+
+            if increment.block.verbose:
+                update.set_message(' Induction variable %s: pointer %s'
+                                   % (reg, pointer))
+
+        for b, i, additions, shift, bases in plan['derived']:
+            for k, base in zip(additions, bases):
+                move = S('command', 'move', b[k][0], pointers[(shift, base)])
+                changes[(b, k)] = [move]
+                removed.add((b, k))
+
+                if b.verbose:
+                    move.set_message(' Strength reduction: %s %s'
+                                     % (b[k].name, ','.join(map(str, b[k]))))
+
+        removed.update(removable)
+
+        if eliminable:
+            # Compare the first pointer with the scaled bound instead
+            shift, base = plan['pointers'][0]
+            pointer = registers[0]
+
+            for (b, i), limit in zip(comparisons, limits):
+                s = b[i]
+                bound = s[2] if s[1] == reg else s[1]
+
+                if isinstance(bound, int):
+                    prologue.append(S('command', 'li', limit, bound << shift))
+                else:
+                    prologue.append(S('command', 'sll', limit, bound, shift))
+
+                prologue.append(S('command', 'addu', limit, limit, base))
+                args = [pointer if arg == reg else limit for arg in s[1:]]
+                changes[(b, i)] = [S('command', 'slt', s[0], *args)]
+                removed.add((b, i))
+
+            removed |= increment.positions()
+
+    if not prologue:
+        return set()
+
+    if preheader is None:
+        preheader = create_preheader(blocks, header, body,
+                                     preheader_label(blocks, name))
+
+        if preheader is None:
+            return set()
+
+    touched = set([preheader])
+
+    for b in body:
+        statements = []
+
+        for i, s in enumerate(b):
+            if (b, i) not in removed:
+                statements.append(s)
+
+            statements.extend(changes.get((b, i), []))
+
+        if len(statements) != len(b) or any((b, i) in changes
+                                            for i in xrange(len(b))):
+            b.statements = statements
+            touched.add(b)
+
+    end = len(preheader)
+
+    if end and preheader[-1].is_jump():
+        end -= 1
+
+    preheader.statements[end:end] = prologue
+
+    return touched
+
+
+def reduce_induction_variables(blocks):
+    """
+    Induction variable strength reduction:
+    $L1:                    ->      sll $9, $25, 3
+    ...                             addu $9, $9, $4
+    sll $8, $25, 3                  sll $10, $14, 3
+    addu $2, $8, $4                 addu $10, $10, $4
+    ...                         $L1:
+    slt $3, $25, $14                ...
+    ...                             move $2, $9
+    addu $25, $25, 1                ...
+    j $L1                           slt $3, $9, $10
+                                    ...
+                                    addu $9, $9, 8
+                                    j $L1
+
+    An address computation in a loop that scales a basic induction variable
+    (a register that is only changed by adding a loop-invariant step) and
+    adds a loop-invariant base is replaced by a pointer, which is computed
+    in the preheader and incremented along with the variable. If the
+    variable is not used otherwise in the loop, except for comparisons with
+    a loop-invariant bound, and is dead after the loop, the comparisons are
+    rewritten to compare the pointer with the scaled bound and the variable
+    is removed. This assumes that the addresses do not overflow, as the
+    array indexing in the source program does. Loops with function calls
+    are not optimized, since the pointers would need callee saved registers.
+    Innermost loops are handled first. Returns the set of blocks that have
+    been changed.
+    """
+    loops = [(header, body) for header, body in natural_loops(blocks)
+             if may_reduce(body)]
+
+    if not loops:
+        return set()
+
+    pool = None
+    name = function_name(blocks)
+    effects = {}
+    touched = set()
+
+    for header, body in sorted(loops, key=lambda loop: len(loop[1])):
+        if not header[0].is_label() or not touched.isdisjoint(body) \
+                or not touched.isdisjoint(header.edges_from):
+            continue
+
+        for b in body:
+            if b not in effects:
+                effects[b] = BlockEffects(b)
+
+        defined = set().union(*(effects[b].defined for b in body))
+        increments = find_increments(body, effects, defined)
+
+        if not increments:
+            continue
+
+        ordered = [b for b in blocks if b in body]
+        derived = find_derived(ordered, effects, defined, increments)
+
+        if not derived:
+            continue
+
+        if pool is None:
+            pool = RegisterPool(blocks, None, None)
+
+        touched |= reduce_loop(blocks, header, body, effects, pool, name,
+                               defined, increments, derived)
+
+    return touched
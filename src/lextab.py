@@ -0,0 +1,10 @@
+# lextab.py. This file automatically created by PLY (version 3.11). Don't edit!
+_tabversion   = '3.10'
+_lextokens    = set(('COLON', 'COMMA', 'COMMENT', 'DIRECTIVE', 'NEWLINE', 'WORD'))
+_lexreflags   = 64
+_lexliterals  = ''
+_lexstateinfo = {'INITIAL': 'inclusive'}
+_lexstatere   = {'INITIAL': [('(?P<t_NEWLINE>\\n+)|(?P<t_COLON>:)|(?P<t_COMMA>,)|(?P<t_COMMENT>\\#.*)|(?P<t_DIRECTIVE>\\..*)|(?P<t_hex_word>0x([0-9a-fA-F]{8}|[0-9a-fA-F]{4}))|(?P<t_offset_address>[0-9]+\\([a-zA-Z0-9$_.]+\\))|(?P<t_int>-?[0-9]+)|(?P<t_WORD>[a-zA-Z0-9$_.+()-]+)', [None, ('t_NEWLINE', 'NEWLINE'), ('t_COLON', 'COLON'), ('t_COMMA', 'COMMA'), ('t_COMMENT', 'COMMENT'), ('t_DIRECTIVE', 'DIRECTIVE'), ('t_hex_word', 'hex_word'), None, ('t_offset_address', 'offset_address'), ('t_int', 'int'), ('t_WORD', 'WORD')])]}
+_lexstateignore = {'INITIAL': ' \t'}
+_lexstateerrorf = {'INITIAL': 't_error'}
+_lexstateeoff = {}
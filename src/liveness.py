@@ -1,15 +1,32 @@
-from dataflow import succ
+from operator import or_
+
+from dataflow import solve, affected
+from bitset import Numbering, BitSet
 
 
 RETURN_REGS = ['$2', '$3']
 ARGUMENT_REGISTERS = ['$4', '$5', '$6', '$7']
 FLOATING_POINT_REGS = ['$f%d' % i  for i in range(32)]
+TEMPORARY_REGS = ['$%d' % i for i in range(8, 16) + [24, 25]]
+CALLEE_SAVED_REGS = ['$%d' % i for i in range(16, 24)]
 
 RESERVED_REGISTERS = ['$fp', '$sp', '$31']
 RESERVED_USE = RETURN_REGS + ARGUMENT_REGISTERS + FLOATING_POINT_REGS
 RESERVED_DEF = RETURN_REGS
 RESERVED_OUT = RETURN_REGS + FLOATING_POINT_REGS
 
+# Registers that are used by a function call
+CALL_USE = frozenset(RESERVED_USE)
+
+# Registers that are used by the return jump: the caller expects the callee
+# saved registers to have been restored
+RETURN_USE = frozenset(CALLEE_SAVED_REGS)
+
+
+def is_return(s):
+    """Check if a statement is the return jump of a function."""
+    return s.is_command('j') and s[0] == '$31'
+
 
 def is_reg_dead_after(reg, block, index, known_jump_targets=[]):
     """Check if a register is dead after a certain point in a basic block."""
@@ -29,7 +46,7 @@ def is_reg_dead_after(reg, block, index, known_jump_targets=[]):
     if index < len(block) - 1:
         for s in block[index + 1:]:
             # If used, the previous definition is live
-            if s.uses(reg):
+            if s.uses(reg) or (reg in RETURN_USE and is_return(s)):
                 return False
 
             # If redefined, the previous definition is dead
@@ -41,65 +58,105 @@ def is_reg_dead_after(reg, block, index, known_jump_targets=[]):
     return reg not in RESERVED_OUT and reg not in block.live_out
 
 
-def create_use_def(block):
+def create_use_def(block, registers=None):
+    """Create the `use' and `def' sets of a block. The sets are bit sets over
+    the given register numbering."""
     #if block.dummy:
     #    block.use_set = set(RESERVED_USE)
     #    block.def_set = set(RESERVED_DEF)
     #    return
 
-    # Get the last of each definition series and put in in the `def' set
-    used = set()
-    defined = set()
+    if registers is None:
+        registers = Numbering()
 
-    block.use_set = set()
-    block.def_set = set()
+    # Get the last of each definition series and put in in the `def' set
+    used = 0
+    defined = 0
+    use_set = 0
+    def_set = 0
 
     for s in block:
         # use[B] is the set of variables whose values may be used in B prior to
-        # any definition of the variable
-        for reg in s.get_use():
-            used.add(reg)
+        # any definition of the variable. A function call may use all argument
+        # registers.
+        use = s.get_use()
+
+        if s.is_command('jal'):
+            use = use | CALL_USE
+        elif is_return(s):
+            use = use | RETURN_USE
 
-            if reg not in defined:
-                block.use_set.add(reg)
+        for reg in use:
+            bit = registers.bit(reg)
+            used |= bit
+
+            if not defined & bit:
+                use_set |= bit
 
         # def[B] is the set of variables assigned values in B prior to any use
         # of that variable in B
         for reg in s.get_def():
-            defined.add(reg)
+            bit = registers.bit(reg)
+            defined |= bit
+
+            if not used & bit:
+                def_set |= bit
 
-            if reg not in used:
-                block.def_set.add(reg)
+    block.use_set = BitSet(registers, use_set)
+    block.def_set = BitSet(registers, def_set)
 
 
 def create_in_out(blocks):
+    """Generate the `in' and `out' sets of the given blocks using the worklist
+    dataflow solver. Returns the number of iterations needed."""
+    registers = Numbering()
+
     for b in blocks:
-        create_use_def(b)
+        create_use_def(b, registers)
 
-        b.live_in = set()
-        b.live_out = set()
+    # in[B] = use[B] | (out[B] - def[B])
+    transfer = lambda b, out: b.use_set | (out - b.def_set)
 
-    # Start by analyzing the exit points
-    work_list = set()
+    # out[B] = union of in[S] for S in succ(B)
+    empty = registers.empty()
+    live_in, live_out, iterations = solve(blocks, False, or_, transfer, empty,
+                                          empty)
 
     for b in blocks:
-        if b.edges_from and not b.edges_to:
-            work_list.add(b)
+        b.live_in = live_in[b]
+        b.live_out = live_out[b]
+
+    return iterations
 
-    while len(work_list):
-        b = work_list.pop()
 
-        # out[B] = union of in[S] for S in succ(B)
-        b.live_out = set()
+def update_in_out(blocks, touched):
+    """Update the `in' and `out' sets after the statements of the touched
+    blocks have changed, without changing the flow graph. Only the blocks from
+    which a block with changed `use' or `def' sets can be reached are
+    recomputed. Returns the number of iterations needed."""
+    registers = blocks[0].use_set.numbering
+    changed = []
 
-        for s in succ(b):
-            b.live_out |= s.live_in
+    for b in touched:
+        use_set, def_set = b.use_set, b.def_set
+        create_use_def(b, registers)
 
-        # in[B] = use[B] | (out[B] - def[B])
-        new_in = b.use_set | (b.live_out - b.def_set)
+        if b.use_set != use_set or b.def_set != def_set:
+            changed.append(b)
+
+    if not changed:
+        return 0
+
+    transfer = lambda b, out: b.use_set | (out - b.def_set)
+    empty = registers.empty()
+    values = (dict((b, b.live_in) for b in blocks),
+              dict((b, b.live_out) for b in blocks))
+    live_in, live_out, iterations = solve(blocks, False, or_, transfer, empty,
+                                          empty, affected(changed, False),
+                                          values)
+
+    for b in blocks:
+        b.live_in = live_in[b]
+        b.live_out = live_out[b]
 
-        # Check if the out set has changed. If so, add all predecessors to the
-        # work list
-        if new_in != b.live_in:
-            b.live_in = new_in
-            work_list |= set(b.edges_from)
+    return iterations
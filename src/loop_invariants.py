@@ -0,0 +1,425 @@
+import re
+
+from statement import Statement as S, FLOAT_CONSTANT
+from liveness import TEMPORARY_REGS, CALLEE_SAVED_REGS, RETURN_REGS, \
+        ARGUMENT_REGISTERS
+from loops import natural_loops, block_frequencies, find_preheader, \
+        create_preheader, LOOP_WEIGHT
+from memory import LOADS, memory_access, location, clobbered_registers, \
+        is_unknown_access, FRAME, REGISTER_NAME
+from stack_slots import FrameUsage, find_frame, save_registers, \
+        register_number
+
+
+# Instructions of which the result only depends on the operands (and, for
+# loads, on the loaded location), along with the instruction that copies the
+# result between registers
+INVARIANT = {
+    'la': 'move', 'lw': 'move', 'l.s': 'mov.s', 'l.d': 'mov.d',
+    'addu': 'move', 'subu': 'move', 'and': 'move', 'andi': 'move',
+    'or': 'move', 'ori': 'move', 'xor': 'move', 'xori': 'move',
+    'nor': 'move', 'sll': 'move', 'srl': 'move', 'sra': 'move',
+    'slt': 'move', 'sltu': 'move',
+    'add.d': 'mov.d', 'sub.d': 'mov.d', 'mul.d': 'mov.d', 'div.d': 'mov.d',
+    'neg.d': 'mov.d', 'abs.d': 'mov.d', 'add.s': 'mov.s', 'sub.s': 'mov.s',
+    'mul.s': 'mov.s', 'div.s': 'mov.s', 'neg.s': 'mov.s', 'abs.s': 'mov.s',
+    'cvt.d.s': 'mov.d', 'cvt.d.w': 'mov.d', 'cvt.s.d': 'mov.s',
+    'cvt.s.w': 'mov.s',
+}
+
+# Registers of which the value is not preserved by a function call
+CALL_CLOBBERED = frozenset(['$%d' % i for i in range(1, 16) + [24, 25, 31]]
+                           + ['$f%d' % i for i in range(20)])
+
+# Registers that can hold a new value in a loop without function calls, in
+# order of preference (floating point registers are even halves of doubles)
+INTEGER_REGISTERS = list(reversed(TEMPORARY_REGS)) \
+        + list(reversed(ARGUMENT_REGISTERS))
+FLOAT_REGISTERS = ['$f%d' % i for i in (18, 16, 10, 8, 6, 4, 14, 12, 2, 0)]
+
+# Registers that may hold the return value of the function, which are not
+# reused since they are live at the end of the function
+RETURN_REGISTERS = frozenset(RETURN_REGS + ['$f0', '$f1', '$f2', '$f3'])
+
+REGISTER = re.compile('\$f?\d+')
+ADDRESS_BASE = re.compile('\((\$\w+)\)$')
+
+
+class BlockEffects(object):
+    """
+    The registers that are changed by each statement of a block, and the
+    memory effects of the block: whether it contains a function call, a
+    statement with unknown memory effects, or a store through an unknown
+    pointer, and the locations that it stores to. Without a FrameUsage,
+    accesses to the frame outside of its slots are not detected as barrier.
+    """
+    def __init__(self, block, usage=None):
+        self.clobbered = []
+        self.defined = set()
+        self.calls = False
+        self.barrier = False
+        self.pointer_store = False
+        self.stores = []
+
+        for i, s in enumerate(block):
+            if not s.is_command():
+                self.clobbered.append(())
+                continue
+
+            if s.is_command('jal'):
+                clobbered = CALL_CLOBBERED
+                self.calls = True
+            else:
+                clobbered = clobbered_registers(s)
+
+                if is_unknown_access(s) \
+                        or (usage and (block, i) in usage.outside):
+                    self.barrier = True
+
+            self.clobbered.append(clobbered)
+            self.defined |= clobbered
+            access = memory_access(s)
+
+            if access and access[3]:
+                loc = location(s[access[2]])
+
+                if loc is None:
+                    self.pointer_store = True
+                else:
+                    self.stores.append((loc[0], loc[1], access[0]))
+
+
+class LoopMemory(object):
+    """
+    The memory effects of the blocks in a loop, combined from their
+    BlockEffects. The stored locations are kept as (offset, size) tuples by
+    base.
+    """
+    def __init__(self, effects, usage):
+        self.usage = usage
+        self.calls = any(e.calls for e in effects)
+        self.barrier = any(e.barrier for e in effects)
+        self.pointer_store = any(e.pointer_store for e in effects)
+        self.stores = {}
+
+        for e in effects:
+            for base, offset, size in e.stores:
+                self.stores.setdefault(base, []).append((offset, size))
+
+    def is_invariant(self, loc, size):
+        """Check if a memory location is not changed in the loop."""
+        if self.barrier:
+            return False
+
+        base, offset = loc
+
+        if any(o < offset + size and offset < o + s
+               for o, s in self.stores.get(base, ())):
+            return False
+
+        if FLOAT_CONSTANT.match(base):
+            return True
+
+        if base == FRAME:
+            if not self.usage.valid:
+                return False
+
+            escape = self.usage.escape
+
+            if escape is None or offset + size <= escape:
+                return True
+
+        return not self.calls and not self.pointer_store
+
+
+class RegisterPool(object):
+    """
+    The registers from which the registers of new values in a loop are
+    taken. A register is available in a loop if it is not used anywhere in
+    the function, or if it is not used in the loop and its preheader and not
+    live in them. The latter requires the liveness analysis, and does not
+    apply to registers that may hold a return value. A register that is
+    handed out for a loop is not handed out again for an overlapping loop.
+    Callee saved registers are only handed out if they are not used in the
+    function and can be saved in its frame.
+    """
+    def __init__(self, blocks, frame, usage):
+        self.references = {}
+
+        for b in blocks:
+            for s in b:
+                for arg in s:
+                    if isinstance(arg, str):
+                        for reg in REGISTER.findall(arg):
+                            self.references.setdefault(reg, set()).add(b)
+
+        self.assigned = {}
+        self.callee_saved = []
+        self.saved = []
+
+        if frame is not None and usage.valid and usage.epilogues \
+                and frame.mask_bits:
+            lowest = frame.lowest_register()
+            self.callee_saved = [r for r in reversed(CALLEE_SAVED_REGS)
+                                 if r not in self.references
+                                 and register_number(r) < lowest]
+
+    def is_free(self, reg, region):
+        """Check if a register is available in a loop, given the blocks of
+        the loop and its preheader."""
+        if not self.assigned.get(reg, set()).isdisjoint(region):
+            return False
+
+        references = self.references.get(reg)
+
+        if not references:
+            return True
+
+        if reg in RETURN_REGISTERS or not references.isdisjoint(region):
+            return False
+
+        return not any(reg in b.live_in or reg in b.live_out
+                       for b in region if hasattr(b, 'live_in'))
+
+    def take(self, move, calls, region):
+        """Get a register for a value in a loop, that is copied with the given
+        move instruction and is preserved by the function calls in the loop
+        if there are any. Returns None if no register is available."""
+        if move != 'move':
+            candidates = [] if calls else FLOAT_REGISTERS
+        elif calls:
+            candidates = self.callee_saved
+        else:
+            candidates = INTEGER_REGISTERS
+
+        for reg in candidates:
+            if move != 'move':
+                pair = [reg, '$f%d' % (int(reg[2:]) + 1)]
+            else:
+                pair = [reg]
+
+            if all(self.is_free(r, region) for r in pair):
+                for r in pair:
+                    self.assigned.setdefault(r, set()).update(region)
+
+                if calls and reg not in self.saved:
+                    self.saved.append(reg)
+
+                return reg
+
+
+def invariant_operands(s, defined, hoisted):
+    """Get the operands of a statement with the registers that are replaced by
+    the registers of hoisted values, or None if an operand register may
+    change in the loop."""
+    args = list(s.args)
+
+    for index, reg in s.get_use(True):
+        if not REGISTER_NAME.match(reg):
+            continue
+
+        if reg in hoisted:
+            replacement = hoisted[reg]
+        elif reg not in defined:
+            continue
+        else:
+            replacement = None
+
+        if replacement is None:
+            return None
+
+        if args[index] == reg:
+            args[index] = replacement
+        else:
+            args[index] = ADDRESS_BASE.sub('(%s)' % replacement, args[index])
+
+    return args
+
+
+def find_invariants(body, effects, defined, memory, pool, region):
+    """Find the statements of a loop that compute an invariant value, and
+    assign a register to each of them. Each block is scanned in order, so
+    that a computation that uses the result of an earlier invariant statement
+    in the same block is invariant as well. Statements that compute the same
+    value share a register. In a loop with function calls, only loads are
+    hoisted, since the register has to be saved by the function. Returns a
+    list of (block, index, hoisted statement, move) tuples, where the hoisted
+    statement is None if the value is already computed by an earlier
+    one."""
+    invariants = []
+    values = {}
+
+    for b in body:
+        hoisted = {}
+
+        for i, s in enumerate(b):
+            if not s.is_command():
+                continue
+
+            move = INVARIANT.get(s.name)
+            args = None
+
+            if move is not None and s.get_def() == frozenset([s[0]]) \
+                    and REGISTER_NAME.match(s[0]) \
+                    and (not memory.calls or s.is_memory_access()):
+                args = invariant_operands(s, defined, hoisted)
+
+            if args is not None and s.is_memory_access():
+                loc = location(s[1])
+
+                if loc is None or not memory.is_invariant(loc,
+                                                         LOADS[s.name][0]):
+                    args = None
+
+            for reg in effects[b].clobbered[i]:
+                hoisted[reg] = None
+
+            if args is None:
+                continue
+
+            key = s.name, tuple(args[1:])
+            reg = values.get(key)
+            statement = None
+
+            if reg is None:
+                reg = pool.take(move, memory.calls, region)
+
+                if reg is None:
+                    continue
+
+                values[key] = reg
+                statement = S('command', s.name, reg, *args[1:])
+
+            hoisted[s[0]] = reg
+            invariants.append((b, i, statement,
+                               S('command', move, s[0], reg)))
+
+    return invariants
+
+
+def function_name(blocks):
+    """Get the name of a function from its .ent directive."""
+    for b in blocks:
+        for s in b:
+            if s.is_directive() and s.name.startswith('.ent') \
+                    and len(s.name.split()) > 1:
+                return s.name.split()[1]
+
+    return ''
+
+
+def preheader_label(blocks, name):
+    """Create a label for a new preheader that is not used in the function."""
+    labels = set(s.name for b in blocks for s in b if s.is_label())
+    n = 1
+
+    while '$L%s.pre%d' % (name, n) in labels:
+        n += 1
+
+    return '$L%s.pre%d' % (name, n)
+
+
+def hoist_loop_invariants(blocks):
+    """
+    Loop-invariant code motion:
+    $L1:                    ->      l.d $f18, $LC0
+    ...                         $L1:
+    l.d $f0, $LC0                   ...
+    ...                             mov.d $f0, $f18
+    j $L1                           ...
+                                    j $L1
+
+    A computation in a natural loop of which the operands are not changed in
+    the loop is moved to the preheader of the loop, where its value is
+    assigned to a register that is not used or live in the loop (see
+    RegisterPool). The original statement copies that register instead. Loads are only hoisted from
+    locations that are not stored to in the loop: constants, stack slots and
+    global variables (if the loop does not call a function or store through
+    a pointer).
+
+    Hoisted values are kept in temporary registers in loops without function
+    calls, and in callee saved registers (which are saved in the prologue)
+    in loops with calls. A preheader is created if the loop has none. Outer
+    loops are handled before the loops nested in them, so an invariant of
+    both is hoisted out of both at once. Returns the set of blocks that have
+    been changed.
+    """
+    loops = natural_loops(blocks)
+
+    if not loops:
+        return set()
+
+    statements = [s for b in blocks for s in b]
+    frame = find_frame(statements)
+    usage = FrameUsage(blocks)
+    pool = RegisterPool(blocks, frame, usage)
+    frequencies = block_frequencies(blocks)
+    effects = {}
+    name = function_name(blocks)
+    touched = set()
+
+    for header, body in sorted(loops, key=lambda loop: -len(loop[1])):
+        if not header[0].is_label():
+            continue
+
+        for b in body:
+            if b not in effects:
+                effects[b] = BlockEffects(b, usage)
+
+        memory = LoopMemory([effects[b] for b in body], usage)
+        defined = set().union(*(effects[b].defined for b in body))
+
+        preheader = find_preheader(header, body)
+        region = body | set([preheader]) if preheader else body
+
+        # Scan the blocks in their order in the function, to assign the
+        # registers in a predictable order
+        ordered = [b for b in blocks if b in body]
+        invariants = find_invariants(ordered, effects, defined, memory, pool,
+                                     region)
+
+        if not invariants:
+            continue
+
+        if preheader is None:
+            preheader = create_preheader(blocks, header, body,
+                                         preheader_label(blocks, name))
+
+            if preheader is None:
+                continue
+
+            touched |= set(preheader.edges_from)
+
+        hoisted = [statement for b, i, statement, move in invariants
+                   if statement is not None]
+        saved = 0
+
+        for b, i, statement, move in invariants:
+            b.statements[i] = move
+            touched.add(b)
+            saved += frequencies[b] - frequencies[header] / LOOP_WEIGHT
+
+            if b.verbose:
+                move.set_message(' Hoisted out of loop %s'
+                                 % header[0].name)
+
+        if preheader.verbose:
+            hoisted[0].set_message(' Loop %s: hoisted %d instructions, '
+                                   'estimated %d dynamic instructions '
+                                   'saved' % (header[0].name, len(hoisted),
+                                              saved))
+
+        end = len(preheader)
+
+        if end and preheader[-1].is_jump():
+            end -= 1
+
+        preheader.statements[end:end] = hoisted
+        touched.add(preheader)
+        effects.pop(preheader, None)
+
+    if pool.saved:
+        touched |= save_registers(blocks, frame, FrameUsage(blocks),
+                                  pool.saved)
+
+    return touched
@@ -0,0 +1,131 @@
+from statement import Statement as S
+from dataflow import BasicBlock, predecessors
+from dominator import get_dominators
+
+
+# Estimated number of iterations of a loop, used to weigh the statements in a
+# loop body when estimating how often they are executed
+LOOP_WEIGHT = 10
+
+
+def back_edges(blocks):
+    """Find the back edges of a flow graph: the edges (tail, header) for which
+    the header dominates the tail."""
+    dominators = get_dominators(blocks)
+    edges = []
+
+    for b in blocks:
+        for target in b.edges_to:
+            if dominators.dominates(target, b):
+                edges.append((b, target))
+
+    return edges
+
+
+def natural_loop(dominators, header, tails):
+    """Get the body of the natural loop of a header with the given back edge
+    tails: the header and all blocks that reach a tail without passing through
+    the header. Blocks that are not reachable from the entry block are not
+    part of any loop."""
+    body = set([header])
+    stack = [t for t in tails if t is not header]
+    body.update(stack)
+
+    while stack:
+        for p in predecessors(stack.pop()):
+            if p not in body and dominators.dominates(header, p):
+                body.add(p)
+                stack.append(p)
+
+    return body
+
+
+def natural_loops(blocks):
+    """Find the natural loops of a flow graph. Back edges to the same header
+    are merged into a single loop. Returns a list of (header, body) tuples in
+    the order of the headers in the block list."""
+    dominators = get_dominators(blocks)
+    tails = {}
+
+    for tail, header in back_edges(blocks):
+        tails.setdefault(header, []).append(tail)
+
+    return [(b, natural_loop(dominators, b, tails[b])) for b in blocks
+            if b in tails]
+
+
+def loop_depths(blocks):
+    """Get the loop nesting depth of each block in a flow graph."""
+    depths = dict((b, 0) for b in blocks)
+
+    for header, body in natural_loops(blocks):
+        for b in body:
+            depths[b] += 1
+
+    return depths
+
+
+def block_frequencies(blocks):
+    """Estimate the relative execution frequency of each block in a flow
+    graph, assuming that each loop iterates LOOP_WEIGHT times."""
+    return dict((b, LOOP_WEIGHT ** depth)
+                for b, depth in loop_depths(blocks).iteritems())
+
+
+def find_preheader(header, body):
+    """Get the preheader of a loop: the only predecessor of the header outside
+    the loop, if the header is its only successor. Returns None if the loop
+    has no preheader."""
+    outside = [p for p in header.edges_from if p not in body]
+
+    if len(outside) != 1:
+        return None
+
+    preheader = outside[0]
+
+    if preheader.edges_to != [header] or not len(preheader) \
+            or preheader[-1].is_command('jal'):
+        return None
+
+    return preheader
+
+
+def create_preheader(blocks, header, body, label):
+    """Insert a preheader with the given label before the header of a loop.
+    The jumps from outside the loop to the header are redirected to the
+    preheader, and a block in the loop that falls through to the header jumps
+    to it instead. The flow graph edges are updated. Returns the preheader, or
+    None if the header has no label."""
+    if not len(header) or not header[0].is_label():
+        return None
+
+    index = blocks.index(header)
+    preheader = BasicBlock([S('label', label)])
+    preheader.verbose = header.verbose
+
+    for p in list(header.edges_from):
+        if p in body:
+            continue
+
+        last = p[-1] if len(p) else None
+
+        if last is not None and last.is_jump() \
+                and last.jump_target() == header[0].name:
+            last[-1] = label
+
+        p.remove_edge_to(header)
+        p.add_edge_to(preheader)
+
+    if index:
+        previous = blocks[index - 1]
+
+        if previous in body and previous in header.edges_from \
+                and (not len(previous) or not previous[-1].is_jump()
+                     or previous[-1].is_command('jal')
+                     or previous[-1].is_branch()):
+            previous.statements.append(S('command', 'j', header[0].name))
+
+    preheader.add_edge_to(header)
+    blocks.insert(index, preheader)
+
+    return preheader
@@ -0,0 +1,479 @@
+import re
+from operator import and_, or_
+
+import opcodes as op
+from statement import Statement as S
+from dataflow import solve
+from stack_slots import FrameUsage, find_frame, frame_address
+
+
+# Loads and stores, with the number of bytes they access and the instruction
+# that copies the accessed value between registers (None if the value cannot
+# be forwarded). The address is the second operand, except for dsz.
+LOADS = {'lw': (4, 'move'), 'l.s': (4, 'mov.s'), 'l.d': (8, 'mov.d'),
+         'dlw': (8, None), 'lb': (1, None), 'lbu': (1, None),
+         'lh': (2, None), 'lhu': (2, None)}
+STORES = {'sw': (4, 'move'), 's.s': (4, 'mov.s'), 's.d': (8, 'mov.d'),
+          'dsw': (8, None), 'dsz': (8, None), 'sb': (1, None),
+          'sh': (2, None)}
+
+# Registers of the values that can be forwarded by each move instruction
+VALUE_REGISTER = {'move': re.compile('^\$\d+$'),
+                  'mov.s': re.compile('^\$f\d+$'),
+                  'mov.d': re.compile('^\$f\d+$')}
+
+# Global symbol with an optional byte offset, e.g. st+168
+SYMBOL_ADDRESS = re.compile('^([A-Za-z_.$][\w.$]*)([+-]\d+)?$')
+REGISTER_NAME = re.compile('^\$(\d+|f\d+|fp|sp|gp)$')
+
+# Instructions that define a pair of general purpose registers, of which only
+# the first is an operand
+PAIR_DEFINITIONS = ['dlw', 'dmfc1']
+
+# Location base of the stack frame
+FRAME = '$fp'
+
+# Instructions of which the memory effect is known
+KNOWN_EFFECT = frozenset(op.KNOWN_OPCODES) | frozenset(LOADS) \
+        | frozenset(STORES)
+
+
+def memory_access(s):
+    """Get the (number of bytes, move instruction, address operand index,
+    whether it is a store) of a load or store, or None if the statement is not
+    a load or store."""
+    if s.name in LOADS:
+        size, move = LOADS[s.name]
+
+        return size, move, 1, False
+
+    if s.name in STORES:
+        size, move = STORES[s.name]
+
+        return size, move, 0 if s.name == 'dsz' else 1, True
+
+
+def location(arg):
+    """Get the (base, offset) of a memory location operand: the frame for an
+    address relative to the frame or stack pointer, or a global symbol. Returns
+    None if the address is relative to another register."""
+    address = frame_address(arg)
+
+    if address:
+        return FRAME, address[0]
+
+    if isinstance(arg, str) and not REGISTER_NAME.match(arg):
+        m = SYMBOL_ADDRESS.match(arg)
+
+        if m:
+            return m.group(1), int(m.group(2) or 0)
+
+
+def clobbered_registers(s):
+    """Get the registers of which the value is changed by a statement. A
+    floating point register is a half of a double, so its neighbours are
+    included."""
+    defined = s.get_def()
+
+    if not defined and s.name not in PAIR_DEFINITIONS:
+        return defined
+
+    registers = set(defined)
+
+    if s.name in PAIR_DEFINITIONS:
+        registers.add('$%d' % (int(s[0][1:]) + 1))
+    elif s.is_truncate():
+        # trunc.w.d $f4,$f0,$8 uses $8 as scratch register
+        registers.update(arg for arg in s if isinstance(arg, str)
+                         and REGISTER_NAME.match(arg))
+
+    for reg in list(registers):
+        if reg.startswith('$f') and reg[2:].isdigit():
+            n = int(reg[2:])
+            registers.update(['$f%d' % (n - 1), '$f%d' % (n + 1)])
+
+    return registers
+
+
+def is_unknown_access(s):
+    """Check if a command is an unknown instruction, or a load or store that
+    is not in LOADS or STORES."""
+    if s.name not in KNOWN_EFFECT:
+        return True
+
+    return (s.is_store() or s.is_load_non_immediate()) \
+           and memory_access(s) is None and s.name != 'la'
+
+
+def is_barrier(s, position, usage):
+    """Check if the memory effect of a command is unknown: a function call,
+    an access to the frame in the prologue or epilogue (where the stack
+    pointer is not yet or no longer equal to the frame pointer), a change of
+    the frame or stack pointer, or an unknown instruction."""
+    if s.name == 'jal' or is_unknown_access(s):
+        return True
+
+    defined = s.get_def()
+
+    if '$fp' in defined or '$sp' in defined:
+        return True
+
+    return position in usage.outside \
+           and any(frame_address(arg) for arg in s)
+
+
+class AvailableValues(object):
+    """
+    The values of memory locations that are available in a register, as a
+    bit set of facts (base, offset, size, move instruction, register). A fact
+    is created by a store of the register to the location or a load of the
+    location into the register. It is killed by a change of the register, by
+    a store that overlaps the location, and by a function call or other
+    statement with unknown memory effects. A store through an unknown pointer
+    kills the facts of all global locations and of the frame locations of
+    which the address may be taken.
+    """
+    def __init__(self, blocks, usage):
+        self.usage = usage
+        self.facts = []
+        self.index = {}
+        self.by_register = {}
+        self.by_location = {}
+        self.by_value = {}
+        self.aliased = 0
+
+        commands = {}
+
+        for b in blocks:
+            commands[b] = [self.describe(s, (b, i)) for i, s in enumerate(b)]
+
+        self.everything = (1 << len(self.facts)) - 1
+
+        # The (kill, gen, fact, whether the command is a load) of each
+        # statement
+        self.effects = dict((b, map(self.effect, described))
+                            for b, described in commands.iteritems())
+
+    def describe(self, s, position):
+        """Get the memory effect of a statement as a tuple (barrier,
+        clobbered registers, stored (location, size), created fact), or None
+        if it is not a command. The fact is added if it is new."""
+        if not s.is_command():
+            return None
+
+        if is_barrier(s, position, self.usage):
+            return True, (), None, None
+
+        access = memory_access(s)
+        store = fact = None
+
+        if access:
+            size, move, address, is_store = access
+            loc = location(s[address])
+
+            if is_store:
+                store = loc, size
+
+            if move and loc is not None and VALUE_REGISTER[move].match(s[0]):
+                fact = loc[0], loc[1], size, move, s[0]
+
+                if fact not in self.index:
+                    self.add_fact(fact)
+
+        return False, clobbered_registers(s), store, fact
+
+    def add_fact(self, fact):
+        base, offset, size, move, reg = fact
+        bit = 1 << len(self.facts)
+        self.index[fact] = bit
+        self.facts.append(fact)
+        self.by_register[reg] = self.by_register.get(reg, 0) | bit
+        self.by_value[fact[:4]] = self.by_value.get(fact[:4], 0) | bit
+        self.by_location.setdefault((base, offset), []).append((size, bit))
+
+        if base != FRAME or (self.usage.escape is not None
+                             and offset + size > self.usage.escape):
+            self.aliased |= bit
+
+    def overlapping(self, base, offset, size):
+        """Get the facts of the locations that overlap a memory access."""
+        bits = 0
+
+        for o in xrange(offset - 7, offset + size):
+            for other_size, bit in self.by_location.get((base, o), ()):
+                if o + other_size > offset:
+                    bits |= bit
+
+        return bits
+
+    def effect(self, description):
+        """Get the (kill, gen, fact, whether the fact is created by a load)
+        of a described statement."""
+        if description is None:
+            return 0, 0, None, False
+
+        barrier, clobbered, store, fact = description
+
+        if barrier:
+            return self.everything, 0, None, False
+
+        kill = 0
+
+        for reg in clobbered:
+            kill |= self.by_register.get(reg, 0)
+
+        if store:
+            loc, size = store
+
+            if loc is None:
+                kill |= self.aliased
+            else:
+                kill |= self.overlapping(loc[0], loc[1], size)
+
+        if fact is None:
+            return kill, 0, None, False
+
+        return kill, self.index[fact], fact, store is None
+
+    def solve(self, blocks):
+        """Solve the available values of each block, and store the values at
+        the start of the blocks in `available_in'."""
+        gen = {}
+        kill = {}
+
+        for b in blocks:
+            g = k = 0
+
+            for statement_kill, statement_gen, fact, load in self.effects[b]:
+                g = (g & ~statement_kill) | statement_gen
+                k |= statement_kill
+
+            gen[b] = g
+            kill[b] = k
+
+        transfer = lambda b, value: gen[b] | (value & ~kill[b])
+        self.available_in = solve(blocks, True, and_, transfer, 0,
+                                  self.everything)[0]
+
+
+def remove_statement(block, s, message):
+    """Remove a statement from a block, or turn it into a comment in verbose
+    mode. The statements are filtered by the caller."""
+    if block.verbose:
+        s.stype = 'comment'
+        s.options['block'] = False
+        s.set_message(message)
+        s.name = ' Dead:\t%s\t%s' % (s.name, ','.join(map(str, s)))
+    else:
+        s.remove = True
+
+
+def forward_stored_values(blocks):
+    """
+    Redundant load elimination:
+    sw $2, 16($fp)          ->  sw $2, 16($fp)
+    ...                         ...
+    lw $3, 16($fp)              move $3, $2
+
+    A load of a memory location of which the value is available in a register
+    on every path to the load, because it has been stored from or loaded into
+    that register, is replaced by a move from the register, or removed if it
+    loads into the same register. Memory locations are frame slots and global
+    symbols, see AvailableValues. Returns the set of blocks that have been
+    changed.
+    """
+    usage = FrameUsage(blocks)
+
+    if not usage.valid:
+        return set()
+
+    values = AvailableValues(blocks, usage)
+
+    if not values.facts:
+        return set()
+
+    values.solve(blocks)
+    touched = set()
+
+    for b in blocks:
+        available = values.available_in[b]
+        replacements = {}
+
+        for i, (kill, gen, fact, load) in enumerate(values.effects[b]):
+            if load:
+                s = b[i]
+                move, reg = fact[3:]
+                candidates = available & values.by_value[fact[:4]]
+
+                if candidates:
+                    sources = [values.facts[n][4]
+                               for n in xrange(len(values.facts))
+                               if candidates & (1 << n)]
+                    source = reg if reg in sources else sources[0]
+
+                    if source == reg:
+                        remove_statement(b, s, ' redundant load of %s'
+                                         % s[1])
+                    else:
+                        replacements[i] = S('command', move, reg, source)
+
+                        if b.verbose:
+                            replacements[i].set_message(
+                                    ' Load of %s replaced by %s'
+                                    % (s[1], source))
+
+                    touched.add(b)
+
+            available = (available & ~kill) | gen
+
+        if replacements:
+            b.statements = [replacements.get(i, s) for i, s in enumerate(b)]
+
+        if b in touched and not b.verbose:
+            b.apply_filter(lambda s: not s.remove)
+
+    return touched
+
+
+class LiveSlots(object):
+    """
+    Liveness of the words of the stack frame that hold local variables (and
+    argument home slots) of which the address is never taken, as a bit set
+    per word. A word is live if a load may read it before a store overwrites
+    it. Words of which the address may be taken are not tracked, so stores to
+    them are always kept.
+    """
+    def __init__(self, frame, usage):
+        self.usage = usage
+        self.bits = {}
+        limit = frame.size + 16
+
+        if usage.escape is not None:
+            limit = min(limit, usage.escape)
+
+        for offset in xrange(frame.args, limit, 4):
+            if frame.is_local(offset) and frame.is_local(offset + 3):
+                self.bits[offset] = 1 << len(self.bits)
+
+        self.everything = (1 << len(self.bits)) - 1
+
+    def words(self, offset, size, covered=False):
+        """Get the bits of the words that overlap a memory access, or that
+        are completely covered by it."""
+        bits = 0
+
+        for word in xrange(offset & ~3, offset + size, 4):
+            if not covered or (word >= offset and word + 4 <= offset + size):
+                bits |= self.bits.get(word, 0)
+
+        return bits
+
+    def is_tracked(self, offset, size):
+        """Check if all words that a memory access overlaps are tracked."""
+        return all(word in self.bits
+                   for word in xrange(offset & ~3, offset + size, 4))
+
+    def effect(self, s, position):
+        """Get the (kill, gen) bit sets of a statement, and the bit set of the
+        words that it stores to if it is a store that may be removed (None
+        otherwise)."""
+        if not s.is_command():
+            return 0, 0, None
+
+        access = memory_access(s)
+
+        if access is None:
+            if is_unknown_access(s):
+                return 0, self.everything, None
+
+            return 0, 0, None
+
+        size, move, address, store = access
+        loc = location(s[address])
+
+        if loc is None or loc[0] != FRAME:
+            return 0, 0, None
+
+        offset = loc[1]
+
+        if not store:
+            return 0, self.words(offset, size), None
+
+        if position in self.usage.outside \
+                or not self.is_tracked(offset, size):
+            return self.words(offset, size, True), 0, None
+
+        return self.words(offset, size, True), 0, self.words(offset, size)
+
+    def solve(self, blocks):
+        """Solve the live words at the end of each block, and store them in
+        `live_out'. The effects of the statements of each block are kept in
+        `effects'."""
+        gen = {}
+        kill = {}
+        self.effects = {}
+
+        for b in blocks:
+            g = k = 0
+            effects = self.effects[b] = [self.effect(s, (b, i))
+                                         for i, s in enumerate(b)]
+
+            for statement_kill, statement_gen, words in reversed(effects):
+                g = (g & ~statement_kill) | statement_gen
+                k |= statement_kill
+
+            gen[b] = g
+            kill[b] = k
+
+        transfer = lambda b, value: gen[b] | (value & ~kill[b])
+        self.live_out = solve(blocks, False, or_, transfer, 0, 0)[1]
+
+
+def eliminate_dead_stores(blocks):
+    """
+    Dead store elimination:
+    sw $2, 16($fp)          ->  lw $3, 20($fp)
+    lw $3, 20($fp)              sw $4, 16($fp)
+    sw $4, 16($fp)
+
+    A store to a local variable is removed if the variable is not read before
+    it is overwritten or the function returns. Only local variables of which
+    the address is never taken are considered, see LiveSlots. Returns the set
+    of blocks that have been changed.
+    """
+    usage = FrameUsage(blocks)
+
+    if not usage.valid:
+        return set()
+
+    frame = find_frame([s for b in blocks for s in b])
+
+    if frame is None:
+        return set()
+
+    slots = LiveSlots(frame, usage)
+
+    if not slots.bits:
+        return set()
+
+    slots.solve(blocks)
+    touched = set()
+
+    for b in blocks:
+        live = slots.live_out[b]
+
+        for i in xrange(len(b) - 1, -1, -1):
+            kill, gen, words = slots.effects[b][i]
+
+            if words is not None and not words & live:
+                s = b[i]
+                remove_statement(b, s, ' dead store to %s'
+                                 % s[memory_access(s)[2]])
+                touched.add(b)
+
+            live = (live & ~kill) | gen
+
+        if b in touched and not b.verbose:
+            b.apply_filter(lambda s: not s.remove)
+
+    return touched
@@ -0,0 +1,151 @@
+import re
+
+
+# Instruction categories
+JUMP = 1 << 0
+BRANCH = 1 << 1
+BRANCH_ZERO = 1 << 2
+SHIFT = 1 << 3
+LOAD = 1 << 4
+STORE = 1 << 5
+ARITH = 1 << 6
+LOAD_NON_IMMEDIATE = 1 << 7
+LOGICAL = 1 << 8
+DOUBLE_ARITHMETIC = 1 << 9
+DOUBLE_UNARY = 1 << 10
+MOVE_FROM_SPEC = 1 << 11
+SET_IF_LESS = 1 << 12
+CONVERT = 1 << 13
+TRUNCATE = 1 << 14
+COMPARE = 1 << 15
+
+# Operand roles, used to determine the registers that are defined and used by
+# a command
+DEF_0 = 1 << 16             # arg0 is defined
+DEF_1 = 1 << 17             # arg1 is defined
+USE_JUMP_REG = 1 << 18      # arg0 is used if it is a register (j $31)
+USE_0 = 1 << 19             # arg0 is used
+USE_0_ADDRESS = 1 << 20     # base register of arg0 is used (dsz 10($1))
+USE_1 = 1 << 21             # arg1 is used
+USE_1_ADDRESS = 1 << 22     # base register or symbol in arg1 is used
+USE_2 = 1 << 23             # arg2 is used, unless it is an integer
+
+# Patterns that define the instruction categories. A pattern is either a
+# regular expression that is matched against the beginning of the mnemonic, or
+# a list of mnemonics.
+CATEGORIES = [
+    (JUMP, '^j|jal|beq|bne|blez|bgtz|bltz|bgez|bc1t|bc1f$'),
+    (BRANCH, '^beq|bne|blez|bgtz|bltz|bgez|bct|bcf|bc1f|bc1t$'),
+    (BRANCH_ZERO, '^blez|bgtz|bltz|bgez$'),
+    (SHIFT, '^s(ll|rl|ra)$'),
+    (LOAD, ['lw', 'li', 'dlw', 'l.s', 'l.d']),
+    (STORE, ['sw', 'sb', 's.d', 'dsw', 's.s', 's.b']),
+    (ARITH, '^s(ll|rl|ra)'
+            + '|(abs|neg|and|[xn]?or)'
+            + '|(add|sub|slt)u?'
+            + '|(add|sub|mult|div|abs|neg|sqrt|c)\.[sd]$'),
+    (LOAD_NON_IMMEDIATE, '^l(w|a|b|bu|\.d|\.s)|dlw$'),
+    (LOGICAL, '^(xor|or|and)i?$'),
+    (DOUBLE_ARITHMETIC, '^(add|sub|div|mul)\.[sd]$'),
+    (DOUBLE_UNARY, '^(abs|neg|mov)\.d$'),
+    (MOVE_FROM_SPEC, ['mflo', 'mthi']),
+    (SET_IF_LESS, ['slt', 'sltu']),
+    (CONVERT, '^cvt\.[a-z\.]*$'),
+    (TRUNCATE, '^trunc\.[a-z\.]*$'),
+    (COMPARE, '^c\.[a-z\.]*$'),
+]
+
+# Mnemonics that are not covered by a category, but do have operand roles
+DEF_0_INSTR = ['div', 'move', 'addu', 'subu', 'li', 'dmfc1', 'mfc1', 'mfhi',
+               'mov.d', 'mov.s']
+USE_1_INSTR = ['addu', 'subu', 'mult', 'div', 'move', 'mov.d', 'mov.s',
+               'neg.s', 'abs.s', 'dmfc1', 'mfc1', 'div.s']
+USE_2_INSTR = ['addu', 'subu', 'div']
+COPROCESSOR_BRANCHES = ['bc1f', 'bc1t', 'bct', 'bcf']
+
+# Mnemonics that are classified when this module is loaded, all other
+# mnemonics are classified (and cached) the first time they are seen
+KNOWN_OPCODES = [
+    'abs.d', 'abs.s', 'add.d', 'add.s', 'addu', 'and', 'andi', 'bc1f',
+    'bc1t', 'beq', 'bgez', 'bgtz', 'blez', 'bltz', 'bne', 'c.eq.d',
+    'c.eq.s', 'c.le.d', 'c.le.s', 'c.lt.d', 'c.lt.s', 'cvt.d.s', 'cvt.d.w',
+    'cvt.s.d', 'cvt.s.w', 'cvt.w.d', 'div', 'div.d', 'div.s', 'dlw',
+    'dmfc1', 'dsw', 'dsz', 'j', 'jal', 'la', 'lb', 'lbu', 'l.d', 'li',
+    'l.s', 'lw', 'mfc1', 'mfhi', 'mflo', 'mov.d', 'mov.s', 'move', 'mtc1',
+    'mthi', 'mul.d', 'mul.s', 'mult', 'neg.d', 'neg.s', 'nop', 'nor', 'or',
+    'ori', 's.b', 'sb', 's.d', 'sll', 'slt', 'sltu', 'sra', 'srl', 's.s',
+    'sub.d', 'sub.s', 'subu', 'sw', 'trunc.w.d', 'xor', 'xori',
+]
+
+
+def _match(pattern, name):
+    """Check if a mnemonic matches a category pattern."""
+    if isinstance(pattern, list):
+        return name in pattern
+
+    return bool(re.match(pattern, name))
+
+
+def compute_flags(name):
+    """Classify a mnemonic into a bitmask of instruction categories and
+    operand roles, without using the cached table."""
+    flags = 0
+
+    for flag, pattern in CATEGORIES:
+        if _match(pattern, name):
+            flags |= flag
+
+    # Defined registers
+    if name == 'mtc1':
+        flags |= DEF_1
+
+    if flags & (LOAD_NON_IMMEDIATE | ARITH | LOGICAL | DOUBLE_ARITHMETIC
+                | MOVE_FROM_SPEC | DOUBLE_UNARY | SET_IF_LESS | CONVERT
+                | TRUNCATE | LOAD) or name in DEF_0_INSTR:
+        flags |= DEF_0
+
+    # Used registers
+    coprocessor_branch = name in COPROCESSOR_BRANCHES
+
+    if name == 'j':
+        flags |= USE_JUMP_REG
+
+    if (flags & BRANCH and not coprocessor_branch) or flags & STORE \
+            or flags & COMPARE or name in ['mult', 'mtc1']:
+        flags |= USE_0
+    elif name == 'dsz':
+        flags |= USE_0_ADDRESS
+
+    if (flags & BRANCH and not flags & BRANCH_ZERO
+            and not coprocessor_branch) \
+            or flags & (SHIFT | DOUBLE_ARITHMETIC | DOUBLE_UNARY | LOGICAL
+                        | CONVERT | TRUNCATE | SET_IF_LESS | COMPARE) \
+            or name in USE_1_INSTR:
+        flags |= USE_1
+    elif flags & (LOAD_NON_IMMEDIATE | STORE):
+        flags |= USE_1_ADDRESS
+
+    if flags & (DOUBLE_ARITHMETIC | SET_IF_LESS | LOGICAL | TRUNCATE) \
+            or name in USE_2_INSTR:
+        flags |= USE_2
+
+    return flags
+
+
+# Classification table of all mnemonics seen so far
+_table = {}
+
+
+def classify(name):
+    """Get the bitmask of instruction categories and operand roles of a
+    mnemonic. Unknown mnemonics are classified once and then cached."""
+    try:
+        return _table[name]
+    except KeyError:
+        flags = _table[name] = compute_flags(name)
+
+        return flags
+
+
+for _name in KNOWN_OPCODES:
+    classify(_name)
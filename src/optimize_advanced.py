@@ -1,18 +1,29 @@
 from src.statement import Statement as S
 from src.liveness import RESERVED_REGISTERS, is_reg_dead_after
-from src.dataflow import succ
+from src.dataflow import succ, successors
+
+
+# Latencies in cycles of the instructions that are involved in the strength
+# reduction of multiplications and divisions by constants (R3000 timings).
+# Instructions that are not listed take one cycle.
+LATENCY = {'mult': 12, 'multu': 12, 'div': 35, 'divu': 35}
+
+# Instructions that set both the $hi and $lo registers
+HI_LO_DEFINITIONS = ['mult', 'multu', 'div', 'divu']
 
 
 def find_free_reg(block, start):
-    """Find a temporary register that is free in a given list of statements."""
+    """Find a temporary register that is free in a given list of statements:
+    it is dead after the start index and not used or defined from the start
+    index on. Returns None if all temporary registers are in use."""
     for i in xrange(8, 16):
         tmp = '$%d' % i
 
-        if is_reg_dead_after(tmp, block, start):
+        if is_reg_dead_after(tmp, block, start) \
+                and not any(s.uses(tmp) or s.defines(tmp)
+                            for s in block[start:]):
             return tmp
 
-    raise Exception('No temporary register is available.')
-
 
 def eliminate_common_subexpressions(block):
     """
@@ -57,9 +68,12 @@ def eliminate_common_subexpressions(block):
                 if s2.name == s.name and s2[1:] == args:
                     occurrences.append(block.pointer - 1)
 
+            new_reg = None
+
             if len(occurrences) > 1:
                 new_reg = find_free_reg(block, occurrences[0])
 
+            if new_reg is not None:
                 # Replace each occurrence with a move statement
                 message = 'Common subexpression reference: %s %s' \
                         % (s.name, ','.join(map(str, [new_reg] + s[1:])))
@@ -166,32 +180,30 @@ def fold_constants(block):
 
             if not a or not b:
                 # Multiplication by 0
-                hi = lo = to_hex(0)
+                hi = lo = 0
                 message = 'Multiplication by 0: %d * 0' % (b if a else a)
             elif a == 1:
                 # Multiplication by 1
-                hi = to_hex(0)
-                lo = to_hex(b)
+                hi = 0
+                lo = b
                 message = 'Multiplication by 1: %d * 1' % b
             elif b == 1:
                 # Multiplication by 1
-                hi = to_hex(0)
-                lo = to_hex(a)
+                hi = 0
+                lo = a
                 message = 'Multiplication by 1: %d * 1' % a
             else:
                 # Calculate result and fill Hi/Lo registers
                 result = a * b
-                binary = bin(result)[2:]
-                binary = '0' * (64 - len(binary)) + binary
-                hi = int(binary[:32], base=2)
-                lo = int(binary[32:], base=2)
+                hi = (result >> 32) & 0xffffffff
+                lo = result & 0xffffffff
                 message = 'Constant multiplication: %d * %d = %d' \
                             % (a, b, result)
 
             # Replace the multiplication with two immidiate loads to the
             # Hi/Lo registers
-            block.replace(1, [S('command', 'li', '$hi', hi),
-                                S('command', 'li', '$lo', lo)],
+            block.replace(1, [S('command', 'li', '$hi', to_hex(hi)),
+                                S('command', 'li', '$lo', to_hex(lo))],
                             message=message)
 
             register['$lo'], register['$hi'] = lo, hi
@@ -264,6 +276,255 @@ def fold_constants(block):
 
     return changed
 
+def signed_word(value):
+    """Interpret the low 32 bits of an integer as a signed word."""
+    value &= 0xffffffff
+
+    return value - 0x100000000 if value & 0x80000000 else value
+
+
+def non_adjacent_form(n):
+    """Write a positive integer as a sum of powers of two with signs, no two
+    of which are adjacent. Returns a list of (exponent, sign) tuples, highest
+    exponent first."""
+    digits = []
+    exponent = 0
+
+    while n:
+        if n & 1:
+            digit = 2 - (n & 3)
+            n -= digit
+            digits.append((exponent, digit))
+
+        n >>= 1
+        exponent += 1
+
+    return digits[::-1]
+
+
+def multiplication(rs, c, tmp):
+    """Create a sequence that multiplies register rs by constant c, with the
+    product in the destination of the last statement. The intermediate
+    results are stored in register tmp. Returns a list of (name, args)
+    tuples."""
+    if not c:
+        return [('move', [tmp, '$0'])]
+
+    digits = non_adjacent_form(abs(c))
+    sequence = []
+    acc = rs
+    previous = digits[0][0]
+
+    for exponent, digit in digits[1:]:
+        sequence += [('sll', [tmp, acc, previous - exponent]),
+                     ('addu' if digit > 0 else 'subu', [tmp, tmp, rs])]
+        acc = tmp
+        previous = exponent
+
+    if previous:
+        sequence.append(('sll', [tmp, acc, previous]))
+        acc = tmp
+
+    if c < 0:
+        sequence.append(('subu', [tmp, '$0', acc]))
+
+    return sequence or [('move', [tmp, rs])]
+
+
+def division(rs, c, tmp, unsigned):
+    """Create a sequence that divides register rs by constant c, which is a
+    (negated) power of two, with the quotient in the destination of the last
+    statement. A signed quotient is rounded towards zero, like the div
+    instruction does, by adding 2^k - 1 to a negative dividend before the
+    shift. Returns a list of (name, args) tuples."""
+    k = abs(c).bit_length() - 1
+
+    if unsigned:
+        return [('srl', [tmp, rs, k]) if k else ('move', [tmp, rs])]
+
+    if not k:
+        sequence = [('move', [tmp, rs])] if c > 0 else []
+    else:
+        if k == 1:
+            sequence = [('srl', [tmp, rs, 31])]
+        else:
+            sequence = [('sra', [tmp, rs, 31]), ('srl', [tmp, tmp, 32 - k])]
+
+        sequence += [('addu', [tmp, tmp, rs]), ('sra', [tmp, tmp, k])]
+        rs = tmp
+
+    if c < 0:
+        sequence.append(('subu', [tmp, '$0', rs]))
+
+    return sequence
+
+
+def constant(arg, register):
+    """Get the value of an operand that is an integer or a register with a
+    known value, or None if it is not constant."""
+    return arg if isinstance(arg, int) else register.get(arg)
+
+
+def reads_hi_lo(statements):
+    """Check if the $hi or $lo register is read in a list of statements
+    before both are set. Returns None if neither happens."""
+    for s in statements:
+        if s.is_command('mfhi') or s.is_command('mflo'):
+            return True
+
+        if s.is_command() and s.name in HI_LO_DEFINITIONS:
+            return False
+
+
+def is_hi_lo_dead_after(block, index):
+    """Check if the $hi and $lo registers are not read after the given index
+    of a block. The compiler reads them right after they are set, so they are
+    only looked for in the rest of the block and in its direct successors."""
+    read = reads_hi_lo(block[index + 1:])
+
+    if read is None:
+        return not any(reads_hi_lo(b) for b in successors(block))
+
+    return not read
+
+
+def find_move_from_lo(block, index, operand):
+    """Find the mflo statement that reads the result of the multiplication or
+    division at the given index, while the non-constant operand is not
+    changed. Returns None if there is none, or if $hi is read first."""
+    for j in xrange(index + 1, len(block)):
+        s = block[j]
+
+        if s.is_command('mflo'):
+            return j
+
+        if s.is_command('mfhi') or (s.is_command()
+                                    and s.name in HI_LO_DEFINITIONS) \
+                or s.defines(operand):
+            return None
+
+
+def reduce_strength(block):
+    """
+    Algebraic strength reduction:
+    li $3, 10           ->  li $3, 10
+    mult $2, $3             sll $4, $2, 2
+    mflo $4                 addu $4, $4, $2
+                            sll $4, $4, 1
+
+    div $4, $2, 4       ->  sra $4, $2, 31
+                            srl $4, $4, 30
+                            addu $4, $4, $2
+                            sra $4, $4, 2
+
+    A multiplication by a constant, of which the low word is read, is
+    replaced by shifts and additions of the other operand according to the
+    non-adjacent form of the constant. A division by a power of two is
+    replaced by shifts, rounding the quotient of a signed division towards
+    zero. Both are only replaced if $hi is not read and the sequence takes
+    fewer cycles than the original instructions according to LATENCY.
+    """
+    changed = False
+
+    # Known constant values in registers
+    register = {'$0': 0}
+
+    block.reset()
+
+    while not block.end():
+        s = block.read()
+
+        if not s.is_command():
+            continue
+
+        index = block.pointer - 1
+        start = end = None
+
+        if s.name in ['mult', 'multu'] and len(s) == 2:
+            c = constant(s[1], register)
+            operand = s[0]
+
+            if c is None:
+                c = constant(s[0], register)
+                operand = s[1]
+
+            if c is not None and not isinstance(operand, int):
+                end = find_move_from_lo(block, index, operand)
+                start = index
+        elif s.name in ['div', 'divu'] and not isinstance(s[-2], int):
+            c = constant(s[-1], register)
+            unsigned = s.name == 'divu'
+
+            if c is not None:
+                c = c & 0xffffffff if unsigned else signed_word(c)
+
+            if c and (unsigned or abs(c) <= 0x40000000) \
+                    and not abs(c) & (abs(c) - 1):
+                operand = s[-2]
+
+                if len(s) == 3:
+                    start = end = index
+                else:
+                    end = find_move_from_lo(block, index, operand)
+                    start = index
+
+        if end is not None and is_hi_lo_dead_after(block, end):
+            rd = block[end][0]
+
+            if s.name in ['mult', 'multu']:
+                sequence = multiplication(operand, signed_word(c), rd)
+            else:
+                sequence = division(operand, c, rd, unsigned)
+
+            # The destination can only hold intermediate results if it is not
+            # the operand
+            tmp = rd
+
+            if rd == operand and len(sequence) > 1:
+                tmp = find_free_reg(block, end)
+
+                if tmp is not None:
+                    if s.name in ['mult', 'multu']:
+                        sequence = multiplication(operand, signed_word(c),
+                                                  tmp)
+                    else:
+                        sequence = division(operand, c, tmp, unsigned)
+
+            cost = LATENCY.get(s.name, 1)
+
+            if end > start:
+                cost += LATENCY.get('mflo', 1)
+
+            if tmp is not None and sum(LATENCY.get(name, 1)
+                                       for name, args in sequence) < cost:
+                sequence[-1][1][0] = rd
+                message = 'Strength reduction: %s %s' \
+                          % (s.name, ','.join(map(str, s)))
+                block.replace(1, [S('command', name, *args)
+                                  for name, args in sequence],
+                              start=end, message=message)
+
+                if end > start:
+                    block.replace(1, [], start=start)
+
+                # A division is replaced in place, so the pointer has moved
+                # past the registers that the sequence defines
+                for name, args in sequence:
+                    register.pop(args[0], None)
+
+                changed = True
+                continue
+
+        for reg in s.get_def():
+            register.pop(reg, None)
+
+        if s.name == 'li':
+            value = s[1]
+            register[s[0]] = value if isinstance(value, int) \
+                             else int(value, 16)
+
+    return changed
+
 
 #def propagate_copies(block):
 #    """
@@ -342,7 +603,7 @@ def fold_constants(block):
 #    return changed
 
 
-def propagate_copies(block):
+def propagate_copies(block, touched=None):
     """
     Unpack a move instruction, by replacing its destination
     address with its source address in the code following the move instruction.
@@ -354,6 +615,9 @@ def propagate_copies(block):
     $regB                       ...
     ...                         ...
     addu $regC, $regA, ...      addu $regC, $regB, ...
+
+    Uses are also replaced in successor blocks; if a `touched' set is given,
+    the successor blocks that are changed are added to it.
     """
     changed = False
 
@@ -374,16 +638,15 @@ def propagate_copies(block):
             # Determine the uses of x reached by this definition of x
             for s2 in block[block.pointer:]:
                 i = s2.uses(x, True)
-                replaced_before = hasattr(s2, 'replaced')
 
-                if i != -1 and (not replaced_before \
+                if i != -1 and (s2.replaced is None \
                         or (x, y) not in s2.replaced):
                     s2.replace_usage(x, y, i)
 
-                    if replaced_before:
-                        s2.replaced.append((x, y))
-                    else:
+                    if s2.replaced is None:
                         s2.replaced = [(x, y)]
+                    else:
+                        s2.replaced.append((x, y))
 
                     changed = True
 
@@ -407,6 +670,9 @@ def propagate_copies(block):
                             s2.replace_usage(x, y, i, block.bid)
                             changed = True
 
+                            if touched is not None:
+                                touched.add(b)
+
                         # An assignment to x or y kills the copy statement x =
                         # y
                         defined = s2.get_def()
@@ -445,6 +711,6 @@ def eliminate_dead_code(block):
                 changed = True
 
     if not block.verbose:
-        block.apply_filter(lambda s: not hasattr(s, 'remove'))
+        block.apply_filter(lambda s: not s.remove)
 
     return changed
@@ -1,5 +1,7 @@
 import re
 
+from liveness import CALLEE_SAVED_REGS
+
 
 def remove_redundancies(block):
     """Execute all functions that remove redundant statements."""
@@ -49,6 +51,9 @@ def instr_move_jal(ins, statements):
     instr $regA, ...          ->  instr $4, ...
     move $4, $regA                 jal XX
     jal XX
+
+    $regA must not be a callee saved register, since that keeps its value
+    after the call.
     """
     if ins.is_command() and len(ins):
         following = statements.peek(2)
@@ -57,6 +62,7 @@ def instr_move_jal(ins, statements):
             mov, jal = following
 
             if mov.is_command('move') and mov[1] == ins[0] \
+                    and mov[1] not in CALLEE_SAVED_REGS \
                     and re.match('^\$[4-7]$', mov[0]) \
                     and jal.is_command('jal'):
                 ins[0] = mov[0]
@@ -1,131 +1,333 @@
+import os
+import re
+
 import ply.lex as lex
 import ply.yacc as yacc
 
 from statement import Statement as S
+from function import iter_functions
 from program import Program
 
 
-# Global statements administration
-statements = []
+# Pre-generated lexer and parser tables, which are shipped with the package so
+# that the tables do not have to be generated (and validated) on every run
+PACKAGE = __name__.rpartition('.')[0]
+TABLE_DIR = os.path.dirname(os.path.abspath(__file__))
+LEXTAB = '.'.join(filter(None, [PACKAGE, 'lextab']))
+YACCTAB = '.'.join(filter(None, [PACKAGE, 'yacctab']))
+
+
+class Parser(object):
+    """
+    Assembly parser. The lexer and parser are built from the (pre-generated)
+    tables when the first file is parsed. All parse state is kept in the
+    parser object, so different parser objects can be used at the same time.
+    """
+    tokens = ('NEWLINE', 'WORD', 'COMMENT', 'DIRECTIVE', 'COMMA', 'COLON')
+
+    # Ignore whitespaces
+    t_ignore = ' \t'
+
+    start = 'input'
+
+    def __init__(self):
+        self.lexer = None
+        self.parser = None
+        self.statements = []
+
+    # Tokens
+    def t_NEWLINE(self, t):
+        r'\n+'
+        t.lexer.lineno += t.value.count('\n')
+        return t
+
+    def t_COLON(self, t):
+        r':'
+        return t
+
+    def t_COMMA(self, t):
+        r','
+        return t
+
+    def t_COMMENT(self, t):
+        r'\#.*'
+        t.value = t.value[1:]
+        return t
+
+    def t_DIRECTIVE(self, t):
+        r'\..*'
+        return t
+
+    def t_hex_word(self, t):
+        r'0x([0-9a-fA-F]{8}|[0-9a-fA-F]{4})'
+        t.type = 'WORD'
+        return t
+
+    def t_offset_address(self, t):
+        r'[0-9]+\([a-zA-Z0-9$_.]+\)'
+        t.type = 'WORD'
+        return t
+
+    def t_int(self, t):
+        r'-?[0-9]+'
+        t.type = 'WORD'
+        t.value = int(t.value)
+        return t
+
+    def t_WORD(self, t):
+        r'[a-zA-Z0-9$_.+()-]+'
+        return t
+
+    def t_error(self, t):
+        print('Illegal character "%s"' % t.value[0])
+        t.lexer.skip(1)
+
+    # Parsing rules
+    def p_input(self, p):
+        '''input :
+                 | input line'''
+        pass
+
+    def p_line_instruction(self, p):
+        'line : instruction NEWLINE'
+        pass
+
+    def p_line_comment(self, p):
+        'line : COMMENT NEWLINE'
+        self.statements.append(S('comment', p[1]))
+
+    def p_line_inline_comment(self, p):
+        'line : instruction COMMENT NEWLINE'
+        # Add the inline comment to the last parsed statement
+        self.statements[-1].set_inline_comment(p[2])
+
+    def p_instruction_command(self, p):
+        'instruction : command'
+        pass
+
+    def p_instruction_directive(self, p):
+        'instruction : DIRECTIVE'
+        self.statements.append(S('directive', p[1]))
+
+    def p_instruction_label(self, p):
+        'instruction : WORD COLON'
+        self.statements.append(S('label', p[1]))
+
+    def p_command(self, p):
+        '''command : WORD WORD COMMA WORD COMMA WORD
+                   | WORD WORD COMMA WORD
+                   | WORD WORD
+                   | WORD'''
+        self.statements.append(S('command', p[1], *list(p)[2::2]))
+
+    def p_error(self, p):
+        print 'Syntax error at "%s" on line %d' % (p.value, self.lexer.lineno)
+
+    def build(self):
+        """Build the lexer and the LALR parser from the shipped tables, in
+        optimized mode (no grammar validation and no debug output)."""
+        self.lexer = lex.lex(module=self, optimize=1, lextab=LEXTAB,
+                             outputdir=TABLE_DIR)
+        self.parser = yacc.yacc(module=self, optimize=1, debug=False,
+                                write_tables=False, tabmodule=YACCTAB)
+
+    def parse(self, content):
+        """Parse a string of assembly code, return the list of parsed
+        statements."""
+        if self.parser is None:
+            self.build()
+
+        self.statements = []
+        self.lexer.lineno = 1
+        self.parser.parse(content, lexer=self.lexer)
+        statements, self.statements = self.statements, []
+
+        return statements
+
+    def parse_file(self, filename):
+        """Parse a given Assembly file, return a Program with Statement
+        objects containing the parsed instructions."""
+        try:
+            content = open(filename).read()
+        except IOError:
+            raise Exception('File "%s" could not be opened' % filename)
+
+        return Program(self.parse(content))
+
+
+def generate_tables():
+    """(Re)generate the shipped lexer and parser tables, which is necessary
+    after the token rules or the grammar have been changed:
+    python -c 'from src.parser import generate_tables; generate_tables()'"""
+    parser = Parser()
+    lex.lex(module=parser).writetab(LEXTAB, TABLE_DIR)
+    yacc.yacc(module=parser, debug=False, tabmodule=YACCTAB,
+              outputdir=TABLE_DIR)
+
+
+# Token rules that can occur within a line, in the order in which the lexer
+# tries them, and the rules that produce a WORD token
+LINE_TOKENS = ['COLON', 'COMMA', 'COMMENT', 'DIRECTIVE', 'hex_word',
+               'offset_address', 'int', 'WORD']
+WORD_TOKENS = frozenset(['hex_word', 'offset_address', 'int', 'WORD'])
+
+# Combined token pattern, which matches the same token as the lexer does
+TOKEN = re.compile('|'.join('(?P<%s>%s)' % (name, getattr(Parser, 't_' + name)
+                                            .__doc__) for name in LINE_TOKENS),
+                   re.VERBOSE)
+SEPARATOR = re.compile('[ \t]+')
+
+# Maximum number of operand values that are cached by the line parser
+WORD_CACHE_SIZE = 4096
+
+
+class LineParser(object):
+    """
+    Fast parser backend, which exploits that the grammar is line-based: each
+    line is split into a label, directive, comment or command and its
+    operands directly, instead of passing each token through the lexer and
+    the LALR parser. Lines that do not have one of the expected forms are
+    parsed by the PLY parser, so the result is always the same.
+    """
+    def __init__(self):
+        self.fallback = Parser()
+
+        # Operand values by operand text
+        self.values = {}
+
+    def word(self, text):
+        """Get the value of a WORD token (an int for integer literals), or
+        None if the text is not a single WORD token."""
+        try:
+            return self.values[text]
+        except KeyError:
+            pass
+
+        m = TOKEN.match(text)
+
+        if not m or m.end() != len(text) or m.lastgroup not in WORD_TOKENS:
+            return None
+
+        # Keep the cache bounded, labels are often unique
+        if len(self.values) >= WORD_CACHE_SIZE:
+            self.values.clear()
+
+        value = self.values[text] = int(text) if m.lastgroup == 'int' \
+                                    else text
+
+        return value
 
-tokens = ('NEWLINE', 'WORD', 'COMMENT', 'DIRECTIVE', 'COMMA', 'COLON')
+    def parse_line(self, line, statements):
+        """Parse a single line and add the result to the statement list.
+        Returns False if the line does not have one of the expected forms."""
+        code = line.lstrip(' \t')
 
+        if not code:
+            return True
 
-# Tokens
-def t_NEWLINE(t):
-    r'\n+'
-    t.lexer.lineno += t.value.count('\n')
-    return t
+        if code[0] == '#':
+            statements.append(S('comment', code[1:]))
+            return True
 
-def t_COLON(t):
-    r':'
-    return t
+        if code[0] == '.':
+            statements.append(S('directive', code))
+            return True
 
-def t_COMMA(t):
-    r','
-    return t
+        code, sep, comment = code.partition('#')
+        code = code.rstrip(' \t')
 
-def t_COMMENT(t):
-    r'\#.*'
-    t.value = t.value[1:]
-    return t
+        if code[-1] == ':':
+            name = self.word(code[:-1].rstrip(' \t'))
 
-def t_DIRECTIVE(t):
-    r'\..*'
-    return t
+            if name is None:
+                return False
 
-def t_hex_word(t):
-    r'0x([0-9a-fA-F]{8}|[0-9a-fA-F]{4})'
-    t.type = 'WORD'
-    return t
+            statement = S('label', name)
+        else:
+            parts = SEPARATOR.split(code, 1)
+            name = self.word(parts[0])
 
-def t_offset_address(t):
-    r'[0-9]+\([a-zA-Z0-9$_.]+\)'
-    t.type = 'WORD'
-    return t
+            if name is None:
+                return False
 
-def t_int(t):
-    r'-?[0-9]+'
-    t.type = 'WORD'
-    t.value = int(t.value)
-    return t
+            args = []
 
-def t_WORD(t):
-    r'[a-zA-Z0-9$_.+()-]+'
-    return t
+            if len(parts) > 1:
+                operands = parts[1].split(',')
 
+                if len(operands) > 3:
+                    return False
 
-# Ignore whitespaces
-t_ignore = ' \t'
+                for operand in operands:
+                    value = self.word(operand.strip(' \t'))
 
-def t_error(t):
-    print('Illegal character "%s"' % t.value[0])
-    t.lexer.skip(1)
+                    if value is None:
+                        return False
 
+                    args.append(value)
 
-# Build the lexer
-lexer = lex.lex()
+            statement = S('command', name, *args)
 
+        if sep:
+            statement.set_inline_comment(comment)
 
-# Parsing rules
-start = 'input'
+        statements.append(statement)
 
-def p_input(p):
-    '''input :
-             | input line'''
-    pass
+        return True
 
-def p_line_instruction(p):
-    'line : instruction NEWLINE'
-    pass
+    def iter_statements(self, lines):
+        """Parse an iterable of lines (e.g. a file object) incrementally. This
+        generator yields the statements of each line as soon as the line has
+        been parsed."""
+        statements = []
 
-def p_line_comment(p):
-    'line : COMMENT NEWLINE'
-    statements.append(S('comment', p[1]))
+        for line in lines:
+            if line[-1:] == '\n':
+                line = line[:-1]
 
-def p_line_inline_comment(p):
-    'line : instruction COMMENT NEWLINE'
-    # Add the inline comment to the last parsed statement
-    statements[-1].options['comment'] = p[2]
+            if not self.parse_line(line, statements):
+                statements.extend(self.fallback.parse(line + '\n'))
 
-def p_instruction_command(p):
-    'instruction : command'
-    pass
+            for s in statements:
+                yield s
 
-def p_instruction_directive(p):
-    'instruction : DIRECTIVE'
-    statements.append(S('directive', p[1]))
+            del statements[:]
 
-def p_instruction_label(p):
-    'instruction : WORD COLON'
-    statements.append(S('label', p[1]))
+    def iter_parts(self, lines):
+        """Parse an iterable of lines incrementally, yielding each function
+        (and each block of global statements between functions) as soon as it
+        has been parsed completely."""
+        return iter_functions(self.iter_statements(lines))
 
-def p_command(p):
-    '''command : WORD WORD COMMA WORD COMMA WORD
-               | WORD WORD COMMA WORD
-               | WORD WORD
-               | WORD'''
-    statements.append(S('command', p[1], *list(p)[2::2]))
+    def parse(self, content):
+        """Parse a string of assembly code, return the list of parsed
+        statements."""
+        return list(self.iter_statements(content.split('\n')))
 
-def p_error(p):
-    print 'Syntax error at "%s" on line %d' % (p.value, lexer.lineno)
+    def parse_file(self, filename):
+        """Parse a given Assembly file, return a Program with Statement
+        objects containing the parsed instructions."""
+        try:
+            content = open(filename).read()
+        except IOError:
+            raise Exception('File "%s" could not be opened' % filename)
 
+        return Program(self.parse(content))
 
-# Build YACC
-yacc.yacc()
 
+# Available parser backends
+BACKENDS = {'ply': Parser, 'line': LineParser}
 
-def parse_file(filename):
-    """Parse a given Assembly file, return a Block with Statement objects
-    containing the parsed instructions."""
-    global statements
 
-    statements = []
+def parse_file(filename, backend='line'):
+    """Parse a given Assembly file, return a Program with Statement objects
+    containing the parsed instructions. The backend is either 'line' (the
+    fast line-based parser) or 'ply' (the LALR parser)."""
+    return BACKENDS[backend]().parse_file(filename)
 
-    try:
-        content = open(filename).read()
-        yacc.parse(content)
-    except IOError:
-        raise Exception('File "%s" could not be opened' % filename)
 
-    return Program(statements)
+def iter_file(f):
+    """Parse an open assembly file incrementally, yielding its functions and
+    blocks of global statements one at a time. Only the part that is being
+    parsed is kept in memory."""
+    return LineParser().iter_parts(f)
@@ -1,181 +1,231 @@
-from statement import Statement as S, Block
-from dataflow import find_basic_blocks, generate_flow_graph
+from time import time
 
-from optimize_redundancies import remove_redundant_jumps, remove_redundancies,\
-        remove_redundant_branch_jumps
-from optimize_advanced import eliminate_common_subexpressions, \
-        fold_constants, propagate_copies, eliminate_dead_code
+from function import Function, split_functions
+from stats import IterationStats, new_counters, add_counters, save_stats
+from writer import write_stream
 
-import liveness
-import reaching_definitions
-import copy_propagation
 
-from writer import write_statements
+def optimize_function(function):
+    """Optimize a single function until it reaches a fixpoint. This is the
+    task that is executed by the worker processes in parallel mode."""
+    function.optimize()
 
+    return function
 
-class Program(Block):
-    def __len__(self):
-        """Get the number of statements in the program."""
-        return len(self.statements) if hasattr(self, 'statements') \
-               else reduce(lambda a, b: len(a) + len(b), self.blocks, 0)
-
-    def get_statements(self, add_block_comments=False):
-        """Concatenate the statements of all blocks and return the resulting
-        list."""
-        if hasattr(self, 'statements'):
-            return self.statements
-
-        # Only add block start and end comments when in verbose mode
-        if add_block_comments and self.verbose:
-            get_id = lambda b: b.bid
-            statements = []
-
-            for b in self.blocks:
-                message = ' Block %d (%d statements), edges from: %s' \
-                          % (b.bid, len(b), map(get_id, b.edges_from))
-
-                if hasattr(b, 'copy_in'):
-                    message += ', COPY_in: %s' % list(b.copy_in)
-
-                if hasattr(b, 'live_in'):
-                    message += ', LIVE_in: %s' % list(b.live_in)
-
-                if hasattr(b, 'reach_in'):
-                    message += ', REACH_in: %s' % list(b.reach_in)
-
-                statements.append(S('comment', message, block=False))
-
-                statements += b.statements
-
-                message = ' End of block %d, edges to: %s' \
-                          % (b.bid, map(get_id, b.edges_to))
-
-                if hasattr(b, 'copy_out'):
-                    message += ', COPY_out: %s' % list(b.copy_out)
-
-                if hasattr(b, 'live_out'):
-                    message += ', LIVE_out: %s' % list(b.live_out)
 
-                if hasattr(b, 'reach_out'):
-                    message += ', REACH_out: %s' % list(b.reach_out)
+class Program(object):
+    """
+    An assembly program, which is divided into functions (delimited by
+    .ent/.end directives) and global statements (data and directives). The
+    functions are optimized independently of each other, the global statements
+    are left untouched.
+    """
+    def __init__(self, statements=[], verbose=0):
+        self.parts = split_functions(statements)
+        self.functions = filter(lambda p: isinstance(p, Function), self.parts)
+        self.verbose = verbose
 
-                statements.append(S('comment', message, block=False))
+        # Number of instructions before and after optimization, and the wall
+        # time of the optimization in seconds
+        self.original_instructions = None
+        self.optimized_instructions = None
+        self.optimize_time = None
 
-            return statements
+    def __len__(self):
+        """Get the number of statements in the program."""
+        return sum(map(len, self.parts))
 
-        return reduce(lambda a, b: a + b,
-                      [b.statements for b in self.blocks])
+    def get_statements(self, add_block_comments=False):
+        """Concatenate the statements of all functions and global statements
+        and return the resulting list."""
+        return list(self.iter_statements(add_block_comments))
+
+    def iter_statements(self, add_block_comments=False):
+        """Iterate over the statements of all functions and global
+        statements, without concatenating them."""
+        for part in self.parts:
+            if isinstance(part, Function):
+                part.verbose = self.verbose
+
+                for s in part.iter_statements(add_block_comments):
+                    yield s
+            else:
+                for s in part.statements:
+                    yield s
 
     def count_instructions(self):
         """Count the number of statements that are commands or labels."""
-        return len(filter(lambda s: s.is_command() or s.is_label(),
-                          self.get_statements()))
-
-    def optimize_global(self):
-        """Optimize on a global level."""
-        changed = False
-
-        if not hasattr(self, 'statements'):
-            self.statements = self.get_statements()
-
-        if remove_redundant_jumps(self):
-            changed = True
-
-        if remove_redundant_branch_jumps(self):
-            changed = True
+        return sum(1 for s in self.iter_statements()
+                   if s.is_command() or s.is_label())
 
-        return changed
+    def write(self, f):
+        """Write the program as assembly code to a file-like object."""
+        write_stream(f, self.iter_statements(True), verbose=self.verbose)
 
-    def optimize_blocks(self):
-        """Optimize on block level. Keep executing all optimizations until no
-        more changes occur."""
-        changed = False
-
-        for block in self.blocks:
-            if remove_redundancies(block):
-                changed = True
-
-            if eliminate_common_subexpressions(block):
-                changed = True
-
-            if fold_constants(block):
-                changed = True
-
-            if propagate_copies(block):
-                changed = True
-
-            if eliminate_dead_code(block):
-                changed = True
+    def save(self, filename):
+        """Save the program in the specified file."""
+        f = open(filename, 'w+')
+        self.write(f)
+        f.close()
 
-        return changed
+    def optimize(self, jobs=1):
+        """Optimization wrapper function, optimizes each function until it
+        reaches a fixpoint. Functions that have converged are no longer
+        processed in later iterations. If jobs > 1, the functions are
+        distributed over a pool of worker processes. The result is the same
+        in both modes."""
+        # Remember original number of statements
+        o = self.count_instructions()
+        start = time()
 
-    def find_basic_blocks(self):
-        """Divide the statement list into basic blocks."""
-        self.blocks = find_basic_blocks(self.statements)
+        for f in self.functions:
+            f.verbose = self.verbose
+            f.converged = False
 
-        for b in self.blocks:
-            b.verbose = self.verbose
+        if jobs > 1 and len(self.functions) > 1:
+            self.optimize_parallel(jobs)
+        else:
+            self.optimize_serial()
 
-        del self.statements
+        self.optimize_time = time() - start
 
-    def perform_dataflow_analysis(self):
-        """Perform dataflow analysis:
-           - Divide the statement list into basic blocks
-           - Generate flow graph
-           - Create liveness sets: def, use, in, out
-           - Create reaching definitions sets: gen, kill, in, out"""
-        self.find_basic_blocks()
-        generate_flow_graph(self.blocks)
-        liveness.create_in_out(self.blocks)
-        reaching_definitions.create_in_out(self.blocks)
-        copy_propagation.create_in_out(self.blocks)
+        # Count number of instructions after optimization
+        b = self.count_instructions()
+        self.original_instructions = o
+        self.optimized_instructions = b
 
-    def save(self, filename):
-        """Save the program in the specified file."""
+        # Print results
+        if self.verbose:
+            print 'Original statements: %d' % o
+            print 'Statements removed:  %d (%d%%)' \
+                % (o - b, int((o - b) / float(b) * 100))
+            print 'Loads and stores:    %d -> %d (estimated per call)' \
+                % (self.count_memory_accesses('original_accesses'),
+                   self.count_memory_accesses('optimized_accesses'))
+            self.print_analysis_stats()
+            self.print_pass_stats()
+
+    def count_memory_accesses(self, attribute):
+        """Sum the estimated number of loads and stores of all functions,
+        before ('original_accesses') or after ('optimized_accesses')
+        optimization."""
+        return sum(getattr(f, attribute) or 0 for f in self.functions)
+
+    def print_analysis_stats(self):
+        """Print the number of full and incremental dataflow analyses, and the
+        time that was saved by the incremental analyses. The saved time is
+        estimated using the time of the last full analysis of a function."""
+        analyses = [f.analyses for f in self.functions]
+        full = sum(a.full_analyses for a in analyses)
+        incremental = sum(a.incremental_analyses for a in analyses)
+        elapsed = sum(a.analysis_time for a in analyses)
+        saved = sum(a.analysis_saved for a in analyses)
+
+        print 'Dataflow analyses:   %d full, %d incremental' \
+              % (full, incremental)
+        print 'Analysis time:       %.1fms (%.1fms saved)' \
+              % (elapsed * 1000, saved * 1000)
+
+    def print_pass_stats(self):
+        """Print the number of executed optimization passes, and the number of
+        passes that were skipped because the block had not changed. In verbose
+        level 2, the counters of each pass are printed as well."""
+        passes = self.get_stats()['passes']
+        executed = sum(p['invocations'] for p in passes.itervalues())
+        skipped = sum(p['skipped'] for p in passes.itervalues())
+
+        print 'Pass invocations:    %d executed, %d skipped' \
+              % (executed, skipped)
+
+        if self.verbose > 1:
+            print '%-32s %9s %7s %7s %8s %7s' \
+                  % ('pass', 'time', 'calls', 'skipped', 'rewrites',
+                     'removed')
+
+            for name, p in sorted(passes.iteritems()):
+                print '%-32s %7.1fms %7d %7d %8d %7d' \
+                      % (name, p['time'] * 1000, p['invocations'],
+                         p['skipped'], p['rewrites'], p['removed'])
+
+    def get_stats(self):
+        """Get the optimization statistics of the program, as a dictionary
+        that can be serialized as JSON. It contains the number of instructions
+        and the estimated number of loads and stores before and after
+        optimization, the total time and analysis time, the
+        counters of each pass, the totals of each iteration over all functions
+        and the statistics of each iteration of each function. Times are in
+        seconds."""
+        passes = {}
+        iterations = []
+        functions = []
+
+        for f in self.functions:
+            for name, counters in f.pass_stats().iteritems():
+                add_counters(passes.setdefault(name, new_counters()),
+                             counters)
+
+            for stats in f.stats:
+                if stats.iteration > len(iterations):
+                    iterations.append(IterationStats(stats.iteration))
+
+                iterations[stats.iteration - 1].add(stats)
+
+            functions.append({'name': f.name,
+                              'iterations': [s.as_dict() for s in f.stats]})
+
+        return {
+            'original_instructions': self.original_instructions,
+            'optimized_instructions': self.optimized_instructions,
+            'original_memory_accesses':
+                self.count_memory_accesses('original_accesses'),
+            'optimized_memory_accesses':
+                self.count_memory_accesses('optimized_accesses'),
+            'time': self.optimize_time,
+            'analysis_time': sum(f.analyses.analysis_time
+                                 for f in self.functions),
+            'passes': passes,
+            'iterations': [s.as_dict() for s in iterations],
+            'functions': functions,
+        }
+
+    def save_stats(self, filename):
+        """Save the optimization statistics as JSON in the specified file."""
         f = open(filename, 'w+')
-        f.write(write_statements(self.get_statements(True),
-                verbose=self.verbose))
+        save_stats(self.get_stats(), f)
         f.close()
 
-    def optimize(self):
-        """Optimization wrapper function, calls global and basic-block level
-        optimization functions."""
-        # Remember original number of statements
-        o = self.count_instructions()
-
-        changed = True
+    def optimize_serial(self):
+        """Optimize all functions in the current process, one iteration per
+        function at a time."""
+        active = self.functions
         iterations = 0
 
-        while changed:
+        while active:
             iterations += 1
 
             if self.verbose > 1:
-                print 'main iteration %d', iterations
+                print 'main iteration %d (%d functions)' \
+                      % (iterations, len(active))
 
-            changed = False
+            for f in active:
+                f.optimize_iteration()
 
-            # Optimize on a global level
-            if self.optimize_global():
-                if self.verbose > 1:
-                    print 'changed on global level'
+            active = filter(lambda f: not f.converged, active)
 
-                changed = True
+    def optimize_parallel(self, jobs):
+        """Optimize the functions in a pool of worker processes. The optimized
+        functions are put back in their original place in the program."""
+        # Imported here to keep the start-up time of serial runs low
+        from multiprocessing import Pool
 
-            # Perform dataflow analysis on new blocks
-            self.perform_dataflow_analysis()
+        pool = Pool(jobs)
 
-            # Optimize basic blocks
-            if self.optimize_blocks():
-                if self.verbose > 1:
-                    print 'changed on block level'
+        try:
+            optimized = pool.map(optimize_function, self.functions, 1)
+        finally:
+            pool.close()
+            pool.join()
 
-                changed = True
-
-        # Count number of instructions after optimization
-        b = self.count_instructions()
-
-        # Print results
-        if self.verbose:
-            print 'Original statements: %d' % o
-            print 'Statements removed:  %d (%d%%)' \
-                % (o - b, int((o - b) / float(b) * 100))
+        replacements = dict(zip(map(id, self.functions), optimized))
+        self.parts = [replacements.get(id(p), p) for p in self.parts]
+        self.functions = optimized
@@ -1,64 +1,150 @@
-from dataflow import BasicBlock as B
+from operator import or_
+
+from dataflow import solve, affected
+from bitset import Numbering, BitSet
+
+
+class Definitions(dict):
+    """Mapping of registers to the bit sets of the statements that define
+    them. All bit sets share a numbering of statement ids."""
+    def __init__(self, numbering):
+        dict.__init__(self)
+        self.numbering = numbering
+
+
+def create_reg_defs(block, numbering):
+    """Create the mapping of registers to the bits of the statements in a block
+    that define them."""
+    reg_defs = {}
+
+    for s in block:
+        for reg in s.get_def():
+            reg_defs[reg] = reg_defs.get(reg, 0) | numbering.bit(s.sid)
+
+    block.reg_defs = reg_defs
 
 
 def get_defs(blocks):
     """Collect definitions of all registers."""
+    numbering = Numbering()
     defs = {}
 
     for b in blocks:
-        for s in b:
-            for reg in s.get_def():
-                if reg not in defs:
-                    defs[reg] = set([s.sid])
-                else:
-                    defs[reg].add(s.sid)
+        create_reg_defs(b, numbering)
+
+        for reg, bits in b.reg_defs.iteritems():
+            defs[reg] = defs.get(reg, 0) | bits
+
+    result = Definitions(numbering)
+
+    for reg, bits in defs.iteritems():
+        result[reg] = BitSet(numbering, bits)
 
-    return defs
+    return result
 
 
 def create_gen_kill(block, global_defs):
+    numbering = global_defs.numbering
     block_defs = {}
 
     # Get the last of each definition series and put in in the `def' set
-    block.gen_set = set()
+    gen_set = 0
 
     for s in reversed(block):
         for reg in s.get_def():
             if reg not in block_defs:
-                block_defs[reg] = s.sid
-                block.gen_set.add(s.sid)
+                block_defs[reg] = bit = numbering.bit(s.sid)
+                gen_set |= bit
 
     # Generate kill set
-    block.kill_set = set()
+    kill_set = 0
 
-    for reg, statement_ids in global_defs.iteritems():
-        if reg in block_defs:
-            block.kill_set |= statement_ids - set([block_defs[reg]])
+    for reg, bit in block_defs.iteritems():
+        kill_set |= global_defs[reg].bits & ~bit
+
+    block.gen_set = BitSet(numbering, gen_set)
+    block.kill_set = BitSet(numbering, kill_set)
 
 
 def create_in_out(blocks):
-    """Generate the `in' and `out' sets of the given blocks using the iterative
-    algorithm from the lecture slides."""
+    """Generate the `in' and `out' sets of the given blocks using the worklist
+    dataflow solver. Returns the number of iterations needed."""
     # Create gen/kill sets
-    defs = get_defs(blocks)
+    defs = blocks[0].defs = get_defs(blocks)
 
     for b in blocks:
         create_gen_kill(b, defs)
-        b.reach_out = b.gen_set
 
-    change = True
+    # out[B] = gen[B] | (in[B] - kill[B])
+    transfer = lambda b, reach_in: b.gen_set | (reach_in - b.kill_set)
+
+    # in[B] = union of out[P] for P in pred(B)
+    empty = defs.numbering.empty()
+    reach_in, reach_out, iterations = solve(blocks, True, or_, transfer, empty,
+                                            empty)
 
-    while change:
-        change = False
+    for b in blocks:
+        b.reach_in = reach_in[b]
+        b.reach_out = reach_out[b]
+
+    return iterations
+
+
+def update_in_out(blocks, touched):
+    """Update the `in' and `out' sets after the statements of the touched
+    blocks have changed, without changing the flow graph. The definitions of
+    the registers that are defined in the touched blocks are collected again,
+    and the `gen' and `kill' sets are only recreated for the blocks that
+    define one of these registers. Returns the number of iterations
+    needed."""
+    defs = blocks[0].defs
+    numbering = defs.numbering
+    registers = set()
+
+    for b in touched:
+        registers.update(b.reg_defs)
+        create_reg_defs(b, numbering)
+        registers.update(b.reg_defs)
+
+    # Update the definitions of the affected registers, a block that defines
+    # one of them has a different kill set if the definitions have changed
+    outdated = set(touched)
+
+    for reg in registers:
+        bits = 0
+        defining = []
 
         for b in blocks:
-            b.reach_in = set()
+            if reg in b.reg_defs:
+                bits |= b.reg_defs[reg]
+                defining.append(b)
+
+        if reg not in defs or defs[reg].bits != bits:
+            defs[reg] = BitSet(numbering, bits)
+            outdated.update(defining)
 
-            for pred in b.edges_from:
-                b.reach_in |= pred.reach_out
+    changed = []
 
-            new_out = b.gen_set | (b.reach_in - b.kill_set)
+    for b in outdated:
+        gen_set, kill_set = b.gen_set, b.kill_set
+        create_gen_kill(b, defs)
+
+        if b.gen_set != gen_set or b.kill_set != kill_set:
+            changed.append(b)
+
+    if not changed:
+        return 0
+
+    transfer = lambda b, reach_in: b.gen_set | (reach_in - b.kill_set)
+    empty = numbering.empty()
+    values = (dict((b, b.reach_in) for b in blocks),
+              dict((b, b.reach_out) for b in blocks))
+    reach_in, reach_out, iterations = solve(blocks, True, or_, transfer, empty,
+                                            empty, affected(changed, True),
+                                            values)
+
+    for b in blocks:
+        b.reach_in = reach_in[b]
+        b.reach_out = reach_out[b]
 
-            if new_out != b.reach_out:
-                b.reach_out = new_out
-                change = True
+    return iterations
@@ -0,0 +1,480 @@
+import re
+from operator import or_
+
+from statement import Statement as S
+from dataflow import solve
+from liveness import TEMPORARY_REGS, CALLEE_SAVED_REGS
+from loops import block_frequencies
+
+
+# Frame directive of a function with a frame pointer, e.g.:
+# .frame $fp,56,$31     # vars= 32, regs= 2/0, args= 16, extra= 0
+FRAME = re.compile('^\.frame\s+\$fp,(\d+),\$31\s+#\s*vars=\s*(\d+),\s*'
+                   'regs=\s*(\d+)/(\d+),\s*args=\s*(\d+),\s*extra=\s*0$')
+MASK = re.compile('^\.mask\s+0x([0-9a-fA-F]+),(-?\d+)$')
+
+# Memory operand relative to the frame or stack pointer, e.g. 16($fp)
+FRAME_ADDRESS = re.compile('^(-?\d+)\((\$fp|\$sp)\)$')
+REGISTER = re.compile('\$\d+')
+
+# Number of bytes accessed by memory instructions, other instructions with a
+# frame address are assumed to access a double word
+ACCESS_SIZE = {'lw': 4, 'sw': 4, 'l.s': 4, 's.s': 4, 'lh': 2, 'lhu': 2,
+               'sh': 2, 'lb': 1, 'lbu': 1, 'sb': 1, 's.b': 1}
+
+# Size of the slots in the frame of the caller in which the argument
+# registers $4-$7 are stored
+ARGUMENT_HOME_SIZE = 16
+
+# Number of memory accesses that a callee saved register costs (a save in the
+# prologue and a restore in the epilogue)
+SAVE_COST = 2
+
+
+class Frame(object):
+    """
+    Stack frame layout of a function, as described by its .frame and .mask
+    directives. From the bottom, the frame contains the outgoing arguments
+    [0, args), the local variables [args, args + vars) and the register save
+    area, which extends to the frame size. The home slots of the argument
+    registers follow in the frame of the caller.
+    """
+    def __init__(self, frame, mask):
+        m = FRAME.match(frame.name)
+        size, self.vars, self.regs, self.fregs, self.args = \
+                map(int, m.groups())
+        self.size = size
+        self.frame = frame
+
+        m = MASK.match(mask.name)
+        self.mask_bits = int(m.group(1), 16)
+        self.mask_offset = int(m.group(2))
+        self.mask = mask
+
+    def is_local(self, offset):
+        """Check if an offset is a local variable or argument home slot."""
+        return self.args <= offset < self.args + self.vars \
+               or self.size <= offset < self.size + ARGUMENT_HOME_SIZE
+
+    def lowest_register(self):
+        """Get the number of the lowest saved general purpose register."""
+        return min(i for i in xrange(32) if self.mask_bits & (1 << i))
+
+    def lowest_save(self):
+        """Get the offset of the lowest saved general purpose register."""
+        return self.size + self.mask_offset - 4 * (self.regs - 1)
+
+    def save_registers(self, registers):
+        """Add registers to the save area below the saved registers, which
+        grows the frame. Returns the offset of each register in the grown
+        frame and the number of bytes by which the frame has grown."""
+        growth = (4 * len(registers) + 7) & ~7
+        lowest = self.lowest_save() + growth
+        offsets = {}
+
+        for i, reg in enumerate(sorted(registers, key=register_number,
+                                       reverse=True)):
+            offsets[reg] = lowest - 4 * (i + 1)
+            self.mask_bits |= 1 << register_number(reg)
+
+        self.size += growth
+        self.regs += len(registers)
+        self.frame.name = '.frame\t$fp,%d,$31\t\t# vars= %d, regs= %d/%d, ' \
+                          'args= %d, extra= 0' \
+                          % (self.size, self.vars, self.regs, self.fregs,
+                             self.args)
+        self.mask.name = '.mask\t0x%08x,%d' % (self.mask_bits,
+                                               self.mask_offset)
+
+        return offsets, growth
+
+
+def find_frame(statements):
+    """Get the Frame of a function from its .frame and .mask directives, or
+    None if the function has no frame pointer or the directives are not
+    understood."""
+    directives = dict((s.name.split(None, 1)[0], s) for s in statements
+                      if s.is_directive())
+
+    if '.frame' not in directives or '.mask' not in directives \
+            or not FRAME.match(directives['.frame'].name) \
+            or not MASK.match(directives['.mask'].name):
+        return None
+
+    return Frame(directives['.frame'], directives['.mask'])
+
+
+def register_number(reg):
+    return int(reg[1:])
+
+
+def frame_address(arg):
+    """Get the (offset, base register) of a frame address argument, or None if
+    the argument is not a frame address."""
+    if isinstance(arg, str):
+        m = FRAME_ADDRESS.match(arg)
+
+        if m:
+            return int(m.group(1)), m.group(2)
+
+
+def is_slot_access(s):
+    """Check if a statement is a word load or store to a frame pointer
+    relative address."""
+    return s.name in ('lw', 'sw') and len(s) == 2 and REGISTER.match(s[0]) \
+           and FRAME_ADDRESS.match(s[1]) and s[1].endswith('($fp)')
+
+
+class FrameUsage(object):
+    """
+    The uses of the frame of a function: the word loads and stores to each
+    stack slot, the byte ranges that are accessed otherwise, and the lowest
+    offset of which the address is taken. The prologue (up to "move $fp,$sp")
+    and epilogues (from "move $sp,$fp") are located as well, and the
+    positions of their statements are kept in `outside'. If the frame or
+    stack pointer is used in a way that is not understood, `valid' is False.
+    """
+    def __init__(self, blocks):
+        self.valid = False
+        self.accesses = {}
+        self.other = []
+        self.escape = None
+        self.prologue = None
+        self.epilogues = []
+        self.outside = set()
+
+        region = 'entry'
+
+        for b in blocks:
+            for i, s in enumerate(b):
+                if not s.is_command():
+                    continue
+
+                if region == 'entry':
+                    self.outside.add((b, i))
+
+                    if s.is_command('move') and s.args == ['$fp', '$sp']:
+                        self.prologue = b, i
+                        region = 'body'
+
+                    continue
+
+                if region == 'epilogue':
+                    self.outside.add((b, i))
+
+                    if s.is_command('addu') and s[0] == s[1] == '$sp':
+                        self.epilogues.append((b, i))
+                    elif s.is_command('j') and s[0] == '$31':
+                        region = 'body'
+
+                    continue
+
+                if s.is_command('move') and s.args == ['$sp', '$fp']:
+                    self.outside.add((b, i))
+                    region = 'epilogue'
+                    continue
+
+                if not self.add_statement(b, i, s):
+                    return
+
+        self.valid = self.prologue is not None and region == 'body'
+
+    def add_statement(self, b, i, s):
+        """Add a statement of the function body. Returns False if the
+        statement uses the frame or stack pointer in an unknown way."""
+        if not any(type(arg) is str and ('$fp' in arg or '$sp' in arg)
+                   for arg in s):
+            return True
+
+        if '$fp' in s.get_def() or '$sp' in s.get_def():
+            return False
+
+        if is_slot_access(s):
+            offset = frame_address(s[1])[0]
+            self.accesses.setdefault(offset, []).append((b, i))
+
+            return True
+
+        for arg in s:
+            address = frame_address(arg)
+
+            if address:
+                if s.is_command('la'):
+                    self.add_escape(address[0])
+                else:
+                    size = ACCESS_SIZE.get(s.name, 8)
+                    self.other.append((address[0], address[0] + size))
+            elif arg in ('$fp', '$sp'):
+                # Address computation: addu $2,$fp,16
+                if s.is_command('addu') and isinstance(s[2], int) \
+                        and s[1] == arg:
+                    self.add_escape(s[2])
+                else:
+                    return False
+
+        return True
+
+    def add_escape(self, offset):
+        if self.escape is None or offset < self.escape:
+            self.escape = offset
+
+    def candidates(self, frame):
+        """Get the offsets of the stack slots that can be promoted: local
+        slots that are only accessed by word loads and stores, and of which no
+        address below the slot is taken."""
+        result = []
+
+        for offset in sorted(self.accesses):
+            if offset % 4 or not frame.is_local(offset):
+                continue
+
+            if self.escape is not None and self.escape <= offset:
+                continue
+
+            if any(start < offset + 4 and offset < end
+                   for start, end in self.other):
+                continue
+
+            result.append(offset)
+
+        return result
+
+
+def slot_liveness(blocks, slots):
+    """Find the interference between stack slots and the slots that are live
+    across a function call, using a backward liveness analysis of the slots.
+    Returns a tuple (interference, across), where interference maps each slot
+    to the bit set of slots it interferes with and `across' is the bit set of
+    slots live across a call."""
+    bits = dict((offset, 1 << i) for i, offset in enumerate(slots))
+    gen = {}
+    kill = {}
+
+    def slot_bit(s):
+        if is_slot_access(s):
+            return bits.get(frame_address(s[1])[0], 0)
+
+        return 0
+
+    for b in blocks:
+        g = k = 0
+
+        for s in reversed(b.statements):
+            bit = slot_bit(s)
+
+            if bit and s.name == 'sw':
+                g &= ~bit
+                k |= bit
+            elif bit:
+                g |= bit
+
+        gen[b] = g
+        kill[b] = k
+
+    transfer = lambda b, out: gen[b] | (out & ~kill[b])
+    live_in, live_out, iterations = solve(blocks, False, or_, transfer, 0, 0)
+
+    interference = dict((bit, 0) for bit in bits.itervalues())
+    across = 0
+
+    for b in blocks:
+        live = live_out[b]
+
+        for s in reversed(b.statements):
+            if s.is_command('jal'):
+                across |= live
+
+            bit = slot_bit(s)
+
+            if bit and s.name == 'sw':
+                interference[bit] |= live & ~bit
+
+                for other in bits.itervalues():
+                    if other & live and other != bit:
+                        interference[other] |= bit
+
+                live &= ~bit
+            elif bit:
+                live |= bit
+
+    return interference, across
+
+
+def allocate_registers(slots, weights, interference, across, temporaries,
+                       callee_saved):
+    """Assign registers to stack slots, in order of decreasing access weight.
+    A slot shares a register with slots it does not interfere with, if
+    possible. Slots that are live across a call are only assigned callee saved
+    registers, and a callee saved register is only used if it saves more
+    memory accesses than it costs. Returns a dictionary of slot offsets to
+    registers."""
+    bits = dict((offset, 1 << i) for i, offset in enumerate(slots))
+    assigned = {}
+    occupants = {}
+
+    for offset in sorted(slots, key=lambda o: (-weights[o], o)):
+        bit = bits[offset]
+        crosses = across & bit
+
+        def reuse(registers):
+            for reg in registers:
+                if reg in occupants \
+                        and not interference[bit] & occupants[reg]:
+                    return reg
+
+        def new(registers):
+            for reg in registers:
+                if reg not in occupants:
+                    return reg
+
+        reg = None
+
+        if not crosses:
+            reg = reuse(temporaries) or new(temporaries)
+
+        if reg is None:
+            reg = reuse(callee_saved)
+
+        if reg is None and weights[offset] > SAVE_COST:
+            reg = new(callee_saved)
+
+        if reg is not None:
+            assigned[offset] = reg
+            occupants[reg] = occupants.get(reg, 0) | bit
+
+    return assigned
+
+
+def promote_stack_slots(blocks):
+    """
+    Stack slot promotion:
+    sw $2, 16($fp)          ->  move $25, $2
+    ...                         ...
+    lw $3, 16($fp)              move $3, $25
+
+    Local variables (and argument home slots) are kept in the stack frame by
+    unoptimized code. A stack slot of which the address is not taken, and
+    that is only accessed by word loads and stores, is promoted to a register
+    that is not used by the function. Temporary registers are only used for
+    slots that are not live across a function call, other slots are promoted
+    to callee saved registers, which are saved in the prologue and restored
+    in the epilogue. The frame grows to make room for the saved registers,
+    and the .frame and .mask directives are updated accordingly. Returns the
+    set of blocks that have been changed.
+    """
+    statements = [s for b in blocks for s in b]
+    frame = find_frame(statements)
+
+    if frame is None:
+        return set()
+
+    usage = FrameUsage(blocks)
+
+    if not usage.valid:
+        return set()
+
+    slots = usage.candidates(frame)
+
+    if not slots:
+        return set()
+
+    # Registers that are not used anywhere in the function are available. New
+    # callee saved registers are stored below the saved registers, which are
+    # ordered by decreasing register number.
+    used = set()
+
+    for s in statements:
+        for arg in s:
+            if isinstance(arg, str):
+                used.update(REGISTER.findall(arg))
+
+    temporaries = [r for r in reversed(TEMPORARY_REGS) if r not in used]
+    callee_saved = []
+
+    if usage.epilogues and frame.mask_bits:
+        lowest = frame.lowest_register()
+        callee_saved = [r for r in CALLEE_SAVED_REGS if r not in used
+                        and register_number(r) < lowest]
+
+    frequencies = block_frequencies(blocks)
+    weights = dict((offset, sum(frequencies[b] for b, i in accesses))
+                   for offset, accesses in usage.accesses.iteritems())
+    interference, across = slot_liveness(blocks, slots)
+    assigned = allocate_registers(slots, weights, interference, across,
+                                  temporaries, callee_saved)
+
+    if not assigned:
+        return set()
+
+    replacements = {}
+
+    for offset, reg in assigned.iteritems():
+        for b, i in usage.accesses[offset]:
+            s = b[i]
+
+            if s.name == 'sw':
+                move = S('command', 'move', reg, s[0])
+            else:
+                move = S('command', 'move', s[0], reg)
+
+            if b.verbose:
+                move.set_message(' Promoted stack slot %s to %s'
+                                 % (s[1], reg))
+
+            replacements.setdefault(b, {})[i] = move
+
+    for b, moves in replacements.iteritems():
+        b.statements = [moves.get(i, s) for i, s in enumerate(b)]
+
+    touched = set(replacements)
+
+    saved = [r for r in set(assigned.itervalues()) if r in CALLEE_SAVED_REGS]
+
+    if saved:
+        touched |= save_registers(blocks, frame, usage, saved)
+
+    return touched
+
+
+def save_registers(blocks, frame, usage, registers):
+    """Grow the frame of a function to save the given callee saved registers
+    in the prologue and restore them in the epilogues. The offsets of the
+    register save area and the frame of the caller are moved up. Returns the
+    set of blocks that have been changed."""
+    boundary = frame.args + frame.vars
+    offsets, growth = frame.save_registers(registers)
+    touched = set()
+
+    for b in blocks:
+        for s in b:
+            if not s.is_command():
+                continue
+
+            for n, arg in enumerate(s):
+                address = frame_address(arg)
+
+                if address and address[0] >= boundary:
+                    s[n] = '%d(%s)' % (address[0] + growth, address[1])
+                    touched.add(b)
+
+            if s.name in ('addu', 'subu') and s[1] in ('$fp', '$sp') \
+                    and isinstance(s[2], int) \
+                    and (s[2] >= boundary or s.name == 'subu'):
+                s[2] += growth
+                touched.add(b)
+
+    # Insert the restores before each epilogue stack pointer adjustment, in
+    # reverse order so that the indices of earlier epilogues remain valid
+    order = sorted(offsets, key=register_number, reverse=True)
+
+    for b, i in sorted(usage.epilogues, reverse=True):
+        b.statements = b[:i] + [S('command', 'lw', reg, '%d($sp)'
+                                  % offsets[reg]) for reg in order] + b[i:]
+        touched.add(b)
+
+    b, i = usage.prologue
+    b.statements = b[:i] + [S('command', 'sw', reg, '%d($sp)' % offsets[reg])
+                            for reg in order] + b[i:]
+    touched.add(b)
+
+    return touched
@@ -1,19 +1,93 @@
-from copy import copy
 import re
 
+import opcodes as op
 
-class Statement:
-    sid = 1
+
+REGISTER = re.compile('^\$\d+$')
+OFFSET_ADDRESS = re.compile('^[^(]+\(([^)]+)\)$')
+FLOAT_CONSTANT = re.compile('^\$LC\d+$')
+
+
+def intern_arg(arg):
+    """Intern string arguments, so that equal register names and labels share
+    a single string object."""
+    return intern(arg) if type(arg) is str else arg
+
+
+class Statement(object):
+    __slots__ = ('stype', 'name', 'args', 'sid', 'flags', '_options', '_def',
+                 '_use', '_use_items', 'replaced', 'remove')
+
+    # ID that is assigned to the next created statement
+    next_sid = 1
 
     def __init__(self, stype, name, *args, **kwargs):
-        self.stype = stype
-        self.name = name
-        self.args = copy(list(args))
-        self.options = kwargs
+        object.__setattr__(self, 'stype', intern(stype))
+        object.__setattr__(self, 'name', intern_arg(name))
+        object.__setattr__(self, 'args', map(intern_arg, args))
+        object.__setattr__(self, '_options', kwargs or None)
+        self.classify()
+        self.invalidate()
+
+        # Pass metadata: copies (x, y) that have been propagated into this
+        # statement, and whether the statement should be removed
+        object.__setattr__(self, 'replaced', None)
+        object.__setattr__(self, 'remove', False)
 
         # Assign a unique ID to each statement
-        self.sid = Statement.sid
-        Statement.sid += 1
+        object.__setattr__(self, 'sid', Statement.next_sid)
+        Statement.next_sid += 1
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+
+        # The opcode classification depends on the type and name, the defined
+        # and used registers also depend on the arguments
+        if name == 'stype' or name == 'name':
+            self.classify()
+            self.invalidate()
+        elif name == 'args':
+            self.invalidate()
+
+    def __getstate__(self):
+        return (self.stype, self.name, self.args, self.sid, self._options,
+                self.replaced, self.remove)
+
+    def __setstate__(self, state):
+        """Restore a pickled statement (e.g. one that has been optimized in
+        another process). The strings are interned again and the caches are
+        rebuilt."""
+        stype, name, args, sid, options, replaced, remove = state
+        object.__setattr__(self, 'stype', intern(stype))
+        object.__setattr__(self, 'name', intern_arg(name))
+        object.__setattr__(self, 'args', map(intern_arg, args))
+        object.__setattr__(self, 'sid', sid)
+        object.__setattr__(self, '_options', options)
+        object.__setattr__(self, 'replaced', replaced)
+        object.__setattr__(self, 'remove', remove)
+        self.classify()
+        self.invalidate()
+
+    def classify(self):
+        """Look up the instruction categories and operand roles of the
+        statement in the opcode table."""
+        object.__setattr__(self, 'flags', op.classify(self.name) \
+                           if self.stype == 'command' else 0)
+
+    @property
+    def options(self):
+        """Dictionary of statement options, which is only created when it is
+        needed."""
+        if self._options is None:
+            object.__setattr__(self, '_options', {})
+
+        return self._options
+
+    def get_option(self, name, default=None):
+        """Get the value of an option without creating the options
+        dictionary."""
+        return default if self._options is None \
+               else self._options.get(name, default)
 
     def __getitem__(self, n):
         """Get an argument."""
@@ -21,7 +95,8 @@ class Statement:
 
     def __setitem__(self, n, value):
         """Set an argument."""
-        self.args[n] = value
+        self.args[n] = intern_arg(value)
+        self.invalidate()
 
     def __eq__(self, other):
         """Check if two statements are equal by comparing their type, name and
@@ -50,7 +125,7 @@ class Statement:
         self.options['comment'] = comment
 
     def has_inline_comment(self):
-        return 'comment' in self.options and len(self.options['comment'])
+        return bool(self.get_option('comment'))
 
     def is_comment(self):
         return self.stype == 'comment'
@@ -67,43 +142,31 @@ class Statement:
 
     def is_jump(self):
         """Check if the statement is a jump."""
-        return self.is_command() \
-               and re.match('^j|jal|beq|bne|blez|bgtz|bltz|bgez|bc1t|bc1f$', \
-                            self.name)
+        return bool(self.flags & op.JUMP)
 
     def is_branch(self):
         """Check if the statement is a branch."""
-        return self.is_command() \
-               and re.match('^beq|bne|blez|bgtz|bltz|bgez|bct|bcf|bc1f|bc1t$',\
-                            self.name)
+        return bool(self.flags & op.BRANCH)
 
     def is_branch_zero(self):
         """Check if statement is a branch that compares with zero."""
-        return self.is_command() \
-               and re.match('^blez|bgtz|bltz|bgez$', self.name)
+        return bool(self.flags & op.BRANCH_ZERO)
 
     def is_shift(self):
         """Check if the statement is a shift operation."""
-        return self.is_command() and re.match('^s(ll|rl|ra)$', self.name)
+        return bool(self.flags & op.SHIFT)
 
     def is_load(self):
         """Check if the statement is a load instruction."""
-        return self.is_command() and self.name in ['lw', 'li', 'dlw', 'l.s', \
-                                                   'l.d']
+        return bool(self.flags & op.LOAD)
 
     def is_store(self):
         """Check if the statement is a store instruction."""
-        return self.is_command() and self.name in ['sw', 'sb', 's.d', 'dsw', \
-                                                   's.s', 's.b']
+        return bool(self.flags & op.STORE)
 
     def is_arith(self):
         """Check if the statement is an aritmethic operation."""
-        return self.is_command() \
-               and re.match('^s(ll|rl|ra)'
-                            + '|(abs|neg|and|[xn]?or)'
-                            + '|(add|sub|slt)u?'
-                            + '|(add|sub|mult|div|abs|neg|sqrt|c)\.[sd]$', \
-                            self.name)
+        return bool(self.flags & op.ARITH)
 
     def is_monop(self):
         """Check if the statement is an unary operation."""
@@ -115,43 +178,44 @@ class Statement:
 
     def is_load_non_immediate(self):
         """Check if the statement is a load statement."""
-        return self.is_command() \
-               and re.match('^l(w|a|b|bu|\.d|\.s)|dlw$', \
-                            self.name)
+        return bool(self.flags & op.LOAD_NON_IMMEDIATE)
+
+    def is_memory_access(self):
+        """Check if the statement loads from or stores to memory."""
+        return bool(self.flags & (op.LOAD_NON_IMMEDIATE | op.STORE)) \
+               and self.name != 'la'
 
     def is_logical(self):
         """Check if the statement is a logical operator."""
-        return self.is_command() and re.match('^(xor|or|and)i?$', self.name)
+        return bool(self.flags & op.LOGICAL)
 
     def is_double_arithmetic(self):
         """Check if the statement is a arithmetic .d operator."""
-        return self.is_command() and \
-                re.match('^(add|sub|div|mul)\.[sd]$', self.name)
+        return bool(self.flags & op.DOUBLE_ARITHMETIC)
 
     def is_double_unary(self):
         """Check if the statement is a unary .d operator."""
-        return self.is_command() and \
-                re.match('^(abs|neg|mov)\.d$', self.name)
+        return bool(self.flags & op.DOUBLE_UNARY)
 
     def is_move_from_spec(self):
         """Check if the statement is a move from the result register."""
-        return self.is_command() and self.name in ['mflo', 'mthi']
+        return bool(self.flags & op.MOVE_FROM_SPEC)
 
     def is_set_if_less(self):
         """Check if the statement is a shift if less then."""
-        return self.is_command() and self.name in ['slt', 'sltu']
+        return bool(self.flags & op.SET_IF_LESS)
 
     def is_convert(self):
         """Check if the statement is a convert operator."""
-        return self.is_command() and re.match('^cvt\.[a-z\.]*$', self.name)
+        return bool(self.flags & op.CONVERT)
 
     def is_truncate(self):
         """Check if the statement is a convert operator."""
-        return self.is_command() and re.match('^trunc\.[a-z\.]*$', self.name)
+        return bool(self.flags & op.TRUNCATE)
 
     def is_compare(self):
         """Check if the statement is a comparison."""
-        return self.is_command() and re.match('^c\.[a-z\.]*$', self.name)
+        return bool(self.flags & op.COMPARE)
 
     def jump_target(self):
         """Get the jump target of this statement."""
@@ -160,80 +224,72 @@ class Statement:
 
         return self[-1]
 
+    def invalidate(self):
+        """Discard the cached defined and used registers, which must be
+        recomputed after the statement has been changed."""
+        object.__setattr__(self, '_def', None)
+        object.__setattr__(self, '_use', None)
+        object.__setattr__(self, '_use_items', None)
+
     def get_def(self):
         """Get the variable that this statement defines, if any."""
-        instr = ['div', 'move', 'addu', 'subu', 'li', 'dmfc1', 'mov.d']
-        defined = set()
+        if self._def is None:
+            flags = self.flags
+            defined = []
+
+            if flags & op.DEF_1:
+                defined.append(self[1])
 
-        if self.is_command('mtc1'):
-             defined.add(self[1])
-        if self.is_load_non_immediate() or self.is_arith() \
-                or self.is_logical() or self.is_double_arithmetic() \
-                or self.is_move_from_spec() or self.is_double_unary() \
-                or self.is_set_if_less() or self.is_convert() \
-                or self.is_truncate() or self.is_load() \
-                or self.is_command(*instr):
-            defined.add(self[0])
+            if flags & op.DEF_0:
+                defined.append(self[0])
 
-        return defined
+            self._def = frozenset(defined)
+
+        return self._def
 
     def get_use(self, as_items=False):
-        """Get the variables that this statement uses, if any."""
-        instr = ['addu', 'subu', 'mult', 'div', 'move', 'mov.d', \
-            'dmfc1', 'div.s']
-        use = set()
-        indices = []
+        """Get the variables that this statement uses, if any. If `as_items'
+        is True, a sequence of (index, register) tuples is returned."""
+        if self._use is None:
+            self._find_use()
+
+        return self._use_items if as_items else self._use
+
+    def _find_use(self):
+        flags = self.flags
+        items = []
 
         # Jump to register addres uses register
-        if self.is_command('j') and re.match('^\$\d+$', self[0]):
-            use.add(self[0])
-            indices.append(0)
+        if flags & op.USE_JUMP_REG and REGISTER.match(self[0]):
+            items.append((0, self[0]))
 
         # Case arg0
-        if (self.is_branch() \
-                and not self.is_command('bc1f', 'bc1t', 'bct', 'bcf')) \
-                or self.is_store() or self.is_compare() \
-                or self.is_command('mult', 'dsz', 'mtc1'):
-            if self.name == 'dsz':
-                m = re.match('^[^(]+\(([^)]+)\)$', self[0])
-
-                if m:
-                    use.add(m.group(1))
-                    indices.append(0)
-            else:
-                use.add(self[0])
-                indices.append(0)
-
-        if (self.is_branch() and not self.is_branch_zero() \
-                and not self.is_command('bc1f', 'bc1t', 'bct', 'bcf')) \
-                or self.is_shift() \
-                or self.is_double_arithmetic() or self.is_double_unary() \
-                or self.is_logical() or self.is_convert() \
-                or self.is_truncate() or self.is_set_if_less() \
-                or self.is_compare() or self.is_command(*instr):
+        if flags & op.USE_0:
+            items.append((0, self[0]))
+        elif flags & op.USE_0_ADDRESS:
+            m = OFFSET_ADDRESS.match(self[0])
+
+            if m:
+                items.append((0, m.group(1)))
+
+        if flags & op.USE_1:
             # Case arg1 direct adressing
-            use.add(self[1])
-            indices.append(1)
-        elif self.is_load_non_immediate() or self.is_store():
+            items.append((1, self[1]))
+        elif flags & op.USE_1_ADDRESS:
             # Case arg1 relative adressing
-            m = re.match('^[^(]+\(([^)]+)\)$', self[1])
+            m = OFFSET_ADDRESS.match(self[1])
 
             if m:
-                use.add(m.group(1))
-                indices.append(1)
-            elif not re.match('^\$LC\d+$', self[1]):
-                use.add(self[1])
-                indices.append(1)
+                items.append((1, m.group(1)))
+            elif not FLOAT_CONSTANT.match(self[1]):
+                items.append((1, self[1]))
 
         # Case arg2
-        if (self.is_double_arithmetic() or self.is_set_if_less() \
-                or self.is_logical() or self.is_truncate() \
-                or self.is_command('addu', 'subu', 'div')) \
-                and not isinstance(self[2], int):
-            use.add(self[2])
-            indices.append(2)
+        if flags & op.USE_2 and not isinstance(self[2], int):
+            items.append((2, self[2]))
 
-        return zip(indices, use) if as_items else use
+        self._use_items = tuple(items)
+        self._use = frozenset(reg for index, reg in items)
 
     def defines(self, reg):
         """Check if this statement defines the given register."""
@@ -241,16 +297,14 @@ class Statement:
 
     def uses(self, reg, as_index=False):
         """Check if this statement uses the given register."""
-        use = self.get_use(as_index)
+        if not as_index:
+            return reg in self.get_use()
 
-        if as_index:
-            for index, register in use:
-                if register == reg:
-                    return index
+        for index, register in self.get_use(True):
+            if register == reg:
+                return index
 
-            return -1
-
-        return reg in use
+        return -1
 
     def replace_usage(self, x, y, index, bid=0):
         """Replace uses of register x by y at the specified index."""
@@ -263,19 +317,69 @@ class Statement:
             self.set_message(' Replaced %s with %s' % (x, y))
 
 
-class Block:
-    bid = 1
+class Block(object):
+    """
+    A list of statements with a pointer, which is used to walk through the
+    statements and rewrite them. The statements are stored in a gap buffer:
+    the statements before the gap are stored in order, the statements after
+    the gap in reverse order. The gap is moved to the position of each edit,
+    so that a rewrite costs time proportional to the size of the edit and the
+    distance from the previous edit, instead of the size of the block.
+    """
+    __slots__ = ('_front', '_back', 'pointer', 'bid', 'verbose')
+
+    # ID that is assigned to the next created block
+    next_bid = 1
 
     def __init__(self, statements=[], verbose=0):
-        self.statements = statements
+        self.statements = list(statements)
         self.pointer = 0
 
         # Assign a unique ID to each block for printing purposes
-        self.bid = Block.bid
-        Block.bid += 1
+        self.bid = Block.next_bid
+        Block.next_bid += 1
 
         self.verbose = verbose
 
+    def get_statements_list(self):
+        """Get the statement list, after closing the gap."""
+        if self._front is None:
+            raise AttributeError('statements')
+
+        if self._back:
+            self._front.extend(reversed(self._back))
+            self._back = []
+
+        return self._front
+
+    def set_statements_list(self, statements):
+        self._front = statements
+        self._back = []
+
+    def del_statements_list(self):
+        self._front = self._back = None
+
+    statements = property(get_statements_list, set_statements_list,
+                          del_statements_list)
+
+    def move_gap(self, index):
+        """Move the gap to the given statement index."""
+        front = self._front
+        back = self._back
+        f = len(front)
+
+        if index < f:
+            moved = front[index:]
+            del front[index:]
+            moved.reverse()
+            back.extend(moved)
+        elif index > f:
+            k = min(index - f, len(back))
+            moved = back[-k:]
+            del back[-k:]
+            moved.reverse()
+            front.extend(moved)
+
     def __str__(self):
         return '<Block bid=%d statements=%d>' % (self.bid, len(self))
 
@@ -286,15 +390,26 @@ class Block:
         return iter(self.statements)
 
     def __getitem__(self, n):
-        return self.statements[n]
+        if not isinstance(n, int):
+            return self.statements[n]
+
+        f = len(self._front)
+
+        if n < 0:
+            n += f + len(self._back)
+
+            if n < 0:
+                raise IndexError('statement index out of range')
+
+        return self._front[n] if n < f else self._back[f - n - 1]
 
     def __len__(self):
-        return len(self.statements)
+        return len(self._front) + len(self._back)
 
     def read(self):
         """Read the statement at the current pointer position and move the
         pointer one position to the right."""
-        s = self.statements[self.pointer]
+        s = self[self.pointer]
         self.pointer += 1
 
         return s
@@ -309,8 +424,11 @@ class Block:
         if self.end():
             return Statement('empty', '') if count == 1 else []
 
-        return self.statements[self.pointer] if count == 1 \
-               else self.statements[self.pointer:self.pointer + count]
+        if count == 1:
+            return self[self.pointer]
+
+        return [self[i] for i in xrange(self.pointer,
+                                        min(self.pointer + count, len(self)))]
 
     def replace(self, count, replacement, start=None, message=''):
         """Replace the given range start-(start + count) with the given
@@ -322,6 +440,10 @@ class Block:
         if start == None:
             start = self.pointer - 1
 
+        self.move_gap(start)
+        back = self._back
+        count = min(count, len(back))
+
         # Add a message in inline comments
         if self.verbose:
             if len(message):
@@ -336,19 +458,19 @@ class Block:
                     replacement = [Statement('comment', message)]
             elif not len(replacement):
                 # Statement is removed, comment it
-                replacement = [Statement('comment', str(b)) \
-                               for b in self.statements[start:start + count]]
+                replacement = [Statement('comment', str(back[-i])) \
+                               for i in xrange(1, count + 1)]
 
-        before = self.statements[:start]
-        after = self.statements[start + count:]
-        self.statements = before + replacement + after
+        del back[len(back) - count:]
+        self._front.extend(replacement)
         self.pointer = start + len(replacement)
 
     def insert(self, statement, index=None, message=''):
         if index == None:
             index = self.pointer
 
-        self.statements.insert(index, statement)
+        self.move_gap(index)
+        self._front.append(statement)
         statement.set_message(' ' + message)
 
     def apply_filter(self, callback):
@@ -0,0 +1,93 @@
+import json
+
+
+# Counters that are kept for each optimization pass
+PASS_COUNTERS = ('time', 'invocations', 'skipped', 'rewrites', 'removed')
+
+
+def new_counters():
+    """Create a dictionary of zero pass counters."""
+    return dict((counter, 0) for counter in PASS_COUNTERS)
+
+
+def add_counters(total, counters):
+    """Add the pass counters in `counters' to those in `total'."""
+    for counter in PASS_COUNTERS:
+        total[counter] += counters[counter]
+
+
+class IterationStats(object):
+    """
+    Statistics of a single optimization iteration of a function: the wall
+    time of the iteration and of the dataflow analyses in it, the number of
+    statements after the iteration, and the counters of each optimization
+    pass. Times are in seconds.
+    """
+    def __init__(self, iteration):
+        self.iteration = iteration
+        self.time = 0.0
+        self.analysis_time = 0.0
+        self.statements = 0
+        self.passes = {}
+
+    def counters(self, name):
+        """Get the counters of a pass, creating them if necessary."""
+        counters = self.passes.get(name)
+
+        if counters is None:
+            counters = self.passes[name] = new_counters()
+
+        return counters
+
+    def record(self, name, elapsed, rewritten, removed):
+        """Record an invocation of a pass, which took `elapsed' seconds and
+        removed the given number of statements. `rewritten' indicates whether
+        the pass has changed anything."""
+        counters = self.counters(name)
+        counters['time'] += elapsed
+        counters['invocations'] += 1
+        counters['removed'] += removed
+
+        if rewritten:
+            counters['rewrites'] += 1
+
+    def skip(self, name):
+        """Record a skipped invocation of a pass."""
+        self.counters(name)['skipped'] += 1
+
+    def add(self, other):
+        """Add the statistics of another iteration, e.g. the same iteration of
+        another function, to these statistics."""
+        self.time += other.time
+        self.analysis_time += other.analysis_time
+        self.statements += other.statements
+
+        for name, counters in other.passes.iteritems():
+            add_counters(self.counters(name), counters)
+
+    def as_dict(self):
+        """Get the statistics as a dictionary that can be serialized."""
+        return {'iteration': self.iteration, 'time': self.time,
+                'analysis_time': self.analysis_time,
+                'statements': self.statements,
+                'passes': dict((name, dict(counters))
+                               for name, counters in self.passes.iteritems())}
+
+
+def pass_totals(iterations):
+    """Sum the pass counters of a sequence of iteration statistics. Returns a
+    dictionary of pass names to counters."""
+    totals = {}
+
+    for stats in iterations:
+        for name, counters in stats.passes.iteritems():
+            add_counters(totals.setdefault(name, new_counters()), counters)
+
+    return totals
+
+
+def save_stats(stats, f):
+    """Write statistics (as returned by Program.get_stats) as JSON to a
+    file-like object."""
+    json.dump(stats, f, indent=2, separators=(',', ': '), sort_keys=True)
+    f.write('\n')
@@ -1,3 +1,4 @@
+from cStringIO import StringIO
 from math import ceil
 
 
@@ -11,80 +12,113 @@ ADD_ARGUMENT_SPACE = False  # Wether to add a space between command arguments
                             # and the previous comma
 
 
-def write_statements(statements, verbose=0):
-    """Write a list of statements to valid assembly code."""
-    out = ''
+# Tabs that are added after a command name of a given length, to reach the
+# argument column
+COMMAND_PADDING = ['\t' * int(ceil((COMMAND_SIZE - l) / float(TABSIZE)))
+                   for l in xrange(COMMAND_SIZE)]
+
+# Column of the arguments of a command with a name of a given length
+ARGUMENT_COLUMN = [len(('\t' + 'x' * l + pad).expandtabs(TABSIZE))
+                   for l, pad in enumerate(COMMAND_PADDING)]
+
+# Tabs that are added after a line of a given width to reach the inline
+# comment level
+COMMENT_PADDING = ['\t' * int(ceil((INLINE_COMMENT_LEVEL * TABSIZE - w)
+                                   / float(TABSIZE)))
+                   for w in xrange(INLINE_COMMENT_LEVEL * TABSIZE)]
+
+# Number of lines that are buffered before they are written to the file
+WRITE_BUFFER_LINES = 1024
+
+
+def write_stream(f, statements, verbose=0):
+    """Write a sequence of statements as valid assembly code to a file-like
+    object. The statements are consumed lazily and the output is written in
+    buffered chunks."""
     indent_level = 0
     prev_comment = False
+    buf = []
+    delim = ', ' if ADD_ARGUMENT_SPACE else ','
 
-    for i, s in enumerate(statements):
+    for s in statements:
         current_comment = False
+        width = None
+        stype = s.stype
 
-        if s.is_label():
+        if stype == 'label':
             line = s.name + ':'
             indent_level = 1
-        elif s.is_comment():
+        elif stype == 'comment':
             line = '\t' * indent_level + '#' + s.name
-            current_comment = s.options.get('block', True)
-        elif s.is_directive():
+            current_comment = s.get_option('block', True)
+        elif stype == 'directive':
             line = '\t' + s.name
-        elif s.is_command():
+        elif stype == 'command':
             line = '\t' + s.name
 
             # If there are arguments, add tabs until the 8 character limit has
             # been reached. If the command name is 8 or more characers long,
             # add a single space
-            if len(s):
+            if s.args:
                 l = len(s.name)
+                args = delim.join(map(str, s.args))
 
                 if l < COMMAND_SIZE:
-                    line += '\t' * int(ceil((COMMAND_SIZE - l)
-                                       / float(TABSIZE)))
+                    line += COMMAND_PADDING[l] + args
+                    width = ARGUMENT_COLUMN[l] + len(args)
                 else:
-                    line += ' '
+                    line += ' ' + args
+                    width = TABSIZE + l + 1 + len(args)
 
-                delim = ', ' if ADD_ARGUMENT_SPACE else ','
-                line += delim.join(map(str, s))
+                if '\t' in args:
+                    width = None
         else:
-            raise Exception('Unsupported statement type "%s"' % s.stype)
+            raise Exception('Unsupported statement type "%s"' % stype)
 
         # Add the inline comment, if there is any
-        comment = ''
+        comment = s.get_option('comment')
 
-        if s.has_inline_comment():
-            comment = s.options['comment']
-        elif verbose:
-            comment = ' |'.join(s.options.get('message', []))
+        if not comment and verbose:
+            comment = ' |'.join(s.get_option('message', []))
 
-        if len(comment):
-            start = INLINE_COMMENT_LEVEL * TABSIZE
-            diff = start - len(line.expandtabs(TABSIZE))
+        if comment:
+            if width is None:
+                width = len(line.expandtabs(TABSIZE))
 
             # The comment must not be directly adjacent to the command itself
-            if diff > 0:
-                tabs = '\t' * int(ceil(diff / float(TABSIZE)))
+            if width < len(COMMENT_PADDING):
+                tabs = COMMENT_PADDING[width]
             else:
                 tabs = '  '
 
             line += tabs + '#' + comment
 
-        # Add newline at end of command
-        line += '\n'
-
         if ADD_COMMENT_BLOCKS:
             if prev_comment ^ current_comment:
-                out += '\n'
+                buf.append('\n')
 
-        out += line
+        # Add newline at end of command
+        buf.append(line + '\n')
         prev_comment = current_comment
 
-    return out
+        if len(buf) >= WRITE_BUFFER_LINES:
+            f.write(''.join(buf))
+            del buf[:]
+
+    f.write(''.join(buf))
+
+
+def write_statements(statements, verbose=0):
+    """Write a list of statements to valid assembly code."""
+    out = StringIO()
+    write_stream(out, statements, verbose)
+
+    return out.getvalue()
 
 
 def write_to_file(filename, statements):
     """Convert a list of statements to valid assembly code and write it to a
     file."""
-    s = write_statements(statements)
     f = open(filename, 'w+')
-    f.write(s)
+    write_stream(f, statements)
     f.close()
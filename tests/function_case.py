@@ -0,0 +1,50 @@
+import unittest
+
+from src.statement import Statement as S
+from src.dataflow import find_basic_blocks, generate_flow_graph
+
+
+class FunctionTestCase(unittest.TestCase):
+    """
+    Base class of the tests of function level optimizations, which provides
+    the prologue and epilogue of a function `foo' with a frame of 32 bytes,
+    as generated by gcc -O0.
+    """
+
+    def setUp(self):
+        self.prologue = [S('directive', '.ent\tfoo'), S('label', 'foo'),
+                         S('directive', '.frame\t$fp,32,$31\t\t# vars= 8, '
+                                        'regs= 2/0, args= 16, extra= 0'),
+                         S('directive', '.mask\t0xc0000000,-4'),
+                         S('command', 'subu', '$sp', '$sp', 32),
+                         S('command', 'sw', '$31', '28($sp)'),
+                         S('command', 'sw', '$fp', '24($sp)'),
+                         S('command', 'move', '$fp', '$sp')]
+        self.epilogue = [S('command', 'move', '$sp', '$fp'),
+                         S('command', 'lw', '$31', '28($sp)'),
+                         S('command', 'lw', '$fp', '24($sp)'),
+                         S('command', 'addu', '$sp', '$sp', 32),
+                         S('command', 'j', '$31'),
+                         S('directive', '.end\tfoo')]
+
+    def tearDown(self):
+        del self.prologue
+        del self.epilogue
+
+    def function(self, body):
+        """Create the basic blocks and flow graph of the function with the
+        given body."""
+        blocks = find_basic_blocks(self.prologue + body + self.epilogue)
+        generate_flow_graph(blocks)
+
+        return blocks
+
+    def body(self, blocks, labels=False):
+        """Get the (name, args) tuples of the commands, and optionally the
+        labels, in the body of the function."""
+        keep = lambda s: s.is_command() or (labels and s.is_label())
+        statements = [s for b in blocks for s in b if keep(s)]
+        start = len(filter(keep, self.prologue))
+        end = len(statements) - len(filter(keep, self.epilogue))
+
+        return [(s.name, s.args) for s in statements[start:end]]
@@ -0,0 +1,89 @@
+import unittest
+
+from src.statement import Statement as S
+from src.function import Function
+from src.analysis import AnalysisManager
+
+
+class TestAnalysisManager(unittest.TestCase):
+
+    def setUp(self):
+        self.statements = [S('label', 'foo'),
+                           S('command', 'li', '$2', 1),
+                           S('command', 'beq', '$2', '$0', '$L1'),
+                           S('command', 'move', '$3', '$2'),
+                           S('label', '$L1'),
+                           S('command', 'addu', '$2', '$3', '$2'),
+                           S('command', 'j', '$31')]
+        self.function = Function('foo', self.statements)
+        self.analyses = self.function.analyses
+
+    def tearDown(self):
+        del self.statements
+        del self.function
+        del self.analyses
+
+    def test_require_lazy(self):
+        blocks = self.analyses.require('liveness')
+
+        self.assertEqual(len(blocks), 3)
+        self.assertTrue(hasattr(blocks[0], 'live_out'))
+        self.assertFalse(hasattr(blocks[0], 'copy_in'))
+        self.assertFalse(hasattr(blocks[0], 'reach_in'))
+        self.assertEqual(self.analyses.valid, set(['liveness']))
+
+    def test_require_cached(self):
+        blocks = self.analyses.require('liveness', 'reaching')
+        self.assertEqual(self.analyses.full_analyses, 2)
+
+        self.assertIs(self.analyses.require('liveness'), blocks)
+        self.assertEqual(self.analyses.full_analyses, 2)
+        self.assertEqual(self.analyses.incremental_analyses, 0)
+
+    def test_invalidate(self):
+        b1, b2, b3 = self.analyses.require('liveness', 'dominators')
+        b2.statements = [S('command', 'move', '$3', '$5')]
+        self.analyses.invalidate([b2], ('dominators',))
+
+        self.assertEqual(self.analyses.valid, set(['dominators']))
+        self.assertEqual(self.analyses.outdated, {'liveness': set([b2])})
+
+        self.analyses.require('liveness', 'dominators')
+
+        self.assertEqual(self.analyses.full_analyses, 2)
+        self.assertEqual(self.analyses.incremental_analyses, 1)
+        self.assertIn('$5', b2.live_in)
+        self.assertIn('$5', b1.live_in)
+
+    def test_invalidate_flow_graph(self):
+        blocks = self.analyses.require('liveness')
+        self.function.statements = self.function.get_statements()
+        self.analyses.invalidate_flow_graph()
+
+        self.assertIsNot(self.analyses.require(), blocks)
+        self.assertEqual(self.analyses.valid, set())
+
+    def test_flow_graph_unchanged(self):
+        blocks = self.analyses.require('liveness')
+        self.function.statements = self.function.get_statements()
+
+        self.assertIs(self.analyses.require('liveness'), blocks)
+        self.assertFalse(hasattr(self.function, 'statements'))
+
+    def test_flow_graph_changed(self):
+        blocks = self.analyses.require('liveness')
+        self.function.statements = self.function.get_statements()
+        del self.function.statements[2]
+
+        self.assertIsNot(self.analyses.require('liveness'), blocks)
+        self.assertEqual(len(self.function.blocks), 1)
+
+    def test_not_incremental(self):
+        blocks = self.analyses.require('liveness')
+        self.function.statements = self.function.get_statements()
+
+        try:
+            AnalysisManager.incremental = False
+            self.assertIsNot(self.analyses.require('liveness'), blocks)
+        finally:
+            AnalysisManager.incremental = True
@@ -0,0 +1,50 @@
+import unittest
+
+from src.bitset import Numbering, BitSet
+
+
+class TestBitSet(unittest.TestCase):
+
+    def setUp(self):
+        self.numbering = Numbering(['$1', '$2', '$3'])
+
+    def tearDown(self):
+        del self.numbering
+
+    def test_numbering(self):
+        self.assertEqual(self.numbering.number('$2'), 1)
+        self.assertEqual(self.numbering.number('$4'), 3)
+        self.assertEqual(self.numbering.bit('$3'), 4)
+        self.assertEqual(len(self.numbering), 4)
+
+    def test_operations(self):
+        a = self.numbering.set(['$1', '$2'])
+        b = self.numbering.set(['$2', '$3'])
+
+        self.assertEqual(a | b, set(['$1', '$2', '$3']))
+        self.assertEqual(a & b, set(['$2']))
+        self.assertEqual(a - b, set(['$1']))
+        self.assertEqual(a.add('$4'), set(['$1', '$2', '$4']))
+
+    def test_contains(self):
+        a = self.numbering.set(['$1', '$3'])
+
+        self.assertIn('$1', a)
+        self.assertNotIn('$2', a)
+        self.assertNotIn('$5', a)
+
+    def test_equality(self):
+        a = self.numbering.set(['$1', '$3'])
+
+        self.assertEqual(a, self.numbering.set(['$3', '$1']))
+        self.assertNotEqual(a, self.numbering.set(['$1']))
+        self.assertEqual(a, set(['$1', '$3']))
+        self.assertEqual(self.numbering.empty(), set())
+
+    def test_readable_view(self):
+        a = self.numbering.set(['$3', '$1'])
+
+        self.assertEqual(list(a), ['$1', '$3'])
+        self.assertEqual(len(a), 2)
+        self.assertFalse(self.numbering.empty())
+        self.assertEqual(str(a), '{$1, $3}')
@@ -0,0 +1,56 @@
+import unittest
+
+from src.statement import Statement as S
+from src.dataflow import BasicBlock as B, find_basic_blocks, \
+        generate_flow_graph
+from src.copy_propagation import create_gen_kill, create_in_out
+
+
+class TestCopyPropagation(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_create_gen_kill(self):
+        s1 = S('command', 'move', '$1', '$2')
+        s2 = S('command', 'move', '$3', '$4')
+        s3 = S('command', 'addu', '$4', '$1', 1)
+        b, = find_basic_blocks([s1, s2, s3])
+
+        create_gen_kill(b)
+
+        self.assertEqual(b.c_gen, set([('$1', '$2')]))
+        self.assertEqual(b.c_kill, set([('$1', '$2'), ('$3', '$4')]))
+
+    def test_create_gen_kill_call(self):
+        s1 = S('command', 'move', '$16', '$17')
+        s2 = S('command', 'move', '$4', '$16')
+        s3 = S('command', 'jal', 'foo')
+        b = B([s1, s2, s3])
+
+        create_gen_kill(b)
+
+        self.assertEqual(b.c_gen, set([('$16', '$17')]))
+        self.assertEqual(b.c_kill, set([('$16', '$17'), ('$4', '$16')]))
+
+    def test_create_in_out(self):
+        s11 = S('command', 'move', '$1', '$2')
+        s12 = S('command', 'move', '$3', '$4')
+        s13 = S('command', 'beq', '$5', '$0', 'L1')
+
+        s21 = S('command', 'li', '$3', 1)
+
+        s31 = S('label', 'L1')
+        s32 = S('command', 'addu', '$6', '$1', '$3')
+
+        b1, b2, b3 = find_basic_blocks([s11, s12, s13, s21, s31, s32])
+        generate_flow_graph([b1, b2, b3])
+        create_in_out([b1, b2, b3])
+
+        self.assertEqual(b1.copy_in, set())
+        self.assertEqual(b1.copy_out, set([('$1', '$2'), ('$3', '$4')]))
+        self.assertEqual(b2.copy_out, set([('$1', '$2')]))
+        self.assertEqual(b3.copy_in, set([('$1', '$2')]))
@@ -3,7 +3,8 @@ import unittest
 from src.statement import Statement as S
 from src.program import Program as P
 from src.dataflow import BasicBlock as B, find_leaders, find_basic_blocks, \
-        generate_flow_graph
+        generate_flow_graph, index_labels, postorder, solve, affected, pred, \
+        succ, is_reachable
 
 
 class TestDataflow(unittest.TestCase):
@@ -19,6 +20,10 @@ class TestDataflow(unittest.TestCase):
     def test_find_leaders(self):
         self.assertEqual(find_leaders(self.statements), [0, 2, 4])
 
+    def test_find_leaders_last_jump(self):
+        s = self.statements + [S('command', 'j', 'foo')]
+        self.assertEqual(find_leaders(s), [0, 2, 4])
+
     def test_find_basic_blocks(self):
         s = self.statements
         statements = map(lambda b: b.statements, find_basic_blocks(s))
@@ -44,3 +49,120 @@ class TestDataflow(unittest.TestCase):
         self.assertEqual(b2.edges_to, [b3])
         self.assertIn(b1, b3.edges_from)
         self.assertIn(b2, b3.edges_from)
+
+    def test_index_labels(self):
+        b1 = B([S('label', 'foo'), S('command', 'bar')])
+        b2 = B([S('command', 'bar'), S('label', 'baz')])
+        b3 = B([S('label', 'baz')])
+
+        self.assertEqual(index_labels([b1, b2, b3]), {'foo': [b1],
+                                                      'baz': [b3]})
+
+    def test_add_edge_to_once(self):
+        b1 = B([S('command', 'foo')])
+        b2 = B([S('command', 'bar')])
+        b1.add_edge_to(b2)
+        b1.add_edge_to(b2)
+
+        self.assertEqual(b1.edges_to, [b2])
+        self.assertEqual(b2.edges_from, [b1])
+
+    def test_generate_flow_graph_call(self):
+        b1 = B([S('command', 'foo'), S('command', 'jal', 'b3')])
+        b2 = B([S('command', 'bar')])
+        b3 = B([S('label', 'b3'), S('command', 'baz')])
+        generate_flow_graph([b1, b2, b3])
+
+        self.assertEqual(b1.edges_to, [b2])
+        self.assertEqual(b3.edges_from, [b2])
+
+    def create_loop(self):
+        b1 = B([S('command', 'foo')])
+        b2 = B([S('label', 'b2'), S('command', 'beq', '$1', '$2', 'b4')])
+        b3 = B([S('command', 'j', 'b2')])
+        b4 = B([S('label', 'b4'), S('command', 'baz')])
+        blocks = [b1, b2, b3, b4]
+        generate_flow_graph(blocks)
+
+        return blocks
+
+    def test_postorder(self):
+        b1, b2, b3, b4 = blocks = self.create_loop()
+        self.assertEqual(postorder(blocks), [b4, b3, b2, b1])
+
+    def test_solve_forward(self):
+        b1, b2, b3, b4 = blocks = self.create_loop()
+        gen = {b1: set([1]), b2: set([2]), b3: set([3]), b4: set([4])}
+        transfer = lambda b, value: value | gen[b]
+        union = lambda a, b: a | b
+
+        values_in, values_out, iterations = solve(blocks, True, union,
+                                                  transfer, set(), set())
+
+        self.assertEqual(values_in[b1], set())
+        self.assertEqual(values_in[b2], set([1, 2, 3]))
+        self.assertEqual(values_out[b4], set([1, 2, 3, 4]))
+        self.assertEqual(iterations, 6)
+
+    def test_solve_backward(self):
+        b1, b2, b3, b4 = blocks = self.create_loop()
+        gen = {b1: set([1]), b2: set([2]), b3: set([3]), b4: set([4])}
+        transfer = lambda b, value: value | gen[b]
+        union = lambda a, b: a | b
+
+        values_in, values_out, iterations = solve(blocks, False, union,
+                                                  transfer, set(), set())
+
+        self.assertEqual(values_out[b4], set())
+        self.assertEqual(values_in[b3], set([2, 3, 4]))
+        self.assertEqual(values_in[b1], set([1, 2, 3, 4]))
+
+    def test_affected(self):
+        b1, b2, b3, b4 = self.create_loop()
+
+        self.assertEqual(affected([b3], True), set([b2, b3, b4]))
+        self.assertEqual(affected([b3], False), set([b1, b2, b3]))
+        self.assertEqual(affected([b4], True), set([b4]))
+
+    def test_solve_region(self):
+        b1, b2, b3, b4 = blocks = self.create_loop()
+        gen = {b1: set([1]), b2: set([2]), b3: set([3]), b4: set([4])}
+        transfer = lambda b, value: value | gen[b]
+        union = lambda a, b: a | b
+        values = solve(blocks, True, union, transfer, set(), set())[:2]
+
+        gen[b3] = set([5])
+        expected = solve(blocks, True, union, transfer, set(), set())
+        values_in, values_out, iterations = solve(blocks, True, union,
+                transfer, set(), set(), affected([b3], True), values)
+
+        self.assertEqual(values_in, expected[0])
+        self.assertEqual(values_out, expected[1])
+        self.assertLess(iterations, expected[2])
+
+    def test_pred_succ(self):
+        b1, b2, b3, b4 = self.create_loop()
+
+        self.assertEqual(set(succ(b1)), set([b2, b3, b4]))
+        self.assertEqual(set(succ(b2)), set([b3, b4]))
+        self.assertEqual(set(pred(b4)), set([b1, b2, b3]))
+        self.assertEqual(pred(b1), ())
+        self.assertTrue(is_reachable(b3, b2))
+        self.assertFalse(is_reachable(b4, b1))
+
+    def test_pred_succ_invalidated(self):
+        b1, b2, b3, b4 = self.create_loop()
+
+        self.assertEqual(succ(b4), ())
+        b4.add_edge_to(b1)
+        self.assertEqual(set(succ(b4)), set([b1, b2, b3]))
+        b4.remove_edge_to(b1)
+        self.assertEqual(succ(b4), ())
+        self.assertEqual(b1.edges_from, [])
+
+    def test_succ_deep(self):
+        blocks = [B([S('command', 'foo')]) for i in xrange(5000)]
+        generate_flow_graph(blocks)
+
+        self.assertEqual(len(succ(blocks[0])), 4999)
+        self.assertEqual(len(pred(blocks[-1])), 4999)
@@ -0,0 +1,80 @@
+import unittest
+
+from src.statement import Statement as S
+from src.dataflow import BasicBlock as B, generate_flow_graph
+from src.dominator import Dominators, get_dominators, \
+        generate_dominator_tree
+
+
+class TestDominator(unittest.TestCase):
+
+    def setUp(self):
+        # b1 -> b2 -> b3 -> b5 -> b6 -> end
+        #       ^ |    ^     |
+        #       | v    |     |
+        #       | b4 --+     |
+        #       +------------+
+        self.b1 = B([S('command', 'foo')])
+        self.b2 = B([S('label', 'b2'), S('command', 'beq', '$1', '$2',
+                                         'b4')])
+        self.b3 = B([S('label', 'b3'), S('command', 'bar')])
+        self.b5 = B([S('command', 'beq', '$1', '$2', 'b2')])
+        self.b6 = B([S('command', 'j', 'end')])
+        self.b4 = B([S('label', 'b4'), S('command', 'j', 'b3')])
+        self.end = B([S('label', 'end')])
+        self.blocks = [self.b1, self.b2, self.b3, self.b5, self.b6, self.b4,
+                       self.end]
+        generate_flow_graph(self.blocks)
+
+    def tearDown(self):
+        del self.blocks
+
+    def test_idom(self):
+        d = Dominators(self.blocks)
+
+        self.assertIsNone(d.idom[self.b1])
+        self.assertEqual(d.idom[self.b2], self.b1)
+        self.assertEqual(d.idom[self.b3], self.b2)
+        self.assertEqual(d.idom[self.b4], self.b2)
+        self.assertEqual(d.idom[self.b5], self.b3)
+        self.assertEqual(d.idom[self.b6], self.b5)
+
+    def test_dominates(self):
+        d = Dominators(self.blocks)
+
+        self.assertTrue(d.dominates(self.b1, self.b6))
+        self.assertTrue(d.dominates(self.b2, self.b4))
+        self.assertTrue(d.dominates(self.b3, self.b3))
+        self.assertFalse(d.dominates(self.b4, self.b3))
+        self.assertFalse(d.dominates(self.b6, self.b2))
+        self.assertEqual(d.dominators(self.b5), [self.b5, self.b3, self.b2,
+                                                 self.b1])
+
+    def test_frontier(self):
+        d = Dominators(self.blocks)
+
+        self.assertEqual(d.frontier[self.b4], set([self.b3]))
+        self.assertEqual(d.frontier[self.b2], set([self.b2]))
+        self.assertEqual(d.frontier[self.b5], set([self.b2]))
+        self.assertEqual(d.frontier[self.b1], set())
+
+    def test_unreachable(self):
+        unreachable = B([S('command', 'foo')])
+        d = Dominators(self.blocks + [unreachable])
+
+        self.assertIsNone(d.idom[unreachable])
+        self.assertFalse(d.dominates(self.b1, unreachable))
+
+    def test_get_dominators_cached(self):
+        d = get_dominators(self.blocks)
+        self.assertIs(get_dominators(self.blocks), d)
+
+        self.b4.add_edge_to(self.end)
+        self.assertIsNot(get_dominators(self.blocks), d)
+
+    def test_generate_dominator_tree(self):
+        generate_dominator_tree(self.blocks)
+
+        self.assertEqual(self.b1.dominates, [self.b2])
+        self.assertEqual(set(self.b2.dominates), set([self.b3, self.b4]))
+        self.assertEqual(self.b6.dominated_by, [self.b5])
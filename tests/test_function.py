@@ -0,0 +1,168 @@
+import pickle
+import sys
+import unittest
+from StringIO import StringIO
+
+from src.statement import Statement as S, Block
+from src.function import Function, split_functions
+from src.program import Program
+from src.analysis import AnalysisManager
+from src.parser import parse_file
+from src.writer import write_statements
+
+
+class TestFunction(unittest.TestCase):
+
+    def setUp(self):
+        self.data = [S('directive', '.data'), S('label', '$LC0'),
+                     S('directive', '.word 1')]
+        self.foo = [S('directive', '.ent\tfoo'), S('label', 'foo'),
+                    S('command', 'move', '$2', '$2'),
+                    S('command', 'j', '$31'), S('directive', '.end\tfoo')]
+        self.bar = [S('directive', '.ent\tbar'), S('label', 'bar'),
+                    S('command', 'j', '$31'), S('directive', '.end\tbar')]
+
+    def tearDown(self):
+        del self.data
+        del self.foo
+        del self.bar
+
+    def test_split_functions(self):
+        parts = split_functions(self.data + self.foo + self.bar + self.data)
+
+        self.assertEqual(len(parts), 4)
+        self.assertIsInstance(parts[0], Block)
+        self.assertEqual(parts[0].statements, self.data)
+        self.assertIsInstance(parts[1], Function)
+        self.assertEqual(parts[1].name, 'foo')
+        self.assertEqual(parts[1].statements, self.foo)
+        self.assertEqual(parts[2].name, 'bar')
+        self.assertEqual(parts[2].statements, self.bar)
+        self.assertNotIsInstance(parts[3], Function)
+
+    def test_split_functions_none(self):
+        statements = [S('command', 'move', '$2', '$3')]
+        parts = split_functions(statements)
+
+        self.assertEqual(len(parts), 1)
+        self.assertIsInstance(parts[0], Function)
+        self.assertEqual(parts[0].statements, statements)
+
+    def test_function_optimize(self):
+        f = Function('foo', self.foo)
+
+        self.assertEqual(f.optimize(), 2)
+        self.assertTrue(f.converged)
+        self.assertEqual(f.get_statements(), self.foo[:2] + self.foo[3:])
+
+    def test_program_optimize(self):
+        program = Program(self.data + self.foo + self.bar, verbose=0)
+        program.optimize()
+
+        self.assertEqual(program.get_statements(),
+                         self.data + self.foo[:2] + self.foo[3:] + self.bar)
+        self.assertTrue(all(f.converged for f in program.functions))
+
+    def test_program_optimize_parallel(self):
+        program = Program(self.data + self.foo + self.bar, verbose=0)
+        program.optimize(jobs=2)
+
+        self.assertEqual(program.get_statements(),
+                         self.data + self.foo[:2] + self.foo[3:] + self.bar)
+        self.assertEqual(program.functions, program.parts[1:])
+
+    def test_program_optimize_parallel_verbose(self):
+        # Both programs get the same statement ids, which are printed in the
+        # block comments
+        path = 'benchmarks/build/whet.s'
+        next_sid = S.next_sid
+        stdout = sys.stdout
+
+        try:
+            sys.stdout = StringIO()
+            serial = parse_file(path)
+            serial.verbose = 1
+            serial.optimize()
+            S.next_sid = next_sid
+            parallel = parse_file(path)
+            parallel.verbose = 1
+            parallel.optimize(jobs=2)
+        finally:
+            sys.stdout = stdout
+
+        self.assertEqual(write_statements(serial.get_statements(True), 1),
+                         write_statements(parallel.get_statements(True), 1))
+
+    def test_id_space(self):
+        f = Function('foo', self.foo)
+        next_sid = S.next_sid
+
+        with f.id_space():
+            s = S('command', 'nop')
+
+        self.assertEqual(s.sid, self.foo[-1].sid + 1)
+        self.assertEqual(f.next_sid, s.sid + 1)
+        self.assertEqual(S.next_sid, next_sid)
+
+    def test_pickle(self):
+        f = Function('foo', self.foo)
+        f.optimize()
+        bids = [b.bid for b in f.blocks]
+        g = pickle.loads(pickle.dumps(f, 2))
+
+        self.assertEqual(g.name, 'foo')
+        self.assertTrue(g.converged)
+        self.assertEqual(g.get_statements(), f.get_statements())
+        self.assertEqual([b.bid for b in g.blocks], bids)
+        self.assertEqual(g.next_bid, f.next_bid)
+
+    def test_incremental_analysis(self):
+        for name in ('pi', 'whet', 'dhrystone'):
+            path = 'benchmarks/build/%s.s' % name
+            incremental = parse_file(path)
+            incremental.optimize()
+            full = parse_file(path)
+
+            try:
+                AnalysisManager.incremental = False
+                full.optimize()
+            finally:
+                AnalysisManager.incremental = True
+
+            self.assertEqual(write_statements(incremental.get_statements()),
+                             write_statements(full.get_statements()))
+            self.assertGreater(sum(f.analyses.incremental_analyses
+                                   for f in incremental.functions), 0)
+            self.assertEqual(sum(f.analyses.incremental_analyses
+                                 for f in full.functions), 0)
+
+    def test_worklist(self):
+        path = 'benchmarks/build/whet.s'
+        scheduled = parse_file(path)
+        scheduled.optimize()
+        full = parse_file(path)
+        worklist = Function.worklist
+
+        try:
+            Function.worklist = lambda self, passes, blocks, inputs: \
+                    [set(blocks) for p in passes]
+            full.optimize()
+        finally:
+            Function.worklist = worklist
+
+        self.assertEqual(write_statements(scheduled.get_statements()),
+                         write_statements(full.get_statements()))
+        self.assertGreater(sum(p['skipped'] for f in scheduled.functions
+                               for p in f.pass_stats().values()), 0)
+        self.assertEqual(sum(p['skipped'] for f in full.functions
+                             for p in f.pass_stats().values()), 0)
+
+    def test_worklist_skips_unchanged_blocks(self):
+        f = Function('foo', self.foo)
+        f.optimize()
+
+        # The second iteration only optimizes the block from which the move
+        # has been removed, not the block with the .end directive
+        self.assertEqual(len(f.blocks), 2)
+        self.assertEqual(f.pass_stats()['fold_constants']['invocations'], 3)
+        self.assertEqual(f.pass_stats()['fold_constants']['skipped'], 1)
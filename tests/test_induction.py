@@ -0,0 +1,74 @@
+from src.statement import Statement as S
+from src.liveness import create_in_out
+from src.induction import reduce_induction_variables
+from tests.function_case import FunctionTestCase
+
+
+class TestInduction(FunctionTestCase):
+
+    def function(self, body):
+        blocks = FunctionTestCase.function(self, body)
+        create_in_out(blocks)
+
+        return blocks
+
+    def loop(self, reg, step, *statements):
+        return [S('command', 'move', reg, '$0'),
+                S('command', 'j', '$L2'),
+                S('label', '$L1'),
+                S('command', 'sll', '$3', reg, 2),
+                S('command', 'addu', '$3', '$3', '$4')] + list(statements) \
+               + [S('command', 'addu', reg, reg, step),
+                  S('label', '$L2'),
+                  S('command', 'slt', '$3', reg, '$5'),
+                  S('command', 'bne', '$3', '$0', '$L1')]
+
+    def test_eliminate_variable(self):
+        blocks = self.function(self.loop('$8', 1,
+                                         S('command', 'sw', '$0', '0($3)')))
+
+        self.assertTrue(reduce_induction_variables(blocks))
+        self.assertEqual(self.body(blocks, True),
+                         [('move', ['$8', '$0']),
+                          ('sll', ['$25', '$8', 2]),
+                          ('addu', ['$25', '$25', '$4']),
+                          ('sll', ['$24', '$5', 2]),
+                          ('addu', ['$24', '$24', '$4']),
+                          ('j', ['$L2']),
+                          ('$L1', []),
+                          ('move', ['$3', '$25']),
+                          ('sw', ['$0', '0($3)']),
+                          ('addu', ['$25', '$25', 4]),
+                          ('$L2', []),
+                          ('slt', ['$3', '$25', '$24']),
+                          ('bne', ['$3', '$0', '$L1'])])
+
+    def test_keep_used_variable(self):
+        blocks = self.function(self.loop('$8', 1,
+                                         S('command', 'sw', '$8', '0($3)')))
+
+        self.assertTrue(reduce_induction_variables(blocks))
+        body = self.body(blocks, True)
+
+        self.assertIn(('move', ['$3', '$25']), body)
+        self.assertIn(('addu', ['$8', '$8', 1]), body)
+        self.assertIn(('addu', ['$25', '$25', 4]), body)
+        self.assertIn(('slt', ['$3', '$8', '$5']), body)
+        self.assertNotIn(('sll', ['$3', '$8', 2]), body)
+
+    def test_register_step(self):
+        blocks = self.function(self.loop('$8', '$6',
+                                         S('command', 'sw', '$0', '0($3)')))
+
+        self.assertTrue(reduce_induction_variables(blocks))
+        body = self.body(blocks, True)
+
+        self.assertIn(('sll', ['$24', '$6', 2]), body[:5])
+        self.assertIn(('addu', ['$25', '$25', '$24']), body)
+
+    def test_loop_with_call(self):
+        blocks = self.function(self.loop('$8', 1,
+                                         S('command', 'sw', '$0', '0($3)'),
+                                         S('command', 'jal', 'bar')))
+
+        self.assertFalse(reduce_induction_variables(blocks))
@@ -3,7 +3,7 @@ import unittest
 from src.statement import Statement as S
 from src.dataflow import BasicBlock as B, find_basic_blocks, \
         generate_flow_graph
-from src.liveness import create_use_def, create_in_out
+from src.liveness import create_use_def, create_in_out, is_reg_dead_after
 
 
 class TestLiveness(unittest.TestCase):
@@ -26,6 +26,21 @@ class TestLiveness(unittest.TestCase):
         self.assertEqual(block.use_set, set(['$1', '$2']))
         self.assertEqual(block.def_set, set(['$3', '$4']))
 
+    def test_return_uses_callee_saved(self):
+        block = B([S('command', 'lw', '$16', '16($sp)'),
+                   S('command', 'lw', '$8', '20($sp)'),
+                   S('command', 'j', '$31')])
+        block.live_out = set()
+
+        self.assertFalse(is_reg_dead_after('$16', block, 0))
+        self.assertTrue(is_reg_dead_after('$8', block, 1))
+
+        block = B([S('command', 'j', '$31')])
+        create_use_def(block)
+
+        self.assertIn('$16', block.use_set)
+        self.assertNotIn('$8', block.use_set)
+
     def test_create_in_out(self):
         s11 = S('command', 'li', 'a', 3)
         s12 = S('command', 'li', 'b', 5)
@@ -0,0 +1,89 @@
+from src.statement import Statement as S
+from src.loop_invariants import hoist_loop_invariants
+from tests.function_case import FunctionTestCase
+
+
+class TestLoopInvariants(FunctionTestCase):
+
+    def loop(self, *statements):
+        return [S('command', 'move', '$2', '$0'),
+                S('command', 'j', '$L1'),
+                S('label', '$L1')] + list(statements) \
+               + [S('command', 'addu', '$2', '$2', 1),
+                  S('command', 'bne', '$2', '$3', '$L1')]
+
+    def test_hoist_chain(self):
+        blocks = self.function(self.loop(
+                S('command', 'la', '$4', 'st'),
+                S('command', 'lw', '$5', '16($fp)'),
+                S('command', 'addu', '$4', '$4', '$5'),
+                S('command', 'sw', '$2', '0($4)')))
+
+        self.assertTrue(hoist_loop_invariants(blocks))
+        self.assertEqual(self.body(blocks, True),
+                         [('move', ['$2', '$0']),
+                          ('la', ['$25', 'st']),
+                          ('lw', ['$24', '16($fp)']),
+                          ('addu', ['$15', '$25', '$24']),
+                          ('j', ['$L1']),
+                          ('$L1', []),
+                          ('move', ['$4', '$25']),
+                          ('move', ['$5', '$24']),
+                          ('move', ['$4', '$15']),
+                          ('sw', ['$2', '0($4)']),
+                          ('addu', ['$2', '$2', 1]),
+                          ('bne', ['$2', '$3', '$L1'])])
+
+    def test_shared_value(self):
+        blocks = self.function(self.loop(S('command', 'l.d', '$f0', '$LC0'),
+                                         S('command', 'l.d', '$f2', '$LC0')))
+
+        hoist_loop_invariants(blocks)
+        body = self.body(blocks, True)
+
+        self.assertEqual(body[1:5],
+                         [('l.d', ['$f18', '$LC0']),
+                          ('j', ['$L1']),
+                          ('$L1', []),
+                          ('mov.d', ['$f0', '$f18'])])
+        self.assertEqual(body[5], ('mov.d', ['$f2', '$f18']))
+
+    def test_variant(self):
+        stored = self.loop(S('command', 'lw', '$4', '16($fp)'),
+                           S('command', 'sw', '$2', '16($fp)'))
+        pointer = self.loop(S('command', 'lw', '$4', 'st'),
+                            S('command', 'sw', '$2', '0($5)'))
+        changed = self.loop(S('command', 'sll', '$4', '$2', 2))
+
+        for body in (stored, pointer, changed):
+            self.assertFalse(hoist_loop_invariants(self.function(body)))
+
+    def test_loop_with_call(self):
+        blocks = self.function(self.loop(S('command', 'la', '$4', 'st'),
+                                         S('command', 'lw', '$5', '16($fp)'),
+                                         S('command', 'jal', 'bar')))
+
+        self.assertTrue(hoist_loop_invariants(blocks))
+        body = self.body(blocks, True)
+
+        self.assertIn(('la', ['$4', 'st']), body)
+        self.assertIn(('lw', ['$23', '16($fp)']), body)
+        self.assertIn(('move', ['$5', '$23']), body)
+        self.assertEqual(self.prologue[3].name, '.mask\t0xc0800000,-4')
+
+    def test_create_preheader(self):
+        blocks = self.function([S('command', 'beq', '$4', '$0', '$L1'),
+                                S('command', 'move', '$2', '$0'),
+                                S('label', '$L1'),
+                                S('command', 'la', '$4', 'st'),
+                                S('command', 'addu', '$2', '$2', 1),
+                                S('command', 'bne', '$2', '$3', '$L1')])
+
+        self.assertTrue(hoist_loop_invariants(blocks))
+        self.assertEqual(self.body(blocks, True)[:6],
+                         [('beq', ['$4', '$0', '$Lfoo.pre1']),
+                          ('move', ['$2', '$0']),
+                          ('$Lfoo.pre1', []),
+                          ('la', ['$25', 'st']),
+                          ('$L1', []),
+                          ('move', ['$4', '$25'])])
@@ -0,0 +1,77 @@
+import unittest
+
+from src.statement import Statement as S
+from src.dataflow import BasicBlock as B, generate_flow_graph
+from src.loops import back_edges, natural_loops, loop_depths, \
+        block_frequencies, find_preheader, LOOP_WEIGHT
+
+
+class TestLoops(unittest.TestCase):
+
+    def setUp(self):
+        # b1 -> b2 -> b3 -> b5 -> b6 -> end
+        #       ^ |    ^     |
+        #       | v    |     |
+        #       | b4 --+     |
+        #       +------------+
+        self.b1 = B([S('command', 'foo')])
+        self.b2 = B([S('label', 'b2'), S('command', 'beq', '$1', '$2',
+                                         'b4')])
+        self.b3 = B([S('label', 'b3'), S('command', 'bar')])
+        self.b5 = B([S('command', 'beq', '$1', '$2', 'b2')])
+        self.b6 = B([S('command', 'j', 'end')])
+        self.b4 = B([S('label', 'b4'), S('command', 'j', 'b3')])
+        self.end = B([S('label', 'end')])
+        self.blocks = [self.b1, self.b2, self.b3, self.b5, self.b6, self.b4,
+                       self.end]
+        generate_flow_graph(self.blocks)
+
+    def tearDown(self):
+        del self.blocks
+
+    def test_back_edges(self):
+        self.assertEqual(back_edges(self.blocks), [(self.b5, self.b2)])
+
+    def test_natural_loops(self):
+        loops = natural_loops(self.blocks)
+
+        self.assertEqual(len(loops), 1)
+        header, body = loops[0]
+        self.assertIs(header, self.b2)
+        self.assertEqual(body, set([self.b2, self.b3, self.b4, self.b5]))
+
+    def test_nested_loops(self):
+        # b1 -> b2 -> b3 -> b4 -> b5
+        #       ^     ^_____|     |
+        #       +-----------------+
+        b1 = B([S('command', 'foo')])
+        b2 = B([S('label', 'b2'), S('command', 'foo')])
+        b3 = B([S('label', 'b3'), S('command', 'foo')])
+        b4 = B([S('command', 'bne', '$1', '$2', 'b3')])
+        b5 = B([S('command', 'bne', '$1', '$3', 'b2')])
+        blocks = [b1, b2, b3, b4, b5]
+        generate_flow_graph(blocks)
+        depths = loop_depths(blocks)
+
+        self.assertEqual([depths[b] for b in blocks], [0, 1, 2, 2, 1])
+
+        frequencies = block_frequencies(blocks)
+        self.assertEqual(frequencies[b1], 1)
+        self.assertEqual(frequencies[b3], LOOP_WEIGHT ** 2)
+
+    def test_block_frequencies(self):
+        frequencies = block_frequencies(self.blocks)
+
+        self.assertEqual(frequencies[self.b1], 1)
+        self.assertEqual(frequencies[self.b4], LOOP_WEIGHT)
+        self.assertEqual(frequencies[self.end], 1)
+
+    def test_find_preheader(self):
+        header, body = natural_loops(self.blocks)[0]
+
+        self.assertIs(find_preheader(header, body), self.b1)
+
+        self.b1.statements.append(S('command', 'beq', '$1', '$2', 'end'))
+        generate_flow_graph(self.blocks)
+
+        self.assertIsNone(find_preheader(header, body))
@@ -0,0 +1,110 @@
+from src.statement import Statement as S
+from src.memory import location, clobbered_registers, \
+        forward_stored_values, eliminate_dead_stores
+from tests.function_case import FunctionTestCase
+
+
+class TestMemory(FunctionTestCase):
+
+    def test_location(self):
+        self.assertEqual(location('16($fp)'), ('$fp', 16))
+        self.assertEqual(location('16($sp)'), ('$fp', 16))
+        self.assertEqual(location('st+168'), ('st', 168))
+        self.assertEqual(location('n.7'), ('n.7', 0))
+        self.assertIsNone(location('0($2)'))
+        self.assertIsNone(location('$2'))
+
+    def test_clobbered_registers(self):
+        self.assertEqual(clobbered_registers(S('command', 'l.d', '$f2',
+                                               '16($fp)')),
+                         set(['$f1', '$f2', '$f3']))
+        self.assertEqual(clobbered_registers(S('command', 'dlw', '$6',
+                                               '16($fp)')),
+                         set(['$6', '$7']))
+        self.assertIn('$8', clobbered_registers(S('command', 'trunc.w.d',
+                                                  '$f4', '$f0', '$8')))
+
+    def test_forward_across_blocks(self):
+        blocks = self.function([S('command', 'sw', '$2', '16($fp)'),
+                                S('command', 'beq', '$4', '$0', '$L1'),
+                                S('command', 'addu', '$3', '$3', 1),
+                                S('label', '$L1'),
+                                S('command', 'lw', '$3', '16($fp)'),
+                                S('command', 'lw', '$2', '16($fp)')])
+
+        self.assertTrue(forward_stored_values(blocks))
+        self.assertEqual(self.body(blocks),
+                         [('sw', ['$2', '16($fp)']),
+                          ('beq', ['$4', '$0', '$L1']),
+                          ('addu', ['$3', '$3', 1]),
+                          ('move', ['$3', '$2'])])
+
+    def test_forward_double(self):
+        blocks = self.function([S('command', 's.d', '$f0', 'st+8'),
+                                S('command', 'l.d', '$f2', 'st+8')])
+
+        forward_stored_values(blocks)
+
+        self.assertEqual(self.body(blocks)[1], ('mov.d', ['$f2', '$f0']))
+
+    def test_forward_killed(self):
+        killers = [S('command', 'jal', 'bar'),
+                   S('command', 'addu', '$2', '$2', 1),
+                   S('command', 'sb', '$5', '17($fp)'),
+                   S('command', 'dsz', '16($fp)')]
+
+        for killer in killers:
+            blocks = self.function([S('command', 'sw', '$2', '16($fp)'),
+                                    killer,
+                                    S('command', 'lw', '$3', '16($fp)')])
+
+            self.assertFalse(forward_stored_values(blocks))
+
+    def test_forward_pointer_store(self):
+        blocks = self.function([S('command', 'sw', '$2', 'n.7'),
+                                S('command', 'sw', '$3', '16($fp)'),
+                                S('command', 'sw', '$4', '0($5)'),
+                                S('command', 'lw', '$6', 'n.7'),
+                                S('command', 'lw', '$7', '16($fp)')])
+
+        forward_stored_values(blocks)
+
+        self.assertEqual(self.body(blocks)[3:],
+                         [('lw', ['$6', 'n.7']), ('move', ['$7', '$3'])])
+
+    def test_forward_loop(self):
+        blocks = self.function([S('command', 'sw', '$2', '16($fp)'),
+                                S('label', '$L1'),
+                                S('command', 'lw', '$3', '16($fp)'),
+                                S('command', 'addu', '$2', '$2', 1),
+                                S('command', 'bne', '$2', '$3', '$L1')])
+
+        self.assertFalse(forward_stored_values(blocks))
+
+    def test_dead_stores(self):
+        blocks = self.function([S('command', 'sw', '$2', '16($fp)'),
+                                S('command', 'sw', '$3', '20($fp)'),
+                                S('command', 'lw', '$4', '20($fp)'),
+                                S('command', 's.d', '$f0', '16($fp)'),
+                                S('command', 'sw', '$4', 'n.7')])
+
+        self.assertTrue(eliminate_dead_stores(blocks))
+        self.assertEqual(self.body(blocks),
+                         [('sw', ['$3', '20($fp)']),
+                          ('lw', ['$4', '20($fp)']),
+                          ('sw', ['$4', 'n.7'])])
+
+    def test_dead_store_read_in_loop(self):
+        blocks = self.function([S('label', '$L1'),
+                                S('command', 'lw', '$3', '16($fp)'),
+                                S('command', 'sw', '$2', '16($fp)'),
+                                S('command', 'bne', '$2', '$3', '$L1')])
+
+        self.assertFalse(eliminate_dead_stores(blocks))
+
+    def test_dead_store_escaping(self):
+        blocks = self.function([S('command', 'sw', '$2', '20($fp)'),
+                                S('command', 'addu', '$4', '$fp', 16),
+                                S('command', 'jal', 'bar')])
+
+        self.assertFalse(eliminate_dead_stores(blocks))
@@ -0,0 +1,50 @@
+import unittest
+
+import src.opcodes as op
+from src.statement import Statement as S
+
+
+class TestOpcodes(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test_known_opcodes_classified(self):
+        for name in op.KNOWN_OPCODES:
+            self.assertIn(name, op._table)
+            self.assertEqual(op._table[name], op.compute_flags(name))
+
+    def test_classify_unknown_cached(self):
+        self.assertNotIn('foo.bar', op._table)
+        self.assertEqual(op.classify('foo.bar'), 0)
+        self.assertIn('foo.bar', op._table)
+
+    def test_categories(self):
+        self.assertTrue(op.classify('jal') & op.JUMP)
+        self.assertTrue(op.classify('bc1t') & op.BRANCH)
+        self.assertTrue(op.classify('bgez') & op.BRANCH_ZERO)
+        self.assertFalse(op.classify('beq') & op.BRANCH_ZERO)
+        self.assertTrue(op.classify('c.lt.d') & op.COMPARE)
+        self.assertFalse(op.classify('move') & op.ARITH)
+
+    def test_operand_roles(self):
+        self.assertTrue(op.classify('mtc1') & op.DEF_1)
+        self.assertTrue(op.classify('dsz') & op.USE_0_ADDRESS)
+        self.assertTrue(op.classify('lw') & op.USE_1_ADDRESS)
+        self.assertTrue(op.classify('addu') & op.USE_2)
+        self.assertFalse(op.classify('bc1f') & op.USE_0)
+
+    def test_statement_reclassified(self):
+        s = S('command', 'beq', '$1', '$2', '$L1')
+        self.assertTrue(s.is_branch())
+
+        s.name = 'move'
+        self.assertFalse(s.is_branch())
+        self.assertEqual(s.get_def(), set(['$1']))
+
+        s.stype = 'comment'
+        self.assertFalse(s.is_command())
+        self.assertEqual(s.get_def(), set())
@@ -2,7 +2,7 @@ import unittest
 from copy import copy
 
 from src.optimize_advanced import eliminate_common_subexpressions, \
-        propagate_copies
+        propagate_copies, fold_constants, reduce_strength
 from src.statement import Statement as S
 from src.dataflow import BasicBlock as B, find_basic_blocks, \
         generate_flow_graph
@@ -40,6 +40,82 @@ class TestOptimizeAdvanced(unittest.TestCase):
         eliminate_common_subexpressions(b)
         self.assertEqual(b.statements, e)
 
+    def test_fold_constants_mult_known(self):
+        b = B([S('command', 'li', '$2', '0x00000003'),
+               S('command', 'li', '$3', '0x00000001'),
+               S('command', 'mult', '$2', '$3'),
+               S('command', 'mflo', '$4'),
+               S('command', 'addu', '$5', '$4', 2)])
+        fold_constants(b)
+        self.assertEqual(b[-1], S('command', 'li', '$5', '0x00000005'))
+
+    def test_reduce_strength_mult(self):
+        b = B([S('command', 'li', '$3', '0x0000000a'),
+               S('command', 'mult', '$2', '$3'),
+               S('command', 'mflo', '$4')])
+        liveness.create_in_out([b])
+        self.assertTrue(reduce_strength(b))
+        self.assertEqual(b.statements,
+                         [S('command', 'li', '$3', '0x0000000a'),
+                          S('command', 'sll', '$4', '$2', 2),
+                          S('command', 'addu', '$4', '$4', '$2'),
+                          S('command', 'sll', '$4', '$4', 1)])
+
+    def test_reduce_strength_mult_operand(self):
+        b = B([S('command', 'mult', '$2', 7),
+               S('command', 'mflo', '$2'),
+               S('command', 'mult', '$3', -8),
+               S('command', 'mflo', '$3')])
+        liveness.create_in_out([b])
+        self.assertTrue(reduce_strength(b))
+        self.assertEqual(b.statements,
+                         [S('command', 'sll', '$8', '$2', 3),
+                          S('command', 'subu', '$2', '$8', '$2'),
+                          S('command', 'sll', '$8', '$3', 3),
+                          S('command', 'subu', '$3', '$0', '$8')])
+
+    def test_reduce_strength_div(self):
+        b = B([S('command', 'div', '$4', '$2', 4),
+               S('command', 'div', '$3', '$3', -2),
+               S('command', 'divu', '$5', '$5', 16)])
+        liveness.create_in_out([b])
+        self.assertTrue(reduce_strength(b))
+        self.assertEqual(b.statements,
+                         [S('command', 'sra', '$4', '$2', 31),
+                          S('command', 'srl', '$4', '$4', 30),
+                          S('command', 'addu', '$4', '$4', '$2'),
+                          S('command', 'sra', '$4', '$4', 2),
+                          S('command', 'srl', '$8', '$3', 31),
+                          S('command', 'addu', '$8', '$8', '$3'),
+                          S('command', 'sra', '$8', '$8', 1),
+                          S('command', 'subu', '$3', '$0', '$8'),
+                          S('command', 'srl', '$5', '$5', 4)])
+
+    def test_reduce_strength_div_defines_constant(self):
+        b = B([S('command', 'li', '$4', '0x00000008'),
+               S('command', 'div', '$4', '$2', 4),
+               S('command', 'mult', '$5', '$4'),
+               S('command', 'mflo', '$6'),
+               S('command', 'sw', '$6', '0($7)')])
+        liveness.create_in_out([b])
+        self.assertTrue(reduce_strength(b))
+        self.assertEqual(b.statements[-3:],
+                         [S('command', 'mult', '$5', '$4'),
+                          S('command', 'mflo', '$6'),
+                          S('command', 'sw', '$6', '0($7)')])
+
+    def test_reduce_strength_unchanged(self):
+        arguments = [S('command', 'mult', '$2', 10),
+                     S('command', 'mflo', '$4'),
+                     S('command', 'mfhi', '$5'),
+                     S('command', 'div', '$3', '$3', 6),
+                     S('command', 'mult', '$2', 0x55555),
+                     S('command', 'mflo', '$6')]
+        b = B(arguments)
+        liveness.create_in_out([b])
+        self.assertFalse(reduce_strength(b))
+        self.assertEqual(b.statements, arguments)
+
     #def test_propagate_copies_true(self):
     #    block = B([self.foo,
     #               S('command', 'move', '$1', '$2'),
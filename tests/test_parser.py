@@ -0,0 +1,128 @@
+import unittest
+from StringIO import StringIO
+from glob import glob
+from ply import yacc
+
+from src.statement import Statement as S
+from src.function import Function
+from src.parser import Parser, LineParser, iter_file, parse_file
+from src import lextab, yacctab
+
+
+class TestParser(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = Parser()
+
+    def tearDown(self):
+        del self.parser
+
+    def test_lazy_build(self):
+        self.assertIsNone(self.parser.parser)
+        self.parser.parse('\tnop\n')
+        self.assertIsNotNone(self.parser.parser)
+
+    def test_parse(self):
+        statements = self.parser.parse('# foo\n\t.text\nmain:\n'
+                                       '\taddu\t$2,$3,$4\t\t# bar\n'
+                                       '\tlw\t$2,16($fp)\n\tli\t$3,0x0010\n')
+
+        self.assertEqual(statements, [S('comment', ' foo'),
+                                      S('directive', '.text'),
+                                      S('label', 'main'),
+                                      S('command', 'addu', '$2', '$3', '$4'),
+                                      S('command', 'lw', '$2', '16($fp)'),
+                                      S('command', 'li', '$3', '0x0010')])
+        self.assertEqual(statements[3].get_option('comment'), ' bar')
+        self.assertEqual(self.parser.statements, [])
+
+    def test_reentrant(self):
+        other = Parser()
+        first = self.parser.parse('\tj\t$31\n')
+        second = other.parse('foo:\n')
+        third = self.parser.parse('\tnop\n')
+
+        self.assertEqual(first, [S('command', 'j', '$31')])
+        self.assertEqual(second, [S('label', 'foo')])
+        self.assertEqual(third, [S('command', 'nop')])
+
+    def test_tables_up_to_date(self):
+        pdict = dict((k, getattr(self.parser, k)) for k in dir(self.parser))
+        pinfo = yacc.ParserReflect(pdict)
+        pinfo.get_all()
+
+        self.assertEqual(pinfo.signature(), yacctab._lr_signature)
+        self.assertEqual(lextab._lextokens, set(Parser.tokens))
+
+
+def statement_key(s):
+    return s.stype, s.name, s.args, s.get_option('comment')
+
+
+class TestLineParser(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = LineParser()
+
+    def tearDown(self):
+        del self.parser
+
+    def assertSameAsPly(self, content):
+        expected = map(statement_key, Parser().parse(content))
+        self.assertEqual(map(statement_key, self.parser.parse(content)),
+                         expected)
+
+    def test_parse(self):
+        self.assertSameAsPly('# foo\n\t.text # not a comment\nmain:\n'
+                             '\taddu\t$2,$3,$4\t\t# bar\n$L1:\t# baz\n'
+                             '\tlw\t$2,16($fp)\n\tli\t$3,0x0010\n'
+                             '\tli\t$3,-4\n\tj\t$31\n\tnop\n')
+
+    def test_word(self):
+        self.assertEqual(self.parser.word('$2'), '$2')
+        self.assertEqual(self.parser.word('-16'), -16)
+        self.assertEqual(self.parser.word('0x00000041'), '0x00000041')
+        self.assertEqual(self.parser.word('16($fp)'), '16($fp)')
+        self.assertIsNone(self.parser.word('0x123456789'))
+        self.assertIsNone(self.parser.word('$2 $3'))
+        self.assertIsNone(self.parser.word('.foo'))
+        self.assertIsNone(self.parser.word(''))
+
+    def test_fallback(self):
+        self.assertFalse(self.parser.parse_line('\tlw\t$2,-16($fp)', []))
+        self.assertFalse(self.parser.parse_line('\tfoo\t$1,$2,$3,$4', []))
+        self.assertFalse(self.parser.parse_line('foo bar:', []))
+
+    def test_benchmarks(self):
+        for path in sorted(glob('benchmarks/build/*.s')):
+            self.assertSameAsPly(open(path).read())
+
+    def test_iter_statements(self):
+        lines = iter(['main:\n', '\tj\t$31\n', '\tnop'])
+        statements = self.parser.iter_statements(lines)
+
+        self.assertEqual(statement_key(next(statements)),
+                         ('label', 'main', [], None))
+        self.assertEqual(list(lines), ['\tj\t$31\n', '\tnop'])
+
+    def test_iter_file(self):
+        path = 'benchmarks/build/pi.s'
+        parts = list(iter_file(open(path)))
+        expected = parse_file(path).parts
+
+        self.assertEqual(map(type, parts), map(type, expected))
+        self.assertEqual([p.name for p in parts if isinstance(p, Function)],
+                         [p.name for p in expected if isinstance(p, Function)])
+        self.assertEqual([map(statement_key, p.statements) for p in parts],
+                         [map(statement_key, p.statements) for p in expected])
+
+    def test_iter_file_incremental(self):
+        f = StringIO('\t.data\n\t.ent\tfoo\nfoo:\n\tj\t$31\n'
+                     '\t.end\tfoo\n\t.ent\tbar\n')
+        parts = iter_file(f)
+        data = next(parts)
+        foo = next(parts)
+
+        self.assertEqual(foo.name, 'foo')
+        self.assertEqual(len(foo.statements), 4)
+        self.assertEqual(f.readline(), '\t.ent\tbar\n')
@@ -0,0 +1,86 @@
+from src.statement import Statement as S
+from src.stack_slots import Frame, FrameUsage, promote_stack_slots
+from tests.function_case import FunctionTestCase
+
+
+class TestStackSlots(FunctionTestCase):
+
+    def commands(self, blocks):
+        return [(s.name, s.args) for b in blocks for s in b
+                if s.is_command()]
+
+    def test_frame(self):
+        frame = Frame(self.prologue[2], self.prologue[3])
+
+        self.assertEqual((frame.size, frame.vars, frame.regs, frame.args),
+                         (32, 8, 2, 16))
+        self.assertTrue(frame.is_local(16))
+        self.assertTrue(frame.is_local(36))
+        self.assertFalse(frame.is_local(24))
+        self.assertEqual(frame.lowest_register(), 30)
+        self.assertEqual(frame.lowest_save(), 24)
+
+    def test_promote_temporary(self):
+        blocks = self.function([S('command', 'li', '$2', 1),
+                                S('command', 'sw', '$2', '16($fp)'),
+                                S('command', 'lw', '$3', '16($fp)')])
+        touched = promote_stack_slots(blocks)
+        commands = self.commands(blocks)
+
+        self.assertTrue(touched)
+        self.assertIn(('move', ['$25', '$2']), commands)
+        self.assertIn(('move', ['$3', '$25']), commands)
+        self.assertEqual(self.prologue[2].name,
+                         '.frame\t$fp,32,$31\t\t# vars= 8, regs= 2/0, '
+                         'args= 16, extra= 0')
+
+    def test_promote_callee_saved(self):
+        blocks = self.function([S('command', 'sw', '$4', '16($fp)'),
+                                S('command', 'jal', 'bar'),
+                                S('command', 'lw', '$2', '16($fp)'),
+                                S('command', 'lw', '$3', '16($fp)'),
+                                S('command', 'lw', '$4', '16($fp)')])
+        promote_stack_slots(blocks)
+        commands = self.commands(blocks)
+
+        self.assertIn(('move', ['$16', '$4']), commands)
+        self.assertEqual(commands[:5],
+                         [('subu', ['$sp', '$sp', 40]),
+                          ('sw', ['$31', '36($sp)']),
+                          ('sw', ['$fp', '32($sp)']),
+                          ('sw', ['$16', '28($sp)']),
+                          ('move', ['$fp', '$sp'])])
+        self.assertEqual(commands[-5:],
+                         [('lw', ['$31', '36($sp)']),
+                          ('lw', ['$fp', '32($sp)']),
+                          ('lw', ['$16', '28($sp)']),
+                          ('addu', ['$sp', '$sp', 40]),
+                          ('j', ['$31'])])
+        self.assertEqual(self.prologue[2].name,
+                         '.frame\t$fp,40,$31\t\t# vars= 8, regs= 3/0, '
+                         'args= 16, extra= 0')
+        self.assertEqual(self.prologue[3].name, '.mask\t0xc0010000,-4')
+
+    def test_live_across_call_unprofitable(self):
+        blocks = self.function([S('command', 'sw', '$4', '16($fp)'),
+                                S('command', 'jal', 'bar'),
+                                S('command', 'lw', '$2', '16($fp)')])
+
+        self.assertFalse(promote_stack_slots(blocks))
+
+    def test_escaping_slot(self):
+        blocks = self.function([S('command', 'sw', '$4', '20($fp)'),
+                                S('command', 'addu', '$4', '$fp', 16),
+                                S('command', 'jal', 'bar'),
+                                S('command', 'lw', '$2', '20($fp)')])
+        usage = FrameUsage(blocks)
+
+        self.assertTrue(usage.valid)
+        self.assertEqual(usage.escape, 16)
+        self.assertFalse(promote_stack_slots(blocks))
+
+    def test_other_access(self):
+        blocks = self.function([S('command', 's.d', '$f0', '16($fp)'),
+                                S('command', 'lw', '$2', '20($fp)')])
+
+        self.assertFalse(promote_stack_slots(blocks))
@@ -1,3 +1,4 @@
+import pickle
 import unittest
 
 from src.statement import Statement as S, Block as B
@@ -75,6 +76,48 @@ class TestStatement(unittest.TestCase):
                                                  S('comment', 'bar'), \
                                                  S('command', 'baz')])
 
+    def test_replace_middle(self):
+        self.block.read()
+        self.block.read()
+        self.block.replace(1, [S('command', 'x'), S('command', 'y')])
+        self.assertEqual(self.block.pointer, 3)
+        self.assertEqual(self.block[1], S('command', 'x'))
+        self.assertEqual(self.block[-1], S('command', 'baz'))
+        self.assertEqual(self.block.peek(), S('command', 'baz'))
+        self.assertEqual(len(self.block), 4)
+
+        self.block.replace(2, [], start=0)
+        self.assertEqual(self.block.pointer, 0)
+        self.assertEqual(self.block.statements, [S('command', 'y'), \
+                                                 S('command', 'baz')])
+
+    def test_replace_verbose(self):
+        self.block.verbose = 1
+        self.block.read()
+        self.block.replace(2, [])
+        self.assertEqual(len(self.block), 3)
+        self.assertTrue(self.block[0].is_comment())
+        self.assertTrue(self.block[1].is_comment())
+        self.assertEqual(self.block[2], S('command', 'baz'))
+
+    def test_insert(self):
+        self.block.read()
+        self.block.read()
+        self.block.insert(S('command', 'x'), index=1)
+        self.block.insert(S('command', 'y'))
+        self.assertEqual(self.block.statements, [S('command', 'foo'), \
+                                                 S('command', 'x'), \
+                                                 S('command', 'y'), \
+                                                 S('comment', 'bar'), \
+                                                 S('command', 'baz')])
+
+    def test_statements_copied(self):
+        statements = [S('command', 'foo')]
+        block = B(statements)
+        block.read()
+        block.replace(1, [])
+        self.assertEqual(len(statements), 1)
+
     def test_apply_filter(self):
         self.block.apply_filter(lambda s: s.is_command())
         self.assertEqual(self.block.statements, [S('command', 'foo'), \
@@ -170,6 +213,8 @@ class TestStatement(unittest.TestCase):
                 arg2)
         self.assertEqual(S('command', 'neg.d', '$2', '$1').get_use(), arg1)
         self.assertEqual(S('command', 'abs.d', '$2', '$1').get_use(), arg1)
+        self.assertEqual(S('command', 'neg.s', '$2', '$1').get_use(), arg1)
+        self.assertEqual(S('command', 'mfc1', '$2', '$1').get_use(), arg1)
         self.assertEqual(S('command', 'dsz', '10($1)', '$2').get_use(), arg1)
         self.assertEqual(S('command', 'dsw', '$1', '10($2)').get_use(), arg2)
         self.assertEqual(S('command', 'c.lt.d', '$1', '$2').get_use(), arg2)
@@ -177,3 +222,58 @@ class TestStatement(unittest.TestCase):
         self.assertEqual(S('command', 'bltz', '$1', '$2').get_use(), arg1)
         self.assertEqual(S('command', 'trunc.w.d', '$3', '$1', '$2').get_use(),
                          arg2)
+
+    def test_is_memory_access(self):
+        self.assertTrue(S('command', 'lw', '$2', '10($fp)').is_memory_access())
+        self.assertTrue(S('command', 's.d', '$f0', 'n.7').is_memory_access())
+        self.assertFalse(S('command', 'la', '$2', 'n.7').is_memory_access())
+        self.assertFalse(S('command', 'move', '$2', '$3').is_memory_access())
+
+    def test_get_use_as_items(self):
+        s = S('command', 'addu', '$3', '$1', '$2')
+        self.assertEqual(list(s.get_use(True)), [(1, '$1'), (2, '$2')])
+        self.assertEqual(s.uses('$2', True), 2)
+        self.assertEqual(s.uses('$4', True), -1)
+
+    def test_def_use_invalidated(self):
+        s = S('command', 'addu', '$3', '$1', '$2')
+        self.assertEqual(s.get_def(), set(['$3']))
+        self.assertEqual(s.get_use(), set(['$1', '$2']))
+
+        s[0] = '$4'
+        self.assertEqual(s.get_def(), set(['$4']))
+
+        s.replace_usage('$1', '$5', 1)
+        self.assertEqual(s.get_use(), set(['$5', '$2']))
+
+        s.name = 'mult'
+        self.assertEqual(s.get_def(), set())
+        self.assertEqual(s.get_use(), set(['$4', '$5']))
+
+    def test_options_lazy(self):
+        s = S('command', 'foo')
+        self.assertIsNone(s.get_option('comment'))
+        self.assertEqual(s.get_option('block', True), True)
+        self.assertIsNone(s._options)
+
+        s.set_inline_comment('bar')
+        self.assertEqual(s.options, {'comment': 'bar'})
+        self.assertTrue(s.has_inline_comment())
+
+    def test_pass_metadata(self):
+        self.assertIsNone(self.statement.replaced)
+        self.assertFalse(self.statement.remove)
+        self.assertRaises(AttributeError, setattr, self.statement, 'foo', 1)
+
+    def test_pickle(self):
+        s = S('command', 'addu', '$2', '$3', '$4', comment='foo')
+        s.remove = True
+        t = pickle.loads(pickle.dumps(s, 2))
+
+        self.assertEqual(t, s)
+        self.assertEqual(t.sid, s.sid)
+        self.assertEqual(t.flags, s.flags)
+        self.assertEqual(t.get_use(), set(['$3', '$4']))
+        self.assertEqual(t.get_option('comment'), 'foo')
+        self.assertTrue(t.remove)
+        self.assertIs(t.args[0], s.args[0])
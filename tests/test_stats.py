@@ -0,0 +1,66 @@
+import json
+import unittest
+from StringIO import StringIO
+
+from src.statement import Statement as S
+from src.program import Program
+from src.stats import IterationStats, pass_totals, save_stats
+
+
+class TestStats(unittest.TestCase):
+
+    def setUp(self):
+        self.statements = [S('directive', '.ent\tfoo'), S('label', 'foo'),
+                           S('command', 'move', '$2', '$2'),
+                           S('command', 'j', '$31'),
+                           S('directive', '.end\tfoo')]
+
+    def tearDown(self):
+        del self.statements
+
+    def test_record(self):
+        stats = IterationStats(1)
+        stats.record('foo', 0.5, True, 2)
+        stats.record('foo', 0.25, False, 0)
+        stats.skip('foo')
+
+        self.assertEqual(stats.passes['foo'],
+                         {'time': 0.75, 'invocations': 2, 'skipped': 1,
+                          'rewrites': 1, 'removed': 2})
+
+    def test_pass_totals(self):
+        first, second = IterationStats(1), IterationStats(2)
+        first.record('foo', 0.5, True, 2)
+        second.record('foo', 0.5, False, 0)
+        second.record('bar', 0.5, False, 0)
+        totals = pass_totals([first, second])
+
+        self.assertEqual(totals['foo']['invocations'], 2)
+        self.assertEqual(totals['foo']['removed'], 2)
+        self.assertEqual(totals['bar']['invocations'], 1)
+
+    def test_program_stats(self):
+        program = Program(self.statements, verbose=0)
+        program.optimize()
+        stats = program.get_stats()
+
+        self.assertEqual(stats['original_instructions'], 3)
+        self.assertEqual(stats['optimized_instructions'], 2)
+        self.assertEqual(len(stats['iterations']), 2)
+        self.assertEqual(stats['passes']['remove_redundancies']['removed'],
+                         1)
+        self.assertEqual(stats['passes']['remove_redundant_jumps']
+                         ['invocations'], 2)
+
+        function = stats['functions'][0]
+        self.assertEqual(function['name'], 'foo')
+        self.assertEqual([i['statements'] for i in function['iterations']],
+                         [4, 4])
+
+    def test_save_stats(self):
+        program = Program(self.statements, verbose=0)
+        program.optimize()
+        f = StringIO()
+        save_stats(program.get_stats(), f)
+
+        self.assertEqual(json.loads(f.getvalue()), program.get_stats())
@@ -1,6 +1,7 @@
 import unittest
+from StringIO import StringIO
 
-from src.writer import write_statements
+from src.writer import write_statements, write_stream, WRITE_BUFFER_LINES
 from src.statement import Statement as S, Block as B
 
 
@@ -71,3 +72,24 @@ class TestWriter(unittest.TestCase):
                  + "\t.tralala trololo\n" \
                  + "\taddu\t$regC,$regA,$regB\n"
         self.assertEqual(output, expect)
+
+    def test_writer_long_line_inlinecomment(self):
+        command = S('command', 'movemovemove', '$regA', '$regB' * 5,
+                    comment='tralala')
+        output = write_statements([command])
+        expect = "\tmovemovemove $regA," + "$regB" * 5 + "  #tralala\n"
+        self.assertEqual(output, expect)
+
+    def test_writer_message(self):
+        self.foo.set_message('foo')
+        self.foo.set_message('bar')
+        output = write_statements([self.foo], verbose=1)
+        expect = "\tmove\t$regA,$regB\t\t#foo |bar\n"
+        self.assertEqual(output, expect)
+
+    def test_write_stream(self):
+        statements = [self.foo, self.bar] * WRITE_BUFFER_LINES
+        out = StringIO()
+        write_stream(out, iter(statements))
+        self.assertEqual(out.getvalue(), write_statements(statements))
+        self.assertEqual(out.getvalue().count('\n'), len(statements))